@@ -17,13 +17,23 @@ from pathlib import Path
 BASE_PATH = str(Path.home())
 SID_FILE = "NASDAQ_sids.npy"
 
+# sid files already loaded in this process
+_sid_files = {}
+
+
+def load_sid_file(file_name):
+    """Load a sid indexed array once per process."""
+    if file_name not in _sid_files:
+        _sid_files[file_name] = np.load(os.path.join(BASE_PATH, file_name))
+    return _sid_files[file_name]
+
 class NASDAQSectorCodes(CustomFactor):
     """Returns a value for an SID stored in memory."""
     inputs = []
     window_length = 1
 
     def __init__(self, *args, **kwargs):
-        self.data = np.load(os.path.join(BASE_PATH , SID_FILE))
+        self.data = load_sid_file(SID_FILE)
 
     def compute(self, today, assets, out):
         out[:] = self.data[assets]
@@ -36,7 +46,7 @@ class NASDAQIPO(CustomFactor):
     window_length = 1
 
     def __init__(self, *args, **kwargs):
-        self.data = np.load(os.path.join(BASE_PATH , SID_FILE_IPO))
+        self.data = load_sid_file(SID_FILE_IPO)
 
     def compute(self, today, assets, out):
         out[:] = self.data[assets]
\ No newline at end of file
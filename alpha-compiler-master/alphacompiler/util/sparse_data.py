@@ -13,6 +13,18 @@ from os import listdir
 import pandas as pd
 import os
 
+# packed files already loaded in this process, shared by every factor instance
+# and by backtests forked from a warm backtest server
+_loaded_data = {}
+
+
+def load_sparse_data(path):
+    """Load a packed data file once per process."""
+    if path not in _loaded_data:
+        _loaded_data[path] = np.load(path, allow_pickle=True)
+    return _loaded_data[path]
+
+
 class SparseDataFactor(CustomFactor):
     """Abstract Base Class to be used for computing sparse data.
     The data is packed and persisted into a NumPy binary data file
@@ -59,7 +71,7 @@ class SparseDataFactor(CustomFactor):
     def cold_start(self, today, assets):
         print(self.data_path)
         if self.data is None:
-            self.data = np.load(self.data_path, allow_pickle=True)
+            self.data = load_sparse_data(self.data_path)
 
         self.M = self.data.date.shape[1]
 
@@ -74,10 +74,16 @@ def get_tickers_from_bundle(bundle_name):
     return map(lambda x: (x.symbol, x.sid), all_assets)
 
 
+# ticker to sid dicts already built in this process, keyed by bundle name
+_ticker_sid_dicts = {}
+
+
 def get_ticker_sid_dict_from_bundle(bundle_name):
     """Packs the (ticker,sid) tuples into a dict."""
-    all_equities = get_tickers_from_bundle(bundle_name)
-    return dict(all_equities)
+    if bundle_name not in _ticker_sid_dicts:
+        all_equities = get_tickers_from_bundle(bundle_name)
+        _ticker_sid_dicts[bundle_name] = dict(all_equities)
+    return _ticker_sid_dicts[bundle_name]
 
 if __name__ == '__main__':
 
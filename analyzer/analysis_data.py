@@ -1,7 +1,44 @@
+import copy
+import itertools
+
+from analyzer.tables import ColumnTable
+
+# snapshot versions are unique within the process, caches keyed by version are shared by all runs
+_versions = itertools.count(1)
+# snapshots of one run share a lineage, a stored run opened again starts a new one
+_lineages = itertools.count(1)
+
+
+def next_version():
+    return next(_versions)
+
+
+def _table_member(name):
+    """Member holding a DataFrame or a ColumnTable, read as a DataFrame built on first access."""
+    def get(self):
+        table = self.tables.get(name)
+        return table.frame() if isinstance(table, ColumnTable) else table
+
+    def set(self, value):
+        self.tables[name] = value
+    return property(get, set)
+
 
 class AnalysisData:
+    holdings_data = _table_member('holdings_data')
+    holdings_data_historical = _table_member('holdings_data_historical')
+    transactions_data = _table_member('transactions_data')
+    monthly_transactions_data = _table_member('monthly_transactions_data')
 
-    def __init__(self):
+    def __init__(self, version=0, lineage=None):
+        # published snapshots are never modified, every publication is a new object with a higher version
+        self.version = version
+        self.lineage = next(_lineages) if lineage is None else lineage
+        # (start, end) of a date range view of the chart data, see date_range
+        self.view_range = None
+        self.tables = {}
+        # positions history spilled to disk before holdings_data_historical, see analyzer.chunks
+        self.holdings_chunks = ()
         self.info_data = {}
         self.chart_data = {}
         self.orders_data = {}
@@ -9,4 +46,24 @@ class AnalysisData:
         self.benchmark_report = None
         self.holdings_data = None
         self.transactions_data = None
+        self.monthly_transactions_data = None
         self.holdings_data_historical = None
+
+    def table(self, name):
+        """Table member ``name`` as a ColumnTable, None if it is not set."""
+        value = self.tables.get(name)
+        if value is None or isinstance(value, ColumnTable):
+            return value
+        return ColumnTable.from_frame(value)
+
+    def replace(self, **members):
+        """Copy of the snapshot with ``members`` replaced, the other members are shared."""
+        data = copy.copy(self)
+        data.tables = dict(self.tables)
+        for name, value in members.items():
+            setattr(data, name, value)
+        return data
+
+    def date_range(self, start, end):
+        """Same version with the chart data between ``start`` and ``end``, a view of the rows, nothing copied."""
+        return self.replace(chart_data=self.chart_data.loc[start:end], view_range=(start, end))
@@ -1,21 +1,34 @@
-import datetime
 import os
 import sys
 from pathlib import Path
-import empyrical
 import numpy as np
 import pandas as pd
-from PyQt5 import QtWidgets
-from pandas.tseries.offsets import BDay
-from analyzer.analysis_data import AnalysisData
-from analyzer.views.main import AnalyzerWindow
-import zipline
+from analyzer.analysis_data import AnalysisData, next_version
+from analyzer.benchmark import BenchmarkSeries
+from analyzer.buffers import DailyBuffer, session_capacity
+from analyzer.journal import PositionsJournal, TransactionLog
+from analyzer.metrics import StreamingMetrics
+from analyzer.worker import AnalysisWorker, capture_bar
+from utils.daily_summary import build_holdings_summary
+
+
+# stored runs kept per algo, older ones are removed from the result store
+KEEP_RUNS = 10
+
+# sector arrays already loaded in this process, e.g. by a warm backtest server
+_sector_data = {}
+
+
+def load_sector_data(sector_file):
+    if sector_file not in _sector_data:
+        _sector_data[sector_file] = np.load(os.path.join(str(Path.home()), sector_file))
+    return _sector_data[sector_file]
 
 
 class Analyzer:
     def __init__(self, strategy):
         self.sector_file = 'NASDAQ_sids.npy'
-        self.sector_data = np.load(os.path.join(str(Path.home()), self.sector_file))
+        self.sector_data = load_sector_data(self.sector_file)
         self.sector_code_mapping = {0: "Basic Industries",
                                     1: "Capital Goods",
                                     2: "Consumer Durables",
@@ -28,34 +41,44 @@ class Analyzer:
                                     9: "Public Utilities",
                                     10: "Technology",
                                     11: "Transportation"}
-        self.app = QtWidgets.QApplication(sys.argv)
-        self.daily_data_df = pd.DataFrame(columns=['date', 'net', 'benchmark_net'])
-        self.daily_cagr = pd.Series()
-        self.daily_benchmark_cagr = pd.Series()
-        self.daily_data_df.set_index('date', inplace=True)
-        self.daily_positions_df = pd.DataFrame(columns=['position_date',
-                                                        'date',
-                                                        'symbol',
-                                                        'name',
-                                                        'entry',
-                                                        'exit',
-                                                        'sector',
-                                                        'quantity',
-                                                        'avg_price',
-                                                        'last_price',
-                                                        'daily_change',
-                                                        'pct_daily_change',
-                                                        'total_change',
-                                                        'pct_total_change',
-                                                        'pct_port',
-                                                        'book_value',
-                                                        'mkt_value'])
-        self.daily_positions_df.set_index(['date', 'symbol'], inplace=True)
-
-        self.transactions_data = pd.DataFrame(
-            columns=['counter', 'date', 'symbol', 'company_name', 'transaction_type', 'quantity', 'avg_price'])
-        self.transaction_count = 0
-
+        # headless runs build no window, the analysis is written to the results folder at the end
+        self.headless = strategy.strategy_data.get('headless', False)
+        # deferred runs skip the per bar analysis and compute everything from the perf frame at the end
+        self.deferred = strategy.strategy_data.get('deferred_analysis', False)
+        self.app = None
+        self.aw = None
+        # with a window the bars are analysed on a worker thread, see analyzer.worker
+        self.worker = None
+
+        # one row per session, allocated for the whole simulation up front
+        capacity = session_capacity(strategy.strategy_data.get('start'), strategy.strategy_data.get('end'))
+        self.daily_data = DailyBuffer(['net', 'benchmark_net'], capacity)
+        self.chart_buffer = DailyBuffer(['returns', 'benchmark_returns', 'drawdown', 'benchmark_drawdown',
+                                         'cagr', 'benchmark_cagr', 'positions_count'], capacity)
+        # out of core runs keep a window of days in memory and spill completed months to the results folder
+        spill_path = None
+        if strategy.strategy_data.get('out_of_core', False):
+            results_path = strategy.strategy_data.get('results_path')
+            if results_path is None:
+                from utils.log_utils import get_results_path
+                results_path = get_results_path()
+            spill_path = os.path.join(results_path, 'positions')
+        self.positions_journal = PositionsJournal(spill_path=spill_path,
+                                                  window_days=strategy.strategy_data.get('holdings_window_days', 31))
+
+        self.transaction_log = TransactionLog()
+        # the ledger clears its transactions every session, count what was consumed per dt since
+        self.transaction_cursor = {}
+        self.transaction_cursor_date = None
+
+        # built on the first bar, once the simulation calendar and the benchmark are known
+        self.benchmark = None
+        self.metrics = None
+        self.session = None
+        self.strategy_report = None
+        self.benchmark_report = None
+
+        # last published snapshot
         self.analysis_data = AnalysisData()
         self.strategy = strategy
 
@@ -63,231 +86,206 @@ class Analyzer:
         self.analysis_data.info_data['initial_cash'] = self.strategy.strategy_data.get('capital_base')
         self.analysis_data.info_data['benchmark_symbol'] = self.strategy.strategy_data.get('benchmark_symbol')
         self.analysis_data.info_data['date_range_go_button'] = False
+        if not self.headless:
+            self.create_window()
+
+    def create_window(self):
+        # Qt and the views are only imported once an analyzer window is actually built
+        from PyQt5 import QtCore, QtWidgets
+        from analyzer.views.main import AnalyzerWindow
+
+        # lets the pdf exporter import QtWebEngine after the application is created
+        QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
+        self.app = QtWidgets.QApplication(sys.argv)
         self.aw = AnalyzerWindow(self.analysis_data, self.strategy.strategy_data, self.app)
+        self.worker = AnalysisWorker(self.process_bar, self.publish,
+                                     self.strategy.strategy_data.get('publish_interval', 0.5),
+                                     self.aw.errorSignal.emit)
 
     def initialize(self):
-        pass
+        if self.worker is not None:
+            self.worker.start()
 
     def before_trading_start(self):
         pass
 
     def handle_data(self, context):
         print("Processing - {}".format(context.datetime.date().strftime("%Y%m%d")))
-        previous_date = context.datetime.date() if self.daily_data_df.empty else self.daily_data_df.index[-1]
-        previous_days_position = \
-            self.daily_positions_df.loc[self.daily_positions_df.index.get_level_values('date') == previous_date]
-
-        if self.daily_data_df.empty:
-            self.daily_data_df.loc[context.datetime.date()] = [context.account.equity_with_loan,
-                                                               context.account.equity_with_loan]
+        if self.deferred:
+            return
+        if self.benchmark is None:
+            self.load_benchmark(context)
+
+        bar = capture_bar(context, self.new_transactions(context))
+        if self.worker is not None:
+            self.worker.submit(bar)
         else:
-            benchmark_returns = context.trading_environment.benchmark_returns.copy()
-            benchmark_returns.index = benchmark_returns.index.date
-            # benchmark_returns = benchmark_returns.loc[~benchmark_returns.index.duplicated(keep='first')]
-
-            benchmark_return = benchmark_returns.loc[context.datetime.date()]
-            benchmark_net = self.daily_data_df.iloc[-1].benchmark_net + \
-                            (self.daily_data_df.iloc[-1].benchmark_net * benchmark_return)
-            self.daily_data_df.loc[context.datetime.date()] = [context.account.equity_with_loan,
-                                                               benchmark_net]
-
-        columns = ['position_date',
-                   'name',
-                   'entry',
-                   'exit',
-                   'sector',
-                   'quantity',
-                   'avg_price',
-                   'last_price',
-                   'daily_change',
-                   'pct_daily_change',
-                   'total_change',
-                   'pct_total_change',
-                   'pct_port',
-                   'book_value',
-                   'mkt_value'
-                   ]
-
-        for position in context.portfolio.positions.values():
-            if (previous_date, position.asset.symbol) in previous_days_position.index:
-                previous_last_price = self.daily_positions_df.loc[previous_date, position.asset.symbol].last_price
-                daily_change = position.last_sale_price - previous_last_price
-                pct_daily_change = position.last_sale_price / previous_last_price - 1
-                entry = self.daily_positions_df.loc[previous_date, position.asset.symbol].entry
-            else:
-                daily_change = 0
-                pct_daily_change = 0
-                entry = context.datetime.date()
-            pct_port = position.last_sale_price * position.amount / context.account.equity_with_loan
-            total_change = position.last_sale_price - position.cost_basis
-            pct_total_change = position.last_sale_price / position.cost_basis - 1
-            self.daily_positions_df.loc[(context.datetime.date(),
-                                    position.asset.symbol), columns] = [context.datetime.date(),
-                                                                        position.asset.asset_name,
-                                                                        entry,
-                                                                        '',
-                                                                        self.sector_code_mapping.get(
-                                                                   self.sector_data[
-                                                                       position.asset.sid],
-                                                                   'NA'),
-                                                               position.amount,
-                                                               position.cost_basis,
-                                                               position.last_sale_price,
-                                                               daily_change,
-                                                               pct_daily_change,
-                                                               total_change,
-                                                               pct_total_change,
-                                                               pct_port,
-                                                               position.amount * position.cost_basis,
-                                                               position.amount * position.last_sale_price
-                                                                        ]
-
-        if len(context.metrics_tracker._ledger._processed_transactions) > 0:
-            for date, transactions in context.metrics_tracker._ledger._processed_transactions.items():
-                for transaction in transactions:
-                    self.transaction_count += 1
-                    amount = transaction.get('amount')
-                    type = 'Buy' if amount > 0 else 'Sell'
-                    order_id = transaction.get('order_id')
-                    symbol = transaction.get('sid').symbol
-                    asset_name = transaction.get('sid').asset_name
-                    price = transaction.get('price')
-                    self.transactions_data.at[order_id] = [self.transaction_count, date.date(), symbol, asset_name, type, amount, price]
-                    # check if symbol does not exists in position
-                    if zipline.api.symbol(symbol) not in context.portfolio.positions.keys():
-                        self.daily_positions_df.loc[(previous_date, symbol), 'exit'] = context.datetime.date()
-
-        self.generate_analysis_data(context)
-
-        if self.daily_data_df.shape[0] % 21 == 0:
-            self.aw.updateSignal.emit(self.analysis_data)
-
-    def generate_analysis_data(self, context):
-        if self.daily_data_df.shape[0] > 0:
-            # Calculate returns
-            daily_returns = self.daily_data_df['net'].pct_change()
-
-            # daily return for the first day will always be 0
-            daily_returns[0] = (self.daily_data_df['net'][0] / self.analysis_data.info_data['initial_cash']) - 1
-
-            ytd_returns = daily_returns[
-                daily_returns.index >= datetime.datetime(daily_returns.index[-1].year, 1, 1).date()]
-
-            one_year_daily_returns = daily_returns[daily_returns.index >= (daily_returns.index[-1] - BDay(252)).date()]
-
-            benchmark_returns = context.trading_environment.benchmark_returns.loc[
-                                self.daily_data_df.index[0]:self.daily_data_df.index[-1]]
-            benchmark_returns.index = benchmark_returns.index.date
-
-            daily_returns = daily_returns.drop(daily_returns.index.difference(benchmark_returns.index))
-            benchmark_returns = benchmark_returns.drop(benchmark_returns.index.difference(daily_returns.index))
-            benchmark_returns = benchmark_returns.loc[~benchmark_returns.index.duplicated(keep='first')]
-
-            ytd_benchmark_returns = benchmark_returns[
-                benchmark_returns.index >= datetime.datetime(benchmark_returns.index[-1].year, 1, 1).date()]
-
-            one_year_benchmark_returns = benchmark_returns[
-                benchmark_returns.index >= (benchmark_returns.index[-1] - BDay(252)).date()]
-
-            portfolio_dd = self.rolling_drawdown(daily_returns.values)
-            benchmark_dd = self.rolling_drawdown(benchmark_returns.values)
-
-            report_dict = {}
-            benchmark_report_dict = {}
-
-            report_dict['total_return_pct'] = (daily_returns + 1).prod() - 1
-            report_dict['total_return'] = self.daily_data_df.iloc[-1].net - self.daily_data_df.iloc[0].net
-            report_dict['ytd'] = (ytd_returns + 1).prod() - 1
-            report_dict['one_year'] = (one_year_daily_returns + 1).prod() - 1
-            report_dict['max_drawdown'] = portfolio_dd.min()
-
-            report_dict['sharpe_ratio'] = empyrical.sharpe_ratio(daily_returns)
-            report_dict['alpha'], report_dict['beta'] = empyrical.alpha_beta_aligned(daily_returns, benchmark_returns)
-            cagr = empyrical.cagr(daily_returns)
-            print(cagr)
-            report_dict['cagr'] = cagr
-            report_dict['std'] = daily_returns.std() * 100
-
-            benchmark_report_dict['total_return_pct'] = (benchmark_returns + 1).prod() - 1
-            benchmark_report_dict['total_return'] = self.daily_data_df.iloc[-1].benchmark_net \
-                                                    - self.daily_data_df.iloc[0].benchmark_net
-            benchmark_report_dict['ytd'] = (ytd_benchmark_returns + 1).prod() - 1
-            benchmark_report_dict['one_year'] = (one_year_benchmark_returns + 1).prod() - 1
-            benchmark_report_dict['max_drawdown'] = benchmark_dd.min()
-            benchmark_report_dict['sharpe_ratio'] = empyrical.sharpe_ratio(benchmark_returns)
-            benchmark_report_dict['alpha'], benchmark_report_dict['beta'] = 0, 1
-            benchmark_report_dict['cagr'] = empyrical.cagr(benchmark_returns)
-            benchmark_report_dict['std'] = benchmark_returns.std() * 100
-
-            self.daily_cagr[daily_returns.index[-1]] = report_dict['cagr']
-            self.daily_benchmark_cagr[benchmark_returns.index[-1]] = benchmark_report_dict['cagr']
-
-            plot_data_df = pd.concat([daily_returns, benchmark_returns], axis=1,
-                                     keys=['returns', 'benchmark_returns'])
-
-            plot_data_df.reset_index(inplace=True)
-
-            plot_data_df['drawdown'] = portfolio_dd
-            plot_data_df['benchmark_drawdown'] = benchmark_dd
-
-            plot_data_df.set_index('date', inplace=True)
-            plot_data_df['cagr'] = self.daily_cagr
-            plot_data_df['benchmark_cagr'] = self.daily_benchmark_cagr
-            plot_data_df['positions_count'] = self.daily_positions_df.groupby('date').size()
-            plot_data_df['positions_count'] = plot_data_df['positions_count'].fillna(0)
-
-            self.analysis_data.chart_data = plot_data_df
-            self.analysis_data.strategy_report = report_dict
-            self.analysis_data.benchmark_report = benchmark_report_dict
-            if len(self.daily_positions_df.index.get_level_values('date').value_counts()) < 30:
-                self.analysis_data.holdings_data = self.daily_positions_df.reset_index()
-            else:
-                self.analysis_data.holdings_data = self.daily_positions_df.loc[self.daily_positions_df.index.get_level_values('date') >= self.daily_positions_df.index.get_level_values('date').value_counts().sort_index().index[-30]].reset_index()
-            if len(self.daily_data_df.index) < 30:
-                self.analysis_data.monthly_transactions_data = self.transactions_data
-            else:
-                self.analysis_data.monthly_transactions_data = self.transactions_data[self.transactions_data.date >= self.daily_data_df.index[-30]]
-            self.analysis_data.holdings_data_historical = self.daily_positions_df.reset_index()
-            self.analysis_data.transactions_data = self.transactions_data
-
-    def rolling_drawdown(self, returns):
-        out = np.empty(returns.shape[1:])
+            self.process_bar(bar)
 
-        returns_1d = returns.ndim == 1
+    def process_bar(self, bar):
+        """Add a bar to the daily data, the positions journal, the transaction log and the metrics."""
+        today = bar.datetime.date()
+        previous_date = today if len(self.daily_data) == 0 else self.daily_data.date(-1)
+        self.session = self.benchmark.session(today)
 
-        if len(returns) < 1:
-            out[()] = np.nan
-
-            if returns_1d:
-                out = out.item()
-
-            return out
-
-        returns_array = np.asanyarray(returns)
-
-        cumulative = np.empty(
-            (returns.shape[0] + 1,) + returns.shape[1:],
-            dtype='float64'
-        )
-
-        cumulative[0] = start = 100
-
-        empyrical.cum_returns(returns_array, starting_value=start, out=cumulative[1:])
-
-        max_return = np.fmax.accumulate(cumulative, axis=0)
-
-        out = (cumulative - max_return) / max_return
-
-        out = pd.Series(out[1:])
+        if len(self.daily_data) == 0:
+            self.daily_data.append(today, bar.net, bar.net)
+        else:
+            if self.session is None:
+                benchmark_net = self.daily_data.value('benchmark_net', -1)
+            else:
+                benchmark_net = self.benchmark.value(self.session, self.daily_data.value('benchmark_net', 0))
+            self.daily_data.append(today, bar.net, benchmark_net)
+
+        summary = build_holdings_summary(bar.positions, self.positions_journal.last_prices(previous_date), bar.net)
+        if not summary.empty:
+            # positions that were not held the previous day start today without a daily change
+            summary[['daily_change', 'pct_daily_change']] = summary[['daily_change', 'pct_daily_change']].fillna(0)
+            self.positions_journal.append_day(today, summary, self.sector_names(summary['sid'].values))
+
+        traded_sids = set()
+        for date, transaction in bar.transactions:
+            self.transaction_log.append(date.date(), transaction)
+            traded_sids.add(transaction['sid'].sid)
+        # traded positions that are no longer held were exited today
+        for sid in traded_sids.difference(summary['sid'].values):
+            self.positions_journal.mark_exit(sid, previous_date, today)
+
+        self.generate_analysis_data(today, bar.net, summary.shape[0])
+
+    def sector_names(self, sids):
+        return [self.sector_code_mapping.get(code, 'NA') for code in self.sector_data[sids]]
+
+    def new_transactions(self, context):
+        """Transactions the ledger processed since the previous bar, as (dt, transaction) pairs."""
+        today = context.datetime.date()
+        if self.transaction_cursor_date != today:
+            self.transaction_cursor = {}
+            self.transaction_cursor_date = today
+
+        new = []
+        for dt, transactions in context.metrics_tracker._ledger._processed_transactions.items():
+            consumed = self.transaction_cursor.get(dt, 0)
+            if consumed < len(transactions):
+                new.extend((dt, transaction) for transaction in transactions[consumed:])
+                self.transaction_cursor[dt] = len(transactions)
+        return new
+
+    def load_benchmark(self, context):
+        """Align the benchmark to the sessions from today to the end of the simulation."""
+        benchmark_returns = context.trading_environment.benchmark_returns
+        sim_params = getattr(context, 'sim_params', None)
+        sessions = pd.DatetimeIndex(sim_params.sessions if sim_params is not None else benchmark_returns.index)
+        sessions = sessions[sessions.date >= context.datetime.date()]
+        self.benchmark = BenchmarkSeries(benchmark_returns, sessions)
+        self.metrics = StreamingMetrics(self.strategy.strategy_data.get('capital_base'), self.benchmark)
+
+    def generate_analysis_data(self, today, net, positions_count):
+        """Add the day to the streaming metrics and refresh the reports, constant time per day."""
+        daily_return = self.metrics.update(today, net, self.session)
+
+        report_dict = self.metrics.strategy_report()
+        report_dict['total_return'] = self.daily_data.value('net', -1) - self.daily_data.value('net', 0)
+        benchmark_report_dict = self.metrics.benchmark_report()
+        benchmark_report_dict['total_return'] = self.daily_data.value('benchmark_net', -1) \
+                                                - self.daily_data.value('benchmark_net', 0)
+
+        # the charts only show the days with both a strategy and a benchmark return
+        benchmark_return = self.benchmark.return_at(self.session)
+        if not np.isnan(benchmark_return):
+            benchmark_index = self.metrics.benchmark_index
+            self.chart_buffer.append(today, daily_return, benchmark_return,
+                                     self.metrics.strategy.drawdown, self.benchmark.drawdown[benchmark_index],
+                                     report_dict['cagr'], self.benchmark.cagr[benchmark_index], positions_count)
+
+        self.strategy_report = report_dict
+        self.benchmark_report = benchmark_report_dict
+
+    def new_snapshot(self):
+        """Empty AnalysisData of the next version, with a copy of the info data."""
+        snapshot = AnalysisData(next_version(), self.analysis_data.lineage)
+        snapshot.info_data = dict(self.analysis_data.info_data)
+        return snapshot
+
+    def build_snapshot(self):
+        """Snapshot of the reports, chart and tables of the bars processed so far.
+
+        The chart and tables are read-only views of the buffers and journals, frames of the
+        full history are only built if a view or an export asks for them.
+        """
+        snapshot = self.new_snapshot()
+        if self.strategy_report is not None:
+            snapshot.strategy_report = dict(self.strategy_report)
+            snapshot.benchmark_report = dict(self.benchmark_report)
+
+        snapshot.chart_data = self.chart_buffer.frame()
+        snapshot.holdings_chunks = tuple(self.positions_journal.chunks)
+        snapshot.holdings_data_historical = self.positions_journal.table()
+        snapshot.holdings_data = self.positions_journal.table(self.positions_journal.start_of_last_days(30))
+        transactions = self.transaction_log.table()
+        snapshot.transactions_data = transactions
+        if len(self.daily_data) < 30:
+            snapshot.monthly_transactions_data = transactions
+        else:
+            start = self.transaction_log.start_of(self.daily_data.date(-30))
+            snapshot.monthly_transactions_data = transactions.rows(start)
+        return snapshot
 
-        return out
+    def publish(self):
+        """Publish a snapshot to the window, called from the worker thread at a throttled rate."""
+        self.analysis_data = self.build_snapshot()
+        self.aw.updateSignal.emit(self.analysis_data)
 
     def after_trading_end(self):
         pass
 
-    def finalize(self):
-        self.analysis_data.info_data['date_range_go_button'] = True
-        self.aw.updateSignal.emit(self.analysis_data)
+    def finalize(self, context=None, perf=None):
+        if self.worker is not None:
+            # the final snapshot includes every bar still queued
+            self.worker.stop()
+            if self.worker.error is not None:
+                # the analysis stopped on a bar, its state is not a complete run to show or store
+                print("Analysis stopped on an error, no final analysis")
+                return
+        if self.deferred and perf is not None:
+            from analyzer.perf_analysis import analyze_perf
+            snapshot = analyze_perf(self.new_snapshot(), perf, context.trading_environment.benchmark_returns,
+                                    self.strategy.strategy_data.get('capital_base'), self.sector_names)
+        else:
+            snapshot = self.build_snapshot()
+        snapshot.info_data['date_range_go_button'] = True
+        self.analysis_data = snapshot
+        # storing is opted into, every stored run is a full copy of the results
+        if self.strategy.strategy_data.get('store_results', False):
+            self.store_result()
+        if self.aw is not None:
+            self.aw.updateSignal.emit(self.analysis_data)
+        else:
+            self.write_artifacts()
+
+    def store_result(self):
+        """Add the final snapshot to the result store, see analyzer.result_store."""
+        from analyzer.result_store import ResultStore, bundle_timestamp, code_hash, run_params
+
+        strategy_data = self.strategy.strategy_data
+        try:
+            store = ResultStore(strategy_data.get('result_store'))
+            path = store.write(self.analysis_data, strategy_data.get('algo_name'), run_params(strategy_data),
+                               bundle_timestamp(strategy_data.get('bundle', 'quandl')), code_hash(strategy_data))
+            print("Result stored in {}".format(path))
+            store.prune(strategy_data.get('algo_name'), strategy_data.get('result_store_keep', KEEP_RUNS))
+        except Exception as e:
+            print(e)
+
+    def write_artifacts(self):
+        from analyzer.artifacts import write_artifacts
+
+        path = self.strategy.strategy_data.get('results_path')
+        if path is None:
+            from utils.log_utils import get_results_path
+            path = get_results_path()
+        write_artifacts(self.analysis_data, path)
+        print("Analysis written to {}".format(path))
 
     def show_plot(self):
         self.aw.show()
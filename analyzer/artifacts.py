@@ -0,0 +1,55 @@
+"""
+Analysis artifacts of a backtest, written without any Qt dependency.
+
+Headless runs have no window to export from, the analysis data is persisted to the
+results folder instead:
+
+    metrics.json       info data, strategy and benchmark reports
+    chart_data.csv     daily returns, drawdowns, cagr and positions count
+    holdings.csv       daily positions history
+    transactions.csv   transaction log
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from analyzer.chunks import write_history_csv
+
+METRICS_FILE = 'metrics.json'
+CHART_DATA_FILE = 'chart_data.csv'
+HOLDINGS_FILE = 'holdings.csv'
+TRANSACTIONS_FILE = 'transactions.csv'
+
+
+def _json_value(value):
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def metrics_dict(analysis_data):
+    return {'info': {key: _json_value(value) for key, value in analysis_data.info_data.items()},
+            'strategy': {key: _json_value(value) for key, value in (analysis_data.strategy_report or {}).items()},
+            'benchmark': {key: _json_value(value) for key, value in (analysis_data.benchmark_report or {}).items()}}
+
+
+def write_artifacts(analysis_data, path):
+    """Write the metrics, chart data, holdings and transactions of ``analysis_data`` to ``path``."""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, METRICS_FILE), 'w') as f:
+        json.dump(metrics_dict(analysis_data), f, indent=2)
+
+    if analysis_data.chart_data is not None and len(analysis_data.chart_data) > 0:
+        analysis_data.chart_data.to_csv(os.path.join(path, CHART_DATA_FILE))
+    if analysis_data.holdings_data_historical is not None:
+        # includes the months an out of core run spilled to disk
+        write_history_csv(analysis_data, os.path.join(path, HOLDINGS_FILE))
+    if analysis_data.transactions_data is not None:
+        analysis_data.transactions_data.to_csv(os.path.join(path, TRANSACTIONS_FILE), index=False)
+    return path
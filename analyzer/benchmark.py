@@ -0,0 +1,99 @@
+"""
+Benchmark series precomputed for the whole simulation.
+
+The benchmark returns are known before the first bar. They are aligned once to the
+session calendar, and every benchmark figure the analyzer reports (cumulative growth,
+drawdown, YTD, one year, sharpe, cagr, std, running mean and variance) is computed for
+every session up front, so the per day benchmark work is an array index.
+"""
+import numpy as np
+import pandas as pd
+
+from analyzer.metrics import ANNUALIZATION, DRAWDOWN_START, ONE_YEAR_BDAYS
+
+
+def _window_return(growth, starts):
+    """Product of ``1 + r`` from ``starts`` to each position, given the cumulative growth."""
+    before = np.concatenate([[1.0], growth])[starts]
+    return growth / before - 1
+
+
+class BenchmarkSeries:
+    """Benchmark returns and metrics per session.
+
+    Args:
+      benchmark_returns: Daily benchmark returns, e.g. ``context.trading_environment.benchmark_returns``.
+      sessions: Session labels of the simulation, sessions without a benchmark return are kept as NaN.
+    """
+
+    def __init__(self, benchmark_returns, sessions):
+        benchmark_returns = benchmark_returns.copy()
+        benchmark_returns.index = benchmark_returns.index.date
+        benchmark_returns = benchmark_returns.loc[~benchmark_returns.index.duplicated(keep='first')]
+
+        self.dates = np.array(pd.DatetimeIndex(sessions).date, dtype='datetime64[D]')
+        self.session_index = {date: i for i, date in enumerate(self.dates.astype(object))}
+        self.returns = benchmark_returns.reindex(self.dates.astype(object)).values.astype(np.float64)
+        # growth of the benchmark value from the first session, a missing return leaves it unchanged
+        self.value_growth = np.cumprod(1 + np.nan_to_num(self.returns))
+
+        # the metrics use the sessions with a benchmark return, position of the last one per session
+        aligned = ~np.isnan(self.returns)
+        self.aligned_index = np.cumsum(aligned) - 1
+        self._compute_metrics(self.returns[aligned], self.dates[aligned])
+
+    def _compute_metrics(self, returns, dates):
+        count = np.arange(1, len(returns) + 1)
+        self.growth = np.cumprod(1 + returns)
+        values = self.growth * DRAWDOWN_START
+        peaks = np.maximum.accumulate(np.maximum(values, DRAWDOWN_START))
+        self.drawdown = (values - peaks) / peaks
+        self.max_drawdown = np.minimum.accumulate(self.drawdown)
+
+        self.mean = np.cumsum(returns) / count
+        # sum of squared deviations, shifted by the first return to keep the cumulative sums small
+        shifted = returns - (returns[0] if len(returns) else 0)
+        self.m2 = np.maximum(np.cumsum(shifted ** 2) - np.cumsum(shifted) ** 2 / count, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.std = np.where(count > 1, np.sqrt(self.m2 / (count - 1)), np.nan)
+            self.sharpe_ratio = np.where((count > 1) & (self.std > 0),
+                                         self.mean / self.std * np.sqrt(ANNUALIZATION), np.nan)
+        self.cagr = self.growth ** (ANNUALIZATION / count) - 1
+
+        # first position of the year and of the one year window of every position
+        years = dates.astype('datetime64[Y]')
+        year_starts = np.searchsorted(dates, years.astype('datetime64[D]'), side='left')
+        cutoffs = np.busday_offset(dates, -ONE_YEAR_BDAYS, roll='forward')
+        window_starts = np.searchsorted(dates, cutoffs, side='left')
+        self.ytd = _window_return(self.growth, year_starts)
+        self.one_year = _window_return(self.growth, window_starts)
+
+    def session(self, date):
+        """Position of ``date`` in the session calendar, None if it is not a session."""
+        return self.session_index.get(date)
+
+    def return_at(self, session):
+        return np.nan if session is None else self.returns[session]
+
+    def value(self, session, first_value):
+        """Benchmark value at ``session`` when it is worth ``first_value`` on the first session."""
+        return first_value * self.value_growth[session] / self.value_growth[0]
+
+    def metrics_index(self, session):
+        """Position in the metric arrays of the last session up to ``session`` with a benchmark return."""
+        return -1 if session is None else int(self.aligned_index[session])
+
+    def report(self, index):
+        """Benchmark report over the sessions up to metrics position ``index``."""
+        if index < 0:
+            return {'total_return_pct': 0.0, 'ytd': 0.0, 'one_year': 0.0, 'max_drawdown': np.nan,
+                    'sharpe_ratio': np.nan, 'cagr': np.nan, 'std': np.nan, 'alpha': 0, 'beta': 1}
+        return {'total_return_pct': self.growth[index] - 1,
+                'ytd': self.ytd[index],
+                'one_year': self.one_year[index],
+                'max_drawdown': self.max_drawdown[index],
+                'sharpe_ratio': self.sharpe_ratio[index],
+                'cagr': self.cagr[index],
+                'std': self.std[index] * 100,
+                'alpha': 0,
+                'beta': 1}
@@ -0,0 +1,77 @@
+"""
+Preallocated per-day buffers.
+
+The analyzer records a few numbers for every simulated session. Appending them to a
+DataFrame or Series reallocates on every day, here they are written into numpy arrays
+sized from the simulation calendar up front, and pandas objects are only built when a
+consumer asks for them.
+"""
+import numpy as np
+import pandas as pd
+
+from analyzer.tables import read_only
+
+
+def session_capacity(start, end):
+    """Upper bound of the sessions between ``start`` and ``end``, both included."""
+    if start is None or end is None:
+        return 256
+    start = np.datetime64(pd.Timestamp(start).date(), 'D')
+    end = np.datetime64(pd.Timestamp(end).date(), 'D')
+    return max(int(np.busday_count(start, end)) + 1, 1)
+
+
+class DailyBuffer:
+    """Float columns indexed by date, filled one day at a time through a cursor.
+
+    Args:
+      columns: Names of the float columns.
+      capacity: Number of days to allocate, grows by doubling if a run is longer.
+    """
+
+    def __init__(self, columns, capacity):
+        self.names = list(columns)
+        self.dates = np.empty(capacity, dtype='datetime64[D]')
+        self.values = np.full((capacity, len(self.names)), np.nan)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, date, *values):
+        if self.size == self.dates.shape[0]:
+            self._grow()
+        self.dates[self.size] = date
+        self.values[self.size] = values
+        self.size += 1
+
+    def _grow(self):
+        capacity = self.dates.shape[0] * 2
+        dates = np.empty(capacity, dtype='datetime64[D]')
+        dates[:self.size] = self.dates[:self.size]
+        values = np.full((capacity, len(self.names)), np.nan)
+        values[:self.size] = self.values[:self.size]
+        self.dates, self.values = dates, values
+
+    def date(self, position):
+        """Date of the row at ``position`` (negative counts from the last row) as datetime.date."""
+        return self.dates[:self.size][position].astype(object)
+
+    def value(self, name, position):
+        return self.values[:self.size, self.positions[name]][position]
+
+    def column(self, name):
+        """View of the filled part of a column, no copy."""
+        return self.values[:self.size, self.positions[name]]
+
+    def frame(self, columns=None):
+        """DataFrame of the filled rows indexed by ``date`` (datetime.date objects).
+
+        All columns are a read-only view of the buffer, filled rows are never written again
+        so the frame stays valid while days are appended.
+        """
+        index = pd.Index(self.dates[:self.size].astype(object), name='date')
+        if columns is None:
+            return pd.DataFrame(read_only(self.values[:self.size]), index=index, columns=self.names, copy=False)
+        return pd.DataFrame({name: self.column(name) for name in columns}, index=index, columns=columns)
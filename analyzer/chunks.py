@@ -0,0 +1,75 @@
+"""
+Positions history spilled to disk.
+
+With a spill folder the positions journal keeps a rolling window of days in memory and
+writes every completed month before it to a compressed chunk, ``positions-YYYY-MM.npz``.
+Chunks are never written again once spilled, so snapshots share the list of chunk paths.
+The history is read back one chunk at a time, e.g. by the csv exports, the full history is
+never in memory at once.
+"""
+import os
+
+import numpy as np
+
+from analyzer.tables import ColumnTable
+
+DATE_COLUMNS = ['date', 'entry', 'exit']
+
+
+def chunk_path(folder, date):
+    return os.path.join(folder, 'positions-{:04d}-{:02d}.npz'.format(date.year, date.month))
+
+
+def write_chunk(path, columns):
+    """Write ``columns`` compressed, object columns as strings and exits as dates (NaT if none)."""
+    arrays = {}
+    for name, array in columns.items():
+        if array.dtype == object:
+            array = np.array(['' if value is None else str(value) for value in array], dtype=str)
+        arrays[name] = array
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_chunk(path, start=0):
+    """ColumnTable of a chunk with the columns of PositionsJournal.table, rows labelled from ``start``."""
+    from analyzer.journal import POSITIONS_COLUMNS
+
+    with np.load(path) as chunk:
+        columns = {name: chunk[name] for name in chunk.files}
+    exits = columns['exit']
+    exit_values = np.full(len(exits), '', dtype=object)
+    exited = ~np.isnat(exits)
+    exit_values[exited] = exits[exited].astype(object)
+    columns['exit'] = exit_values
+    columns['position_date'] = columns['date']
+    return ColumnTable({name: columns[name] for name in POSITIONS_COLUMNS}, start=start)
+
+
+def history_tables(analysis_data):
+    """Tables of the whole positions history of a snapshot, oldest first: the chunks, then the rows in memory."""
+    start = 0
+    for path in analysis_data.holdings_chunks:
+        table = read_chunk(path, start)
+        start += len(table)
+        yield table
+    table = analysis_data.table('holdings_data_historical')
+    if table is not None:
+        yield table
+
+
+def write_history_csv(analysis_data, path, date_once=False):
+    """Write the whole positions history to a csv file, one chunk at a time.
+
+    With ``date_once`` the date is only written on the first row of every day.
+    """
+    header = True
+    with open(path, 'w', newline='') as f:
+        for table in history_tables(analysis_data):
+            frame = table.frame()
+            if date_once:
+                frame = frame.assign(date=frame['date'].where(~frame.duplicated('date'))).fillna('')
+            frame.to_csv(f, index=False, header=header)
+            header = False
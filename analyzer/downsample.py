@@ -0,0 +1,46 @@
+"""
+Level of detail of the performance plots.
+
+A canvas can not show more than a couple of points per pixel column, so long daily series
+are decimated before they are plotted: the rows are split in one bucket per pixel and
+the rows of the minimum and maximum of every bucket are kept, for every overlaid series.
+Peaks and troughs, e.g. the deepest drawdown, are drawn exactly, and series shorter than
+the budget, such as a zoomed in date range, are drawn in full.
+"""
+import numpy as np
+
+
+def point_budget(width, step=128):
+    """Buckets for a canvas ``width`` pixels wide, rounded up to ``step`` so small resizes keep the same points."""
+    return max(step, -(-int(width) // step) * step)
+
+
+def min_max_rows(columns, buckets):
+    """Sorted rows holding the minimum and maximum of every bucket of every column.
+
+    Args:
+      columns: Equal length 1-d arrays, e.g. a strategy and its benchmark.
+      buckets: Number of buckets, one per pixel column.
+
+    Returns:
+      None if the columns have no more than two rows per bucket, they are drawn in full.
+    """
+    size = len(columns[0]) if columns else 0
+    if size <= 2 * buckets:
+        return None
+
+    bucket_size = -(-size // buckets)
+    padded = buckets * bucket_size
+    rows = [np.array([0, size - 1])]
+    offsets = np.arange(buckets) * bucket_size
+    for values in columns:
+        values = np.asarray(values, dtype=np.float64)
+        # NaN never wins a bucket unless the bucket is all NaN, the gap in the line is kept
+        low = np.full(padded, np.inf)
+        low[:size] = np.where(np.isnan(values), np.inf, values)
+        high = np.full(padded, -np.inf)
+        high[:size] = np.where(np.isnan(values), -np.inf, values)
+        rows.append(offsets + low.reshape(buckets, bucket_size).argmin(axis=1))
+        rows.append(offsets + high.reshape(buckets, bucket_size).argmax(axis=1))
+    rows = np.unique(np.concatenate(rows))
+    return rows[rows < size]
@@ -1,6 +1,7 @@
-from PyQt5.QtCore import QUrl
+from PyQt5.QtCore import QTimer, QUrl
 from jinja2 import Environment, FileSystemLoader
 import os
+from analyzer.report_charts import PERFORMANCE_CHARTS, chart_jobs, submit_charts
 from utils.log_utils import setup_logging, get_results_path
 
 
@@ -8,71 +9,88 @@ try:
     from PyQt5.QtWebKitWidgets import QWebView
 except:
     from PyQt5.QtWebEngineWidgets import QWebEngineView as QWebView
-from PyQt5.QtPrintSupport import QPrinter
 
 
 logger = setup_logging("exporter_logging")
 results_path = get_results_path()
 
 
+# compiled templates are kept by the environment, every export after the first reuses them
+jinja_env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")))
+
+
 class PdfGenerator(object):
+    """Writes the backtest report as html and pdf to the results path.
+
+    The Overview tables are read from the tab, the performance and comparison charts are
+    drawn off screen in a process pool (see analyzer.report_charts). The GUI thread only polls
+    the charts, then renders the template and prints the pdf.
+    """
+
+    poll_interval = 100
 
     def __init__(self, tabs, analysis_data, app):
         self.analysis_data = analysis_data
         self.pdf_file_name = 'backtest_report.pdf'
         self.html_file_name = 'backtest_report.html'
         self.tabs = tabs
-        self.template_path = os.path.join(os.path.dirname(__file__), "templates")
-        self.jinja_env = Environment(loader=FileSystemLoader(self.template_path))
         self.app = app
+        self.params = {}
+        self.futures = []
+        self.timer = None
+        self.web = None
 
     def generate(self):
         try:
-            data = {}
-            for key, tab in self.tabs.items():
+            self.params = {'template_file': "report.html"}
+            overview = self.tabs.get('Overview')
+            if overview is not None:
                 try:
-                    if key in ('Holdings', 'Transactions'):
-                        continue
-                    if key != 'Performance':
-                        tab.update_plot(self.analysis_data)
-                    data[key] = tab.generate_report()
+                    overview.update_plot(self.analysis_data)
+                    for tab_key, tab_data in overview.generate_report().items():
+                        self.params['Overview_' + tab_key] = tab_data
                 except Exception as ex:
                     logger.error('Error: ' + str(ex))
 
-            # render template with data
-            params = {'template_file': "report.html"}
-            for key, d in data.items():
-                for tab_key, tab_data in d.items():
-                    params[key + '_' + tab_key] = tab_data
-
-            html = self.render_template(
-                params
-            )
-
-            html_file = open(os.path.join(results_path, self.html_file_name), 'w')
-            html_file.write(html)
-            html_file.close()
-            # QtPy webview to print pdf from html
-            web = QWebView()
-            url = QUrl.fromLocalFile(results_path)
-            web.page().pdfPrintingFinished.connect(web.close)
-            web.setHtml(html, baseUrl=url)
-            self.app.processEvents()
-            printer = QPrinter()
-            printer.setPageSize(QPrinter.A4)
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(os.path.join(results_path, self.pdf_file_name))
-            printer.setColorMode(QPrinter.Color)
-            # web.print_(printer)
-
-            def emit_pdf(finished):
-                web.page().printToPdf(os.path.join(results_path, self.pdf_file_name))
-
-            web.loadFinished.connect(emit_pdf)
+            jobs = chart_jobs(self.analysis_data, self.analysis_data.info_data.get('benchmark_symbol', 'SPY'))
+            paths, self.futures = submit_charts(jobs, results_path)
+            for name, path in paths.items():
+                key = 'Performance_' if name in PERFORMANCE_CHARTS else 'Comparison_'
+                self.params[key + name] = QUrl.fromLocalFile(path).toString()
+
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.poll_charts)
+            self.timer.start(self.poll_interval)
         except Exception as ex:
             logger.error('Error: ' + str(ex))
 
+    def poll_charts(self):
+        if not all(future.done() for future in self.futures):
+            return
+        self.timer.stop()
+        for future in self.futures:
+            if future.exception() is not None:
+                logger.error('Error: ' + str(future.exception()))
+        try:
+            self.print_pdf(self.render_template(self.params))
+        except Exception as ex:
+            logger.error('Error: ' + str(ex))
+
+    def print_pdf(self, html):
+        html_file = open(os.path.join(results_path, self.html_file_name), 'w')
+        html_file.write(html)
+        html_file.close()
+        # QtPy webview to print pdf from html
+        self.web = QWebView()
+        url = QUrl.fromLocalFile(results_path)
+        self.web.page().pdfPrintingFinished.connect(self.web.close)
+
+        def emit_pdf(finished):
+            self.web.page().printToPdf(os.path.join(results_path, self.pdf_file_name))
+
+        self.web.loadFinished.connect(emit_pdf)
+        self.web.setHtml(html, baseUrl=url)
 
     def render_template(self, params):
-        template = self.jinja_env.get_template(params['template_file'])
+        template = jinja_env.get_template(params['template_file'])
         return template.render(params)
@@ -0,0 +1,267 @@
+"""
+Append-only columnar journals of the analyzer.
+
+Every session appends the day's positions as one contiguous block of rows to typed
+column arrays. A sid to last row dictionary answers the previous day lookups, exit dates
+live in a side index, and DataFrames are only built in bulk for the holdings tab and the
+exports, from read-only table views of the filled rows (see analyzer.tables).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analyzer.chunks import chunk_path, write_chunk
+from analyzer.tables import ColumnTable
+
+FLOAT_COLUMNS = ['quantity', 'avg_price', 'last_price', 'daily_change', 'pct_daily_change', 'total_change',
+                 'pct_total_change', 'pct_port', 'book_value', 'mkt_value']
+OBJECT_COLUMNS = ['symbol', 'name', 'sector']
+
+# column order of the positions history frames, as the views and exports expect it
+POSITIONS_COLUMNS = ['date', 'symbol', 'position_date', 'name', 'entry', 'exit', 'sector', 'quantity', 'avg_price',
+                     'last_price', 'daily_change', 'pct_daily_change', 'total_change', 'pct_total_change', 'pct_port',
+                     'book_value', 'mkt_value']
+
+
+class PositionsJournal:
+    """Daily positions history.
+
+    Rows are numbered from the first day of the history. With a ``spill_path`` only the
+    last ``window_days`` days, and the month they start in, are kept in memory: completed
+    months before them are written to chunks (see analyzer.chunks) and ``offset`` rows
+    are on disk.
+
+    Args:
+      capacity: Number of rows to allocate, grows by doubling.
+      spill_path: Folder of the spilled months, the whole history stays in memory if None.
+      window_days: Number of journal days always kept in memory, at least the 30 days of the
+        holdings tab.
+    """
+
+    def __init__(self, capacity=4096, spill_path=None, window_days=31):
+        self.size = 0
+        self.offset = 0
+        self.dates = np.empty(capacity, dtype='datetime64[D]')
+        self.entries = np.empty(capacity, dtype='datetime64[D]')
+        self.sids = np.empty(capacity, dtype=np.int64)
+        self.floats = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+        self.objects = {name: np.empty(capacity, dtype=object) for name in OBJECT_COLUMNS}
+
+        self.last_row = {}
+        # exit date per row of the last day a position was held
+        self.exits = {}
+        self.day_dates = []
+        self.day_starts = []
+
+        self.spill_path = spill_path
+        self.window_days = max(window_days, 30)
+        self.spilled_days = 0
+        # paths of the spilled months, oldest first
+        self.chunks = []
+        if spill_path is not None:
+            os.makedirs(spill_path, exist_ok=True)
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, rows):
+        capacity = self.dates.shape[0]
+        filled = self.size - self.offset
+        if filled + rows <= capacity:
+            return
+        while capacity < filled + rows:
+            capacity *= 2
+        self._reallocate(capacity, 0)
+
+    def _reallocate(self, capacity, first):
+        # new arrays with the rows from ``first`` (in memory) on, snapshots keep viewing the old ones
+        filled = self.size - self.offset - first
+
+        def moved(array):
+            new = np.empty(capacity, dtype=array.dtype)
+            new[:filled] = array[first:first + filled]
+            return new
+
+        self.dates, self.entries, self.sids = moved(self.dates), moved(self.entries), moved(self.sids)
+        self.floats = {name: moved(array) for name, array in self.floats.items()}
+        self.objects = {name: moved(array) for name, array in self.objects.items()}
+
+    def last_prices(self, date):
+        """Last price per symbol of the positions held on ``date``."""
+        rows = self.day_rows(date)
+        return pd.Series(self.floats['last_price'][rows], index=self.objects['symbol'][rows])
+
+    def day_rows(self, date):
+        """Rows in memory of ``date``, only the last day in the journal is looked up."""
+        if not self.day_dates or self.day_dates[-1] != date:
+            return slice(0, 0)
+        return slice(self.day_starts[-1] - self.offset, self.size - self.offset)
+
+    def append_day(self, date, summary, sectors):
+        """Append the positions of ``date`` from a holdings summary (see utils.daily_summary).
+
+        Positions held the previous day (``in_prev``) keep their entry date, the others are
+        entered on ``date``.
+        """
+        rows = summary.shape[0]
+        if rows == 0:
+            return
+        if self.spill_path is not None and self.day_dates and \
+                (self.day_dates[-1].year, self.day_dates[-1].month) != (date.year, date.month):
+            self.spill_completed_months()
+        self._reserve(rows)
+        start, end = self.size - self.offset, self.size - self.offset + rows
+
+        sids = summary['sid'].values
+        in_prev = summary['in_prev'].values
+        entries = np.full(rows, np.datetime64(date, 'D'))
+        for i, sid in enumerate(sids):
+            row = self.last_row.get(sid)
+            if in_prev[i] and row is not None and row >= self.offset:
+                entries[i] = self.entries[row - self.offset]
+            self.last_row[sid] = self.size + i
+
+        self.dates[start:end] = np.datetime64(date, 'D')
+        self.entries[start:end] = entries
+        self.sids[start:end] = sids
+        for name in FLOAT_COLUMNS:
+            self.floats[name][start:end] = summary[name].values
+        self.objects['symbol'][start:end] = summary.index.values
+        self.objects['name'][start:end] = summary['name'].values
+        self.objects['sector'][start:end] = sectors
+
+        self.day_dates.append(date)
+        self.day_starts.append(self.size)
+        self.size += rows
+
+    def spill_completed_months(self):
+        """Write the completed months before the last ``window_days`` days to chunks."""
+        while True:
+            first = self.spilled_days
+            month = (self.day_dates[first].year, self.day_dates[first].month) if first < len(self.day_dates) else None
+            end = first
+            while end < len(self.day_dates) and (self.day_dates[end].year, self.day_dates[end].month) == month:
+                end += 1
+            # the month is still running, or some of its days are in the window
+            if month is None or len(self.day_dates) - end < self.window_days:
+                return
+            self._spill(first, end)
+
+    def _spill(self, first_day, end_day):
+        start, end = self.day_starts[first_day], self.day_starts[end_day]
+        rows = slice(start - self.offset, end - self.offset)
+        exits = np.full(end - start, np.datetime64('NaT'), dtype='datetime64[D]')
+        for row in range(start, end):
+            if row in self.exits:
+                exits[row - start] = np.datetime64(self.exits.pop(row), 'D')
+
+        columns = {'date': self.dates[rows], 'entry': self.entries[rows], 'exit': exits, 'sid': self.sids[rows]}
+        columns.update({name: self.objects[name][rows] for name in OBJECT_COLUMNS})
+        columns.update({name: self.floats[name][rows] for name in FLOAT_COLUMNS})
+        self.chunks.append(write_chunk(chunk_path(self.spill_path, self.day_dates[first_day]), columns))
+
+        self._reallocate(self.dates.shape[0], end - start)
+        self.offset = end
+        self.spilled_days = end_day
+
+    def mark_exit(self, sid, position_date, exit_date):
+        """Record ``exit_date`` on the row of ``sid`` held on ``position_date``."""
+        row = self.last_row.get(sid)
+        if row is None or row < self.offset or self.dates[row - self.offset] != np.datetime64(position_date, 'D'):
+            return
+        self.exits[row] = exit_date
+
+    def start_of_last_days(self, days):
+        """First row of the last ``days`` journal days."""
+        if len(self.day_starts) <= days:
+            return 0
+        return self.day_starts[-days]
+
+    def table(self, start=0):
+        """Positions from row ``start`` on as a table of views, labelled by journal row.
+
+        Rows spilled to disk are not part of the table. Only the exit column is built, exits
+        recorded afterwards are not part of the table.
+        """
+        start = max(start, self.offset)
+        rows = slice(start - self.offset, self.size - self.offset)
+        exits = np.full(self.size - start, '', dtype=object)
+        for row, exit_date in list(self.exits.items()):
+            if start <= row < self.size:
+                exits[row - start] = exit_date
+
+        columns = {'date': self.dates[rows],
+                   'symbol': self.objects['symbol'][rows],
+                   'position_date': self.dates[rows],
+                   'name': self.objects['name'][rows],
+                   'entry': self.entries[rows],
+                   'exit': exits,
+                   'sector': self.objects['sector'][rows]}
+        for name in FLOAT_COLUMNS:
+            columns[name] = self.floats[name][rows]
+        return ColumnTable(columns, start=start)
+
+
+TRANSACTIONS_COLUMNS = ['counter', 'date', 'symbol', 'company_name', 'transaction_type', 'quantity', 'avg_price']
+
+
+class TransactionLog:
+    """Filled transactions in the order they were processed.
+
+    Args:
+      capacity: Number of rows to allocate, grows by doubling.
+    """
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.dates = np.empty(capacity, dtype='datetime64[D]')
+        self.sids = np.empty(capacity, dtype=np.int64)
+        self.quantities = np.empty(capacity, dtype=np.int64)
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.order_ids = np.empty(capacity, dtype=object)
+        self.symbols = np.empty(capacity, dtype=object)
+        self.names = np.empty(capacity, dtype=object)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = self.dates.shape[0] * 2
+        for name in ['dates', 'sids', 'quantities', 'prices', 'order_ids', 'symbols', 'names']:
+            array = getattr(self, name)
+            new = np.empty(capacity, dtype=array.dtype)
+            new[:self.size] = array[:self.size]
+            setattr(self, name, new)
+
+    def append(self, date, transaction):
+        """Append a transaction dict as kept by the zipline ledger."""
+        if self.size == self.dates.shape[0]:
+            self._grow()
+        asset = transaction['sid']
+        row = self.size
+        self.dates[row] = np.datetime64(date, 'D')
+        self.sids[row] = asset.sid
+        self.quantities[row] = transaction['amount']
+        self.prices[row] = transaction['price']
+        self.order_ids[row] = transaction['order_id']
+        self.symbols[row] = asset.symbol
+        self.names[row] = asset.asset_name
+        self.size += 1
+
+    def start_of(self, date):
+        """First row dated ``date`` or later."""
+        return int(np.searchsorted(self.dates[:self.size], np.datetime64(date, 'D'), side='left'))
+
+    def table(self, start=0):
+        """Transactions from row ``start`` on as a table of views, indexed by order id."""
+        rows = slice(start, self.size)
+        quantities = self.quantities[rows]
+        return ColumnTable({'counter': np.arange(start + 1, self.size + 1),
+                            'date': self.dates[rows],
+                            'symbol': self.symbols[rows],
+                            'company_name': self.names[rows],
+                            'transaction_type': np.where(quantities > 0, 'Buy', 'Sell').astype(object),
+                            'quantity': quantities,
+                            'avg_price': self.prices[rows]},
+                           index=self.order_ids[rows])
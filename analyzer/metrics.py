@@ -0,0 +1,199 @@
+"""
+Streaming performance metrics.
+
+The analyzer used to recompute every metric over the full history on every simulated day.
+Here each day updates running sums (mean and variance, co-moment with the benchmark,
+cumulative growth, running peak) and calendar windows for YTD and one year returns, so a
+day costs constant time. The numbers match the empyrical functions the analyzer used:
+``sharpe_ratio``, ``alpha_beta_aligned`` and ``cagr``, with a daily annualization of 252.
+"""
+import math
+
+import numpy as np
+
+ANNUALIZATION = 252
+ONE_YEAR_BDAYS = 252
+DRAWDOWN_START = 100
+
+
+def one_year_cutoff(date):
+    """First date of the one year window ending at ``date``, i.e. ``date - BDay(252)``."""
+    return np.busday_offset(np.datetime64(date, 'D'), -ONE_YEAR_BDAYS, roll='forward').astype(object)
+
+
+class WindowProduct:
+    """Product of ``1 + r`` over a window whose oldest entries expire.
+
+    Kept as two stacks, entries are pushed on the back and the front holds suffix
+    products, so push, expire and the window product are amortized constant time.
+    """
+
+    def __init__(self):
+        self.front = []
+        self.back = []
+        self.back_product = 1.0
+
+    def push(self, date, ret):
+        self.back.append((date, 1 + ret))
+        self.back_product *= 1 + ret
+
+    def expire(self, cutoff):
+        """Drop the entries dated before ``cutoff``."""
+        while True:
+            if not self.front:
+                if not self.back:
+                    return
+                self._transfer()
+            if self.front[-1][0] >= cutoff:
+                return
+            self.front.pop()
+
+    def _transfer(self):
+        # newest first, so the oldest entry ends on top holding the product of all of them
+        product = 1.0
+        for date, growth in reversed(self.back):
+            product *= growth
+            self.front.append((date, product))
+        self.back = []
+        self.back_product = 1.0
+
+    @property
+    def product(self):
+        return (self.front[-1][1] if self.front else 1.0) * self.back_product
+
+
+class ReturnsStats:
+    """Running statistics of one daily returns series."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.growth = 1.0
+        self.peak = DRAWDOWN_START
+        self.drawdown = np.nan
+        self.max_drawdown = np.nan
+
+        self.last_date = None
+        self.ytd_growth = 1.0
+        self.one_year_window = WindowProduct()
+
+    def add(self, ret):
+        """Update the whole period statistics with the return of the next day."""
+        self.count += 1
+        delta = ret - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (ret - self.mean)
+
+        self.growth *= 1 + ret
+        value = self.growth * DRAWDOWN_START
+        self.peak = max(self.peak, value)
+        self.drawdown = (value - self.peak) / self.peak
+        self.max_drawdown = self.drawdown if self.count == 1 else min(self.max_drawdown, self.drawdown)
+
+    def add_period(self, date, ret):
+        """Update the YTD and one year windows with the return of ``date``."""
+        if self.last_date is None or date.year != self.last_date.year:
+            self.ytd_growth = 1.0
+        self.ytd_growth *= 1 + ret
+        self.one_year_window.push(date, ret)
+        self.one_year_window.expire(one_year_cutoff(date))
+        self.last_date = date
+
+    @property
+    def total_return_pct(self):
+        return self.growth - 1
+
+    @property
+    def ytd(self):
+        return self.ytd_growth - 1
+
+    @property
+    def one_year(self):
+        return self.one_year_window.product - 1
+
+    @property
+    def std(self):
+        """Sample standard deviation, as ``pd.Series.std``."""
+        if self.count < 2:
+            return np.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    @property
+    def sharpe_ratio(self):
+        std = self.std
+        if self.count < 2 or std == 0:
+            return np.nan
+        return self.mean / std * math.sqrt(ANNUALIZATION)
+
+    @property
+    def cagr(self):
+        if self.count < 1:
+            return np.nan
+        return self.growth ** (ANNUALIZATION / self.count) - 1
+
+
+class StreamingMetrics:
+    """Strategy metrics updated one day at a time.
+
+    Strategy returns are taken from the portfolio value, the first day relative to
+    ``initial_cash``. Days without a benchmark return only enter the YTD and one year
+    windows, the other metrics use the days both series have. The benchmark side comes
+    precomputed from a ``BenchmarkSeries`` whose calendar starts on the first day.
+    """
+
+    def __init__(self, initial_cash, benchmark):
+        self.initial_cash = initial_cash
+        self.benchmark = benchmark
+        self.benchmark_index = -1
+        self.previous_net = None
+        self.strategy = ReturnsStats()
+        self.comoment = 0.0
+
+    def update(self, date, net, session):
+        """Add the day ending at ``date``, ``session`` being its position in the benchmark calendar, and
+        return the strategy's daily return."""
+        ret = net / (self.initial_cash if self.previous_net is None else self.previous_net) - 1
+        self.previous_net = net
+
+        self.strategy.add_period(date, ret)
+        benchmark_return = self.benchmark.return_at(session)
+        if not np.isnan(benchmark_return):
+            index = self.benchmark.metrics_index(session)
+            benchmark_delta = benchmark_return - (self.benchmark.mean[index - 1] if index > 0 else 0.0)
+            self.strategy.add(ret)
+            self.comoment += benchmark_delta * (ret - self.strategy.mean)
+            self.benchmark_index = index
+        return ret
+
+    @property
+    def beta(self):
+        count = self.benchmark_index + 1
+        if count < 2:
+            return np.nan
+        benchmark_variance = self.benchmark.m2[self.benchmark_index] / count
+        if benchmark_variance < 1.0e-30:
+            return np.nan
+        return self.comoment / count / benchmark_variance
+
+    @property
+    def alpha(self):
+        beta = self.beta
+        if np.isnan(beta):
+            return np.nan
+        return (self.strategy.mean - beta * self.benchmark.mean[self.benchmark_index] + 1) ** ANNUALIZATION - 1
+
+    def strategy_report(self):
+        stats = self.strategy
+        return {'total_return_pct': stats.total_return_pct,
+                'ytd': stats.ytd,
+                'one_year': stats.one_year,
+                'max_drawdown': stats.max_drawdown,
+                'sharpe_ratio': stats.sharpe_ratio,
+                'cagr': stats.cagr,
+                'std': stats.std * 100,
+                'alpha': self.alpha,
+                'beta': self.beta}
+
+    def benchmark_report(self):
+        return self.benchmark.report(self.benchmark_index)
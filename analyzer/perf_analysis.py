@@ -0,0 +1,210 @@
+"""
+Deferred analysis of a finished backtest.
+
+``run_algorithm`` hands the daily perf frame to ``analyze(context, perf)``. With the
+deferred analysis mode the analyzer does no per bar work, the whole AnalysisData (returns,
+drawdowns, cagr, reports, holdings history and transaction log) is computed from the perf
+frame here in one vectorized pass.
+"""
+import datetime
+
+import empyrical
+import numpy as np
+import pandas as pd
+
+from analyzer.journal import POSITIONS_COLUMNS, TRANSACTIONS_COLUMNS
+from analyzer.metrics import ANNUALIZATION, DRAWDOWN_START, one_year_cutoff
+
+
+def drawdown(returns):
+    """Drawdown from the running peak of the cumulative returns, per day."""
+    values = np.cumprod(1 + np.nan_to_num(returns)) * DRAWDOWN_START
+    peaks = np.maximum.accumulate(np.maximum(values, DRAWDOWN_START))
+    return (values - peaks) / peaks
+
+
+def running_cagr(returns):
+    """CAGR of the returns up to each day."""
+    growth = np.cumprod(1 + returns)
+    return growth ** (ANNUALIZATION / np.arange(1, len(returns) + 1)) - 1
+
+
+def _period_return(returns, dates, start):
+    return np.prod(1 + returns[dates >= start]) - 1
+
+
+def returns_report(returns, dates, period_returns=None, period_dates=None):
+    """Report of a returns series, the YTD and one year figures use ``period_returns`` if given."""
+    if period_returns is None:
+        period_returns, period_dates = returns, dates
+    last_date = period_dates[-1]
+    return {'total_return_pct': np.prod(1 + returns) - 1,
+            'ytd': _period_return(period_returns, period_dates, datetime.date(last_date.year, 1, 1)),
+            'one_year': _period_return(period_returns, period_dates, one_year_cutoff(last_date)),
+            'max_drawdown': drawdown(returns).min(),
+            'sharpe_ratio': empyrical.sharpe_ratio(returns),
+            'cagr': empyrical.cagr(returns),
+            'std': np.std(returns, ddof=1) * 100 if len(returns) > 1 else np.nan}
+
+
+def daily_returns(net, initial_cash):
+    """Daily returns of the portfolio value, the first day relative to ``initial_cash``."""
+    returns = np.empty(len(net))
+    returns[0] = net[0] / initial_cash - 1
+    returns[1:] = net[1:] / net[:-1] - 1
+    return returns
+
+
+def positions_history(perf, dates, net, sectors):
+    """Positions history frame from the perf ``positions`` column, one row per position and day."""
+    days, assets, amounts, cost_bases, last_prices = [], [], [], [], []
+    for day, positions in enumerate(perf['positions'].values):
+        for position in positions:
+            days.append(day)
+            assets.append(position['sid'])
+            amounts.append(position['amount'])
+            cost_bases.append(position['cost_basis'])
+            last_prices.append(position['last_sale_price'])
+    if not days:
+        return pd.DataFrame(columns=POSITIONS_COLUMNS)
+
+    rows = pd.DataFrame({'day': np.array(days, dtype=np.int64),
+                         'sid': np.array([asset.sid for asset in assets], dtype=np.int64),
+                         'quantity': np.array(amounts, dtype=np.float64),
+                         'avg_price': np.array(cost_bases, dtype=np.float64),
+                         'last_price': np.array(last_prices, dtype=np.float64)})
+    rows['symbol'] = np.array([asset.symbol for asset in assets], dtype=object)
+    rows['name'] = np.array([asset.asset_name for asset in assets], dtype=object)
+
+    # last price of the same symbol the session before
+    previous = rows[['day', 'symbol', 'last_price']].drop_duplicates(['day', 'symbol'], keep='last')
+    previous = previous.assign(day=previous['day'] + 1).rename(columns={'last_price': 'prev_price'})
+    rows = rows.merge(previous, on=['day', 'symbol'], how='left', sort=False)
+    in_prev = ~np.isnan(rows['prev_price'].values)
+
+    # a position is entered on the first day of every run of consecutive days held
+    order = np.lexsort((rows['day'].values, rows['sid'].values))
+    entry_day = pd.Series(np.where(in_prev, np.nan, rows['day'].values)[order]).ffill().values
+    entries = np.empty(len(rows), dtype=np.int64)
+    entries[order] = entry_day.astype(np.int64)
+
+    # exited the next session if the sid traded then and is no longer held, (day, sid) pairs as int keys
+    day, sid = rows['day'].values, rows['sid'].values
+    traded_days = np.array([traded_day for traded_day, transactions in enumerate(perf['transactions'].values)
+                            for _ in transactions], dtype=np.int64)
+    traded_sids = np.array([transaction['sid'].sid for transactions in perf['transactions'].values
+                            for transaction in transactions], dtype=np.int64)
+    key_base = max(sid.max(), traded_sids.max(initial=0)) + 1
+    next_keys = (day + 1) * key_base + sid
+    exited = np.isin(next_keys, traded_days * key_base + traded_sids) & ~np.isin(next_keys, day * key_base + sid)
+    exits = np.full(len(rows), '', dtype=object)
+    exits[exited] = dates[day[exited] + 1]
+
+    quantity, avg_price, last_price = rows['quantity'].values, rows['avg_price'].values, rows['last_price'].values
+    prev_price = rows['prev_price'].values
+    history = pd.DataFrame({'date': dates[day],
+                            'symbol': rows['symbol'].values,
+                            'position_date': dates[day],
+                            'name': rows['name'].values,
+                            'entry': dates[entries],
+                            'exit': exits,
+                            'sector': sectors(rows['sid'].values),
+                            'quantity': quantity,
+                            'avg_price': avg_price,
+                            'last_price': last_price,
+                            'daily_change': np.where(in_prev, last_price - prev_price, 0),
+                            'pct_daily_change': np.where(in_prev, last_price / prev_price - 1, 0),
+                            'total_change': last_price - avg_price,
+                            'pct_total_change': last_price / avg_price - 1,
+                            'pct_port': quantity * last_price / net[day],
+                            'book_value': quantity * avg_price,
+                            'mkt_value': quantity * last_price},
+                           columns=POSITIONS_COLUMNS)
+    return history
+
+
+def transactions_log(perf):
+    """Transaction log frame from the perf ``transactions`` column, indexed by order id."""
+    transactions = [transaction for day in perf['transactions'].values for transaction in day]
+    if not transactions:
+        return pd.DataFrame(columns=TRANSACTIONS_COLUMNS)
+    quantities = np.array([transaction['amount'] for transaction in transactions], dtype=np.int64)
+    return pd.DataFrame({'counter': np.arange(1, len(transactions) + 1),
+                         'date': [transaction['dt'].date() for transaction in transactions],
+                         'symbol': [transaction['sid'].symbol for transaction in transactions],
+                         'company_name': [transaction['sid'].asset_name for transaction in transactions],
+                         'transaction_type': np.where(quantities > 0, 'Buy', 'Sell').astype(object),
+                         'quantity': quantities,
+                         'avg_price': np.array([transaction['price'] for transaction in transactions])},
+                        index=pd.Index([transaction['order_id'] for transaction in transactions]),
+                        columns=TRANSACTIONS_COLUMNS)
+
+
+def analyze_perf(analysis_data, perf, benchmark_returns, initial_cash, sectors):
+    """Fill ``analysis_data`` from a zipline perf frame.
+
+    Parameters
+    ----------
+    analysis_data : AnalysisData
+        Filled in place.
+    perf : pd.DataFrame
+        Daily perf frame as passed to ``analyze(context, perf)``.
+    benchmark_returns : pd.Series
+        Daily benchmark returns, e.g. ``context.trading_environment.benchmark_returns``.
+    initial_cash : float
+        Capital base, the first day's return is taken relative to it.
+    sectors : callable
+        Maps an array of sids to their sector names.
+    """
+    dates = np.array(perf.index.date, dtype=object)
+    net = perf['portfolio_value'].values.astype(np.float64)
+    returns = daily_returns(net, initial_cash)
+
+    benchmark = benchmark_returns.copy()
+    benchmark.index = benchmark.index.date
+    benchmark = benchmark.loc[~benchmark.index.duplicated(keep='first')]
+    benchmark = benchmark.reindex(dates).values.astype(np.float64)
+    # the reports and charts use the days with both a strategy and a benchmark return
+    aligned = ~np.isnan(benchmark)
+    aligned_dates, aligned_returns, aligned_benchmark = dates[aligned], returns[aligned], benchmark[aligned]
+
+    benchmark_net = np.empty(len(net))
+    benchmark_net[0] = net[0]
+    benchmark_net[1:] = net[0] * np.cumprod(1 + np.nan_to_num(benchmark[1:]))
+
+    strategy_report = returns_report(aligned_returns, aligned_dates, returns, dates)
+    strategy_report['total_return'] = net[-1] - net[0]
+    strategy_report['alpha'], strategy_report['beta'] = empyrical.alpha_beta_aligned(aligned_returns,
+                                                                                      aligned_benchmark)
+    benchmark_report = returns_report(aligned_benchmark, aligned_dates)
+    benchmark_report['total_return'] = benchmark_net[-1] - benchmark_net[0]
+    benchmark_report['alpha'], benchmark_report['beta'] = 0, 1
+
+    holdings = positions_history(perf, dates, net, sectors)
+    transactions = transactions_log(perf)
+
+    chart_data = pd.DataFrame({'returns': aligned_returns,
+                               'benchmark_returns': aligned_benchmark,
+                               'drawdown': drawdown(aligned_returns),
+                               'benchmark_drawdown': drawdown(aligned_benchmark),
+                               'cagr': running_cagr(aligned_returns),
+                               'benchmark_cagr': running_cagr(aligned_benchmark)},
+                              index=pd.Index(aligned_dates, name='date'))
+    chart_data['positions_count'] = holdings.groupby('date').size()
+    chart_data['positions_count'] = chart_data['positions_count'].fillna(0)
+
+    analysis_data.chart_data = chart_data
+    analysis_data.strategy_report = strategy_report
+    analysis_data.benchmark_report = benchmark_report
+    holding_dates = np.unique(holdings['date'].values) if len(holdings) else []
+    if len(holding_dates) < 30:
+        analysis_data.holdings_data = holdings
+    else:
+        analysis_data.holdings_data = holdings[holdings['date'] >= holding_dates[-30]]
+    analysis_data.holdings_data_historical = holdings
+    analysis_data.transactions_data = transactions
+    if len(dates) < 30:
+        analysis_data.monthly_transactions_data = transactions
+    else:
+        analysis_data.monthly_transactions_data = transactions[transactions['date'] >= dates[-30]]
+    return analysis_data
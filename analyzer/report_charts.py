@@ -0,0 +1,158 @@
+"""
+Off-screen rendering of the PDF report charts.
+
+The performance and comparison charts of the report are drawn with the Agg canvas in a
+process pool instead of on the live Qt canvases. Every chart is a picklable job built from
+the snapshot's chart data and the rolling cache, and the PNG is named after a hash of the
+job: a chart whose data did not change since a previous export is not drawn again.
+"""
+import calendar
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from analyzer.downsample import min_max_rows, point_budget
+from analyzer.rolling import rolling_cache
+
+# part of every chart hash, bump it when the drawing code changes
+RENDER_VERSION = 1
+
+FIGURE_WIDTH = 1000
+
+PERFORMANCE_CHARTS = ['returns', 'drawdown', 'alpha', 'beta', 'sharpe', 'std_dev', 'positions']
+CALENDAR_CHARTS = {'monthly': 'M', 'quarterly': 'Q'}
+
+_executor = None
+
+
+def executor():
+    """Process pool shared by the exports of this process, started on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1))
+    return _executor
+
+
+def _line_job(name, dates, series, labels, ylabel, ylim=None, tick_right=True):
+    series = [np.asarray(s, dtype=np.float64) for s in series]
+    # the figure is 10 inches at 100 dpi, only the rows drawn at that width are sent to the pool
+    rows = min_max_rows(series, point_budget(FIGURE_WIDTH))
+    if rows is not None:
+        dates, series = dates[rows], [s[rows] for s in series]
+    return {'kind': 'line', 'name': name, 'dates': dates, 'series': series,
+            'labels': labels, 'ylabel': ylabel, 'ylim': ylim, 'tick_right': tick_right}
+
+
+def _bounded(values, pad=0):
+    # the y axis always includes 0, as on the performance tab
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    return min(0, values.min() - pad), max(0, values.max() + pad)
+
+
+def chart_jobs(analysis_data, benchmark_symbol='SPY'):
+    """Jobs of the performance and calendar charts of the report, by chart name."""
+    chart_data = analysis_data.chart_data
+    dates = np.array(chart_data.index, dtype='datetime64[D]')
+    returns = chart_data['returns'].values
+    benchmark_returns = chart_data['benchmark_returns'].values
+    jobs = {}
+
+    jobs['returns'] = _line_job('returns', dates, [(np.cumprod(1 + returns) - 1) * 100,
+                                                   (np.cumprod(1 + benchmark_returns) - 1) * 100],
+                                ['Strategy', benchmark_symbol], 'Return', tick_right=False)
+    jobs['drawdown'] = _line_job('drawdown', dates, [100 * chart_data['drawdown'].values,
+                                                     100 * chart_data['benchmark_drawdown'].values],
+                                 ['Strategy', benchmark_symbol], 'Drawdown')
+    for name, metric, scale, ylabel in [('alpha', 'alpha', 100, 'Alpha'), ('beta', 'beta', 1, 'Beta'),
+                                        ('sharpe', 'sharpe', 1, 'Sharpe'), ('std_dev', 'std', 100, 'Std Dev')]:
+        series = rolling_cache.get(analysis_data, metric).values * scale
+        jobs[name] = _line_job(name, dates, [series], ['Strategy'], ylabel, _bounded(series))
+    positions = chart_data['positions_count'].values.astype(np.float64)
+    jobs['positions'] = _line_job('positions', dates, [positions], ['Strategy'], 'Positions', _bounded(positions, 1))
+
+    for name, period in CALENDAR_CHARTS.items():
+        period_returns = rolling_cache.get(analysis_data, 'period_returns', period)
+        jobs[name] = {'kind': 'calendar', 'name': name, 'period': name,
+                      'dates': np.array(period_returns.index, dtype='datetime64[D]'),
+                      'values': period_returns.values.astype(np.float64)}
+    return jobs
+
+
+def job_path(job, folder):
+    """PNG path of ``job`` in ``folder``, named after a hash of its content."""
+    digest = hashlib.sha1(pickle.dumps((RENDER_VERSION, job), protocol=4)).hexdigest()[:16]
+    return os.path.join(folder, '{}-{}.png'.format(job['name'], digest))
+
+
+def render_chart(job, path):
+    """Draw ``job`` to ``path`` with the Agg canvas, runs in the pool's worker processes."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 7))
+    FigureCanvasAgg(figure)
+    if job['kind'] == 'line':
+        ax = figure.add_subplot(1, 1, 1)
+        for series in job['series']:
+            ax.plot(job['dates'], series)
+        if job['ylim'] is not None:
+            ax.set_ylim(*job['ylim'])
+        if job['tick_right']:
+            ax.yaxis.tick_right()
+        ax.set_ylabel(job['ylabel'])
+        ax.legend(job['labels'], loc='upper left')
+        ax.grid(True)
+    else:
+        _draw_calendar(figure, job)
+
+    tmp_path = path + '.tmp'
+    figure.savefig(tmp_path, format='png')
+    os.replace(tmp_path, path)
+    return path
+
+
+def _draw_calendar(figure, job):
+    import pandas as pd
+    import seaborn
+    from matplotlib import gridspec
+    from matplotlib.ticker import FuncFormatter
+
+    gs = gridspec.GridSpec(1, 27)
+    heatmap_ax = figure.add_subplot(gs[0, 0:24], xticks=[], yticks=[])
+    colorbar_ax = figure.add_subplot(gs[0, 26])
+
+    index = pd.DatetimeIndex(job['dates'])
+    heatmap_df = pd.DataFrame({'returns': job['values'], 'Year': index.year})
+    if job['period'] == 'monthly':
+        heatmap_ax.yaxis.label.set_visible(False)
+        heatmap_df['Month'] = index.month
+        heatmap_returns = heatmap_df.pivot(index='Month', columns='Year', values='returns').sort_index()
+        heatmap_returns.rename(index=lambda x: calendar.month_abbr[x], inplace=True)
+    else:
+        heatmap_df['Quarter'] = index.month
+        heatmap_returns = heatmap_df.pivot(index='Quarter', columns='Year', values='returns').sort_index()
+
+    graph = seaborn.heatmap(heatmap_returns, annot=True, annot_kws={"size": 7}, ax=heatmap_ax, fmt='.1%',
+                            cbar=True, cbar_ax=colorbar_ax, cmap='RdYlGn', center=0, robust=True,
+                            cbar_kws={'format': FuncFormatter(lambda x, pos: '{:.1%}'.format(x))})
+    graph.xaxis.label.set_visible(False)
+    graph.set_yticklabels(graph.get_yticklabels())
+
+
+def submit_charts(jobs, folder):
+    """Start drawing the charts that are not in ``folder`` yet.
+
+    Returns the chart paths by name and the futures of the charts being drawn.
+    """
+    paths, futures = {}, []
+    for name, job in jobs.items():
+        path = job_path(job, folder)
+        paths[name] = path
+        if not os.path.exists(path):
+            futures.append(executor().submit(render_chart, job, path))
+    return paths, futures
@@ -0,0 +1,232 @@
+"""
+Persistent store of backtest results.
+
+Every finished backtest is written to a run folder of the store, so a past run can be
+looked at again, or compared with other runs, without simulating it again:
+
+    <store>/<algo name>-<key>/manifest.json     algo name, parameters, bundle timestamp,
+                                                code hash, info data, reports and schema
+    <store>/<algo name>-<key>/<table>.<column>.npy
+                                                one numpy file per column
+
+The key is a hash of the algo name, the parameters, the bundle timestamp and the code
+hash, a run of the same code on the same data with the same parameters replaces the
+previous one. Columns are loaded memory-mapped: opening a run reads the manifest and maps
+the files, rows are only read from disk when a view or a metric touches them. Text columns
+are stored as fixed width strings, empty where the journal holds None. Positions an out of
+core run spilled to disk are stored as their compressed chunks (see analyzer.chunks).
+
+Runs are stored when strategy_data['store_results'] is set, the newest
+strategy_data['result_store_keep'] runs of an algo are kept (10 by default). A stored run
+is opened with Runs > Open Stored Run in the analyzer window, or without a backtest with
+
+    python -m analyzer.views.main results/store/<algo name>-<key>
+"""
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from analyzer.analysis_data import AnalysisData, next_version
+from analyzer.artifacts import _json_value, metrics_dict
+from analyzer.tables import ColumnTable, read_only
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+TABLES = ['holdings_data_historical', 'transactions_data']
+
+# strategy_data entries that only affect how a run is held in memory, stored or shown, not its results
+DISPLAY_KEYS = {'headless', 'deferred_analysis', 'publish_interval', 'results_path', 'result_store',
+                'notification_transport', 'tws_uri', 'out_of_core', 'holdings_window_days', 'store_results',
+                'result_store_keep'}
+
+
+def default_store_path():
+    return os.path.join(os.getcwd(), 'results', 'store')
+
+
+def run_params(strategy_data):
+    """Parameters of a run, the scalar entries of ``strategy_data`` or its 'params' entry."""
+    if strategy_data.get('params') is not None:
+        return {key: _json_value(value) for key, value in strategy_data['params'].items()}
+    return {key: _json_value(value) for key, value in sorted(strategy_data.items())
+            if key not in DISPLAY_KEYS and not callable(value)}
+
+
+def code_hash(strategy_data):
+    """Hash of the source files of the algo functions in ``strategy_data``."""
+    digest = hashlib.sha1()
+    files = set()
+    for value in strategy_data.values():
+        if callable(value):
+            try:
+                files.add(inspect.getsourcefile(value))
+            except TypeError:
+                continue
+    for path in sorted(f for f in files if f is not None and os.path.exists(f)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def bundle_timestamp(bundle):
+    """Ingestion timestamp of the most recent data of ``bundle``, None if zipline can not tell."""
+    try:
+        from zipline.data.bundles import most_recent_data
+        return os.path.basename(most_recent_data(bundle, pd.Timestamp.utcnow()))
+    except Exception:
+        return None
+
+
+def run_key(algo_name, params, bundle_time, code):
+    text = json.dumps([algo_name, params, bundle_time, code], sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _storable(array):
+    # object columns become dates or fixed width strings (names, symbols, exits), both can be memory-mapped
+    array = np.asarray(array)
+    if array.dtype != object:
+        return array
+    if len(array) > 0 and all(isinstance(value, datetime.date) for value in array):
+        return array.astype('datetime64[D]')
+    return np.array(['' if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+                     for value in array], dtype=str)
+
+
+def _load(path):
+    # empty files can not be mapped
+    array = np.load(path, mmap_mode='r')
+    return array if array.size > 0 else np.load(path)
+
+
+class ResultStore:
+    """Run folders below ``path``.
+
+    Args:
+      path: Folder of the store, results/store of the working directory if None.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+
+    def run_path(self, algo_name, key):
+        return os.path.join(self.path, '{}-{}'.format(algo_name, key))
+
+    def write(self, analysis_data, algo_name, params, bundle_time, code):
+        """Store ``analysis_data`` as the run of ``algo_name`` with these inputs, returns the run folder."""
+        key = run_key(algo_name, params, bundle_time, code)
+        path = self.run_path(algo_name, key)
+        tmp_path = '{}.tmp-{}'.format(path, os.getpid())
+        os.makedirs(tmp_path)
+
+        schema = {}
+        chart_data = analysis_data.chart_data
+        if chart_data is not None and len(chart_data) > 0:
+            np.save(os.path.join(tmp_path, 'chart.values.npy'), np.asarray(chart_data.values, dtype=np.float64))
+            np.save(os.path.join(tmp_path, 'chart.date.npy'), np.array(chart_data.index, dtype='datetime64[D]'))
+            schema['chart'] = {'columns': [str(name) for name in chart_data.columns]}
+        for name in TABLES:
+            table = analysis_data.table(name)
+            if table is None:
+                continue
+            for column, values in table.columns.items():
+                np.save(os.path.join(tmp_path, '{}.{}.npy'.format(name, column)), _storable(values))
+            if table.index is not None:
+                np.save(os.path.join(tmp_path, '{}.index.npy'.format(name)), _storable(table.index))
+            schema[name] = {'columns': list(table.columns), 'index': table.index is not None, 'start': table.start}
+        # months an out of core run spilled are copied as they are, they are read one chunk at a time
+        for chunk in analysis_data.holdings_chunks:
+            shutil.copy(chunk, tmp_path)
+        schema['holdings_chunks'] = [os.path.basename(chunk) for chunk in analysis_data.holdings_chunks]
+
+        manifest = dict(metrics_dict(analysis_data), format=FORMAT_VERSION, key=key, algo_name=algo_name,
+                        params=params, bundle_timestamp=bundle_time, code_hash=code,
+                        created=time.strftime('%Y-%m-%dT%H:%M:%S'), schema=schema)
+        with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # readers never see a partly written run
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        return path
+
+    def runs(self, algo_name=None, **filters):
+        """Manifests of the stored runs, newest first, e.g. runs('long_term_high_risk', code_hash=h).
+
+        Each manifest has its run folder under 'path'.
+        """
+        manifests = []
+        if not os.path.isdir(self.path):
+            return manifests
+        for entry in os.listdir(self.path):
+            manifest_file = os.path.join(self.path, entry, MANIFEST_FILE)
+            if '.tmp-' in entry or not os.path.exists(manifest_file):
+                continue
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+            if algo_name is not None and manifest['algo_name'] != algo_name:
+                continue
+            if any(manifest.get(name) != value for name, value in filters.items()):
+                continue
+            manifest['path'] = os.path.join(self.path, entry)
+            manifests.append(manifest)
+        return sorted(manifests, key=lambda m: m['created'], reverse=True)
+
+    def prune(self, algo_name, keep):
+        """Remove the runs of ``algo_name`` but the ``keep`` newest, returns the removed run folders."""
+        removed = [manifest['path'] for manifest in self.runs(algo_name)[keep:]]
+        for path in removed:
+            shutil.rmtree(path)
+        return removed
+
+    def find(self, algo_name, params, bundle_time, code):
+        """Run folder of these inputs, None if they were never stored."""
+        path = self.run_path(algo_name, run_key(algo_name, params, bundle_time, code))
+        return path if os.path.exists(os.path.join(path, MANIFEST_FILE)) else None
+
+
+def open_run(path):
+    """AnalysisData of the run stored in ``path``, its columns memory-mapped read-only."""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    analysis_data = AnalysisData(next_version())
+    analysis_data.info_data = dict(manifest['info'], date_range_go_button=True)
+    analysis_data.strategy_report = manifest['strategy'] or None
+    analysis_data.benchmark_report = manifest['benchmark'] or None
+
+    schema = manifest['schema']
+    if 'chart' in schema:
+        index = pd.Index(_load(os.path.join(path, 'chart.date.npy')).astype(object), name='date')
+        analysis_data.chart_data = pd.DataFrame(read_only(_load(os.path.join(path, 'chart.values.npy'))),
+                                                index=index, columns=schema['chart']['columns'], copy=False)
+    for name in TABLES:
+        if name not in schema:
+            continue
+        columns = {column: _load(os.path.join(path, '{}.{}.npy'.format(name, column)))
+                   for column in schema[name]['columns']}
+        index = _load(os.path.join(path, '{}.index.npy'.format(name))) if schema[name]['index'] else None
+        setattr(analysis_data, name, ColumnTable(columns, index=index, start=schema[name]['start']))
+    analysis_data.holdings_chunks = tuple(os.path.join(path, chunk) for chunk in schema.get('holdings_chunks', []))
+
+    # the last 30 days, as the analyzer publishes them
+    holdings = analysis_data.table('holdings_data_historical')
+    transactions = analysis_data.table('transactions_data')
+    if holdings is not None and len(holdings) > 0:
+        dates = holdings.columns['date']
+        first = np.unique(dates)[-30:][0]
+        analysis_data.holdings_data = holdings.rows(int(np.searchsorted(dates, first)))
+    if transactions is not None and analysis_data.chart_data is not None and len(analysis_data.chart_data) > 0:
+        first = np.datetime64(analysis_data.chart_data.index[-30:][0], 'D')
+        analysis_data.monthly_transactions_data = transactions.rows(
+            int(np.searchsorted(transactions.columns['date'], first)))
+    return analysis_data
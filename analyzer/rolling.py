@@ -0,0 +1,126 @@
+"""
+Rolling statistics of the chart data, cached per snapshot version.
+
+The performance plots, the PDF report and the comparison export all show the same rolling
+alpha, beta, sharpe and standard deviation. They are computed from window sums of cumulative
+sums, O(n) for any window, once per (metric, window, snapshot version) and shared through
+``rolling_cache``. The values follow empyrical's roll_alpha, roll_beta and roll_sharpe_ratio
+and pandas' rolling std, NaN until the first full window.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analyzer.metrics import ANNUALIZATION
+
+
+def window_sums(values, window):
+    """Sum of the ``window`` values ending at every position, NaN before the first full window.
+
+    2-D values are summed per column, e.g. the returns of several runs.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.full(values.shape, np.nan)
+    if 0 < window <= len(values):
+        cumsum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+        sums[window - 1:] = cumsum[window:] - cumsum[:-window]
+    return sums
+
+
+def _shifted(values):
+    # moments of values shifted by the first one keep the cumulative sums small
+    values = np.asarray(values, dtype=np.float64)
+    return values - (values[0] if len(values) else 0), (values[0] if len(values) else 0)
+
+
+def rolling_mean_var(values, window, ddof=1):
+    """Rolling mean and variance of ``values``."""
+    shifted, shift = _shifted(values)
+    sums, squares = window_sums(shifted, window), window_sums(shifted ** 2, window)
+    variance = np.maximum(squares - sums ** 2 / window, 0) / (window - ddof) if window > ddof else np.nan
+    return sums / window + shift, variance
+
+
+def rolling_std(returns, window):
+    return np.sqrt(rolling_mean_var(returns, window)[1])
+
+
+def rolling_sharpe(returns, window):
+    mean, variance = rolling_mean_var(returns, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return mean / np.sqrt(variance) * np.sqrt(ANNUALIZATION)
+
+
+def rolling_beta(returns, benchmark_returns, window):
+    """Rolling beta, NaN where the benchmark variance of the window is below 1e-30."""
+    if window < 2:
+        return np.full(np.shape(returns), np.nan)
+    shifted, _ = _shifted(returns)
+    benchmark_shifted, _ = _shifted(benchmark_returns)
+    sums, benchmark_sums = window_sums(shifted, window), window_sums(benchmark_shifted, window)
+    covariance = (window_sums(shifted * benchmark_shifted, window) - sums * benchmark_sums / window) / window
+    variance = np.maximum(window_sums(benchmark_shifted ** 2, window) - benchmark_sums ** 2 / window, 0) / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(variance < 1e-30, np.nan, covariance / variance)
+
+
+def rolling_alpha(returns, benchmark_returns, window):
+    """Rolling annualized alpha, ``(mean(r - beta * b) + 1) ** 252 - 1`` per window."""
+    beta = rolling_beta(returns, benchmark_returns, window)
+    mean = rolling_mean_var(returns, window)[0]
+    benchmark_mean = rolling_mean_var(benchmark_returns, window)[0]
+    return (mean - beta * benchmark_mean + 1) ** ANNUALIZATION - 1
+
+
+def period_returns(chart_data, period):
+    """Compounded returns per calendar period, e.g. 'M', 'Q' or 'Y'."""
+    returns = pd.Series(chart_data['returns'].values, index=pd.to_datetime(chart_data.index))
+    return (returns + 1).resample(period).prod() - 1
+
+
+# metric name -> function of (chart_data, window)
+METRICS = {
+    'alpha': lambda data, window: rolling_alpha(data['returns'].values, data['benchmark_returns'].values, window),
+    'beta': lambda data, window: rolling_beta(data['returns'].values, data['benchmark_returns'].values, window),
+    'sharpe': lambda data, window: rolling_sharpe(data['returns'].values, window),
+    'benchmark_sharpe': lambda data, window: rolling_sharpe(data['benchmark_returns'].values, window),
+    'std': lambda data, window: rolling_std(data['returns'].values, window),
+    'benchmark_std': lambda data, window: rolling_std(data['benchmark_returns'].values, window),
+}
+
+
+class RollingCache:
+    """Rolling series per (metric, window, snapshot version), least recently used ones dropped first.
+
+    Args:
+      size: Number of series kept.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.series = OrderedDict()
+
+    def get(self, analysis_data, metric, window=ANNUALIZATION):
+        """Rolling ``metric`` of the chart data of ``analysis_data`` as a Series on the chart index.
+
+        ``metric`` is one of METRICS, or 'period_returns' with a resample rule as the window.
+        """
+        key = (metric, window, analysis_data.version, analysis_data.view_range)
+        series = self.series.get(key)
+        if series is None:
+            chart_data = analysis_data.chart_data
+            if metric == 'period_returns':
+                series = period_returns(chart_data, window)
+            else:
+                series = pd.Series(METRICS[metric](chart_data, window), index=chart_data.index, name=metric)
+            self.series[key] = series
+            if len(self.series) > self.size:
+                self.series.popitem(last=False)
+        else:
+            self.series.move_to_end(key)
+        return series
+
+
+# shared by the views, the exports and the pdf report
+rolling_cache = RollingCache()
@@ -0,0 +1,127 @@
+"""
+Side by side comparison of stored runs (see analyzer.result_store).
+
+The daily returns of N runs are loaded in a process pool, aligned on the sessions all of
+them cover, and held as one days x runs array. Every metric of the comparison table is
+then computed for all runs at once along the first axis, the rolling statistics with the
+window sums of analyzer.rolling.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analyzer.metrics import ANNUALIZATION
+from analyzer.result_store import MANIFEST_FILE
+from analyzer.rolling import rolling_alpha, rolling_beta, rolling_sharpe, rolling_std
+
+# metric table rows, in display order
+METRICS = ['total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown', 'alpha', 'beta',
+           'rolling_sharpe', 'rolling_std', 'rolling_alpha', 'rolling_beta', 'benchmark_total_return']
+
+
+def load_run_returns(path):
+    """Label parts, dates, returns and benchmark returns of the run stored in ``path``."""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    columns = manifest['schema']['chart']['columns']
+    values = np.load(os.path.join(path, 'chart.values.npy'), mmap_mode='r')
+    return {'algo_name': manifest['algo_name'], 'key': manifest['key'], 'created': manifest['created'],
+            'dates': np.load(os.path.join(path, 'chart.date.npy')),
+            'returns': np.array(values[:, columns.index('returns')]),
+            'benchmark_returns': np.array(values[:, columns.index('benchmark_returns')])}
+
+
+def load_runs(paths, max_workers=None):
+    """Returns of the runs in ``paths``, read in a process pool when there are several."""
+    if len(paths) < 2:
+        return [load_run_returns(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(paths), os.cpu_count() or 1)) as pool:
+        return list(pool.map(load_run_returns, paths))
+
+
+def run_labels(runs):
+    """Algo names, with the run key added where several runs of an algo are compared."""
+    names = [run['algo_name'] for run in runs]
+    return [name if names.count(name) == 1 else '{} {}'.format(name, run['key'][:6])
+            for name, run in zip(names, runs)]
+
+
+def align(runs):
+    """Sessions covered by every run, and the days x runs returns and benchmark returns on them."""
+    dates = runs[0]['dates']
+    for run in runs[1:]:
+        dates = np.intersect1d(dates, run['dates'])
+    returns = np.empty((len(dates), len(runs)))
+    benchmark = np.empty((len(dates), len(runs)))
+    for i, run in enumerate(runs):
+        rows = np.searchsorted(run['dates'], dates)
+        returns[:, i] = run['returns'][rows]
+        benchmark[:, i] = run['benchmark_returns'][rows]
+    return dates, returns, benchmark
+
+
+def metric_table(returns, benchmark, window=ANNUALIZATION):
+    """Metrics x runs array of METRICS for days x runs ``returns`` and ``benchmark`` returns.
+
+    Rolling metrics are the last value of their ``window`` days rolling series.
+    """
+    days = len(returns)
+    wealth = np.cumprod(1 + returns, axis=0)
+    total_return = wealth[-1] - 1
+    # the starting value is a peak too, as in perf_analysis.drawdown and empyrical
+    drawdown = wealth / np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0) - 1
+    std = returns.std(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = returns.mean(axis=0) / std * np.sqrt(ANNUALIZATION)
+    beta = rolling_beta(returns, benchmark, days)[-1]
+    alpha = rolling_alpha(returns, benchmark, days)[-1]
+
+    rows = {'total_return': total_return,
+            'cagr': (1 + total_return) ** (ANNUALIZATION / days) - 1,
+            'volatility': std * np.sqrt(ANNUALIZATION),
+            'sharpe': sharpe,
+            'max_drawdown': drawdown.min(axis=0),
+            'alpha': alpha,
+            'beta': beta,
+            'rolling_sharpe': rolling_sharpe(returns, window)[-1],
+            'rolling_std': rolling_std(returns, window)[-1],
+            'rolling_alpha': rolling_alpha(returns, benchmark, window)[-1],
+            'rolling_beta': rolling_beta(returns, benchmark, window)[-1],
+            'benchmark_total_return': np.prod(1 + benchmark, axis=0) - 1}
+    return np.vstack([rows[name] for name in METRICS])
+
+
+class RunComparison:
+    """Stored runs aligned on their common sessions.
+
+    Args:
+      paths: Run folders of the result store.
+      window: Days of the rolling metrics.
+    """
+
+    def __init__(self, paths, window=ANNUALIZATION, max_workers=None):
+        runs = load_runs(list(paths), max_workers)
+        self.paths = list(paths)
+        self.labels = run_labels(runs)
+        self.window = window
+        self.dates, self.returns, self.benchmark_returns = align(runs)
+        self.table = metric_table(self.returns, self.benchmark_returns, window) if len(self.dates) > 1 else \
+            np.full((len(METRICS), len(runs)), np.nan)
+
+    def metrics(self):
+        """Metric table, a metric per row and a run per column."""
+        return pd.DataFrame(self.table, index=METRICS, columns=self.labels)
+
+    def cumulative_returns(self):
+        """Cumulative returns of every run on the common sessions, a run per column."""
+        return pd.DataFrame(np.cumprod(1 + self.returns, axis=0) - 1,
+                            index=pd.Index(self.dates.astype(object), name='date'), columns=self.labels)
+
+    def export(self, path):
+        """Write the metric table and the cumulative returns as csv files to ``path``."""
+        self.metrics().to_csv(os.path.join(path, 'runs_comparison_metrics.csv'))
+        self.cumulative_returns().to_csv(os.path.join(path, 'runs_comparison_returns.csv'))
+        return path
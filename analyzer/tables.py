@@ -0,0 +1,59 @@
+"""
+Read-only column tables of the analysis snapshots.
+
+The analyzer's journals only ever append: rows below the filled size are never written
+again, and growing a buffer allocates a new array. A snapshot therefore takes views of the
+filled rows instead of copies, successive versions share the same memory, and the
+DataFrame a view needs is only built when it is asked for.
+"""
+import numpy as np
+import pandas as pd
+
+
+def read_only(array):
+    """View of ``array`` that can not be written through."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class ColumnTable:
+    """Equal length numpy columns with row labels.
+
+    Args:
+      columns: Column name to array, in the column order of the frame.
+      index: Row labels, a range from ``start`` if None.
+      start: Label of the first row when ``index`` is None.
+    """
+
+    def __init__(self, columns, index=None, start=0):
+        self.columns = {name: read_only(np.asarray(array)) for name, array in columns.items()}
+        self.index = None if index is None else read_only(np.asarray(index))
+        self.start = start
+        self._frame = None
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Table of the columns of ``frame``, e.g. a frame of the deferred analysis."""
+        columns = {name: frame[name].values for name in frame.columns}
+        if isinstance(frame.index, pd.RangeIndex) and frame.index.step == 1:
+            return cls(columns, start=frame.index.start)
+        return cls(columns, index=frame.index.values)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def rows(self, start, stop=None):
+        """Table of the rows from position ``start`` to ``stop``, sharing the columns."""
+        stop = len(self) if stop is None else stop
+        return ColumnTable({name: array[start:stop] for name, array in self.columns.items()},
+                           None if self.index is None else self.index[start:stop], self.start + start)
+
+    def frame(self):
+        """DataFrame of the table, built once, dates as datetime.date objects like the views expect."""
+        if self._frame is None:
+            data = {name: array.astype(object) if array.dtype.kind == 'M' else array
+                    for name, array in self.columns.items()}
+            index = pd.RangeIndex(self.start, self.start + len(self)) if self.index is None else pd.Index(self.index)
+            self._frame = pd.DataFrame(data, index=index, columns=list(self.columns))
+        return self._frame
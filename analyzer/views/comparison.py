@@ -5,10 +5,10 @@ from matplotlib.figure import Figure
 from matplotlib import gridspec
 import pandas as pd
 import calendar
-import seaborn
 from utils.log_utils import results_path
 import os
 from matplotlib.ticker import FuncFormatter
+from analyzer.rolling import rolling_cache
 
 
 class ComparisonTab(AnalysisTab):
@@ -131,6 +131,8 @@ class CalendarPlotter(FigureCanvas):
             heatmap_returns = heatmap_df.pivot('Year', 'Year_x', 'returns')
             heatmap_returns.sort_index(level=0, ascending=True, inplace=True)
 
+        import seaborn
+
         cbar_fmt = lambda x, pos: '{:.1%}'.format(x)
         graph = seaborn.heatmap(heatmap_returns, annot=True, annot_kws={"size": 7}, ax=self.heatmap_ax, fmt='.1%',
                                 cbar=True, cbar_ax=self.colorbar_ax, cmap='RdYlGn', center=0, robust=True,
@@ -149,7 +151,5 @@ class CalendarPlotter(FigureCanvas):
         elif self.selected_period == 'yearly':
             sample_period = 'Y'
 
-        self.analysis_data.chart_data.index = pd.to_datetime(self.analysis_data.chart_data.index)
-
         if self.selected_metric == 'returns':
-            return (self.analysis_data.chart_data.returns + 1).resample(sample_period).prod() - 1
+            return rolling_cache.get(self.analysis_data, 'period_returns', sample_period)
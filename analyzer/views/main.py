@@ -6,20 +6,26 @@ from analyzer.views.holdings import HoldingsTab
 from analyzer.views.transactions import TransactionsTab
 from analyzer.views.comparison import ComparisonTab
 from analyzer.analysis_data import AnalysisData
-from analyzer.exporter import PdfGenerator
 from utils.log_utils import results_path
 import os
+import sys
 import pandas as pd
-import empyrical
+from analyzer.rolling import rolling_cache
+from analyzer.chunks import write_history_csv
 
 
 class AnalyzerWindow(QtWidgets.QMainWindow):
     all_tabs_dict = {}
     updateSignal = QtCore.pyqtSignal(AnalysisData)
+    # traceback of the bar the analysis worker stopped on
+    errorSignal = QtCore.pyqtSignal(str)
 
     def __init__(self, analysis_data, strategy_data, app):
         self.app = app
         self.analysis_data = analysis_data
+        # snapshot version last rendered per tab, and whether a render of the latest snapshot is pending
+        self.rendered_versions = {}
+        self.render_pending = False
         QtWidgets.QMainWindow.__init__(self)
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         self.setWindowTitle(self.analysis_data.info_data['algo_name'])
@@ -64,6 +70,11 @@ class AnalyzerWindow(QtWidgets.QMainWindow):
 
         self.menuBar().addMenu(export_menu)
 
+        runs_menu = QtWidgets.QMenu('&Runs', self)
+        runs_menu.addAction('&Open Stored Run...', self.open_stored_run, QtCore.Qt.CTRL + QtCore.Qt.Key_O)
+        runs_menu.addAction('&Compare Stored Runs...', self.compare_stored_runs)
+        self.menuBar().addMenu(runs_menu)
+
         self.main_widget.setFocus()
         self.setCentralWidget(self.main_widget)
 
@@ -77,6 +88,13 @@ class AnalyzerWindow(QtWidgets.QMainWindow):
 
         # connect to event
         self.updateSignal.connect(self.update_plot)
+        self.errorSignal.connect(self.show_error)
+
+    def show_error(self, error):
+        self.setWindowTitle('{} - analysis stopped'.format(self.analysis_data.info_data['algo_name']))
+        QtWidgets.QMessageBox.critical(self, 'Analysis stopped',
+                                       'The analysis stopped on an error, the results shown are '
+                                       'incomplete.\n\n' + error)
 
     def tab_changed(self):
         if self.analysis_data is not None:
@@ -86,8 +104,32 @@ class AnalyzerWindow(QtWidgets.QMainWindow):
                 print(e)
 
     def generate_pdf(self):
-        pdf_generator = PdfGenerator(tabs=self.all_tabs_dict, analysis_data=self.analysis_data, app=self.app)
-        pdf_generator.generate()
+        # QtWebEngine is slow to load and only needed for the pdf export
+        from analyzer.exporter import PdfGenerator
+
+        # kept until the next export, the charts are drawn in the background
+        self.pdf_generator = PdfGenerator(tabs=self.all_tabs_dict, analysis_data=self.analysis_data, app=self.app)
+        self.pdf_generator.generate()
+
+    def open_stored_run(self):
+        from analyzer.result_store import default_store_path, open_run
+
+        path = QtWidgets.QFileDialog.getExistingDirectory(self, 'Open Stored Run', default_store_path())
+        if not path:
+            return
+        try:
+            analysis_data = open_run(path)
+        except Exception as e:
+            print(e)
+            return
+        self.setWindowTitle(analysis_data.info_data['algo_name'])
+        self.updateSignal.emit(analysis_data)
+
+    def compare_stored_runs(self):
+        from analyzer.views.runs import RunsComparisonDialog
+
+        self.runs_dialog = RunsComparisonDialog(self)
+        self.runs_dialog.show()
 
     def export_transactions_data(self):
         export_file = os.path.join(results_path, 'transactions.csv')
@@ -95,41 +137,32 @@ class AnalyzerWindow(QtWidgets.QMainWindow):
 
     def export_holdings_data(self):
         export_file = os.path.join(results_path, 'holdings.csv')
-        self.analysis_data.holdings_data_historical['date'] = self.analysis_data.holdings_data_historical[
-            ~self.analysis_data.holdings_data_historical.duplicated('date')]
-        self.analysis_data.holdings_data_historical.fillna('', inplace=True)
-        self.analysis_data.holdings_data_historical.to_csv(export_file, index=False)
+        # the date is only written on the first row of every day, spilled months are read one at a time
+        write_history_csv(self.analysis_data, export_file, date_once=True)
 
     def export_comparisons_data(self):
+        # the rolling metrics are added to a copy, the snapshot is shared with the views
+        chart_data = self.analysis_data.chart_data.copy()
+        chart_data['alpha'] = rolling_cache.get(self.analysis_data, 'alpha') * 100
+        chart_data['beta'] = rolling_cache.get(self.analysis_data, 'beta')
+        chart_data['sharpe'] = rolling_cache.get(self.analysis_data, 'sharpe')
 
-        self.analysis_data.chart_data['alpha'] = empyrical.roll_alpha(self.analysis_data.chart_data.returns,
-                                                                      self.analysis_data.chart_data.benchmark_returns,
-                                                                      252) * 100
-        self.analysis_data.chart_data['beta'] = empyrical.roll_beta(self.analysis_data.chart_data.returns,
-                                                                    self.analysis_data.chart_data.benchmark_returns,
-                                                                    252)
-        self.analysis_data.chart_data['sharpe'] = empyrical.roll_sharpe_ratio(self.analysis_data.chart_data.returns,
-                                                                              252)
+        chart_data['benchmark_sharpe'] = rolling_cache.get(self.analysis_data, 'benchmark_sharpe')
 
-        self.analysis_data.chart_data['benchmark_sharpe'] = empyrical.roll_sharpe_ratio(
-            self.analysis_data.chart_data.benchmark_returns, 252)
+        chart_data['std'] = rolling_cache.get(self.analysis_data, 'std') * 100
 
-        self.analysis_data.chart_data['std'] = self.analysis_data.chart_data.returns.rolling(252).std() * 100
+        chart_data['benchmark_std'] = rolling_cache.get(self.analysis_data, 'benchmark_std') * 100
 
-        self.analysis_data.chart_data['benchmark_std'] = self.analysis_data.chart_data.benchmark_returns.rolling(
-            252).std() * 100
+        chart_data['outperformance'] = chart_data['returns'] - chart_data['benchmark_returns']
 
-        self.analysis_data.chart_data['outperformance'] = self.analysis_data.chart_data['returns'] - \
-                                                          self.analysis_data.chart_data['benchmark_returns']
+        chart_data.to_csv(os.path.join(results_path, 'comparison_daily.csv'))
 
-        self.analysis_data.chart_data.to_csv(os.path.join(results_path, 'comparison_daily.csv'))
+        chart_data.index = pd.to_datetime(chart_data.index)
 
-        self.analysis_data.chart_data.index = pd.to_datetime(self.analysis_data.chart_data.index)
-
-        idx = pd.date_range(self.analysis_data.chart_data.index[:1][0], self.analysis_data.chart_data.index[-1:][0])
-        filled_data = self.analysis_data.chart_data.reindex(idx, method='ffill')
-        returns_data = self.analysis_data.chart_data[['returns', 'benchmark_returns']]
-        drawdown_data = self.analysis_data.chart_data[['drawdown', 'benchmark_drawdown']]
+        idx = pd.date_range(chart_data.index[:1][0], chart_data.index[-1:][0])
+        filled_data = chart_data.reindex(idx, method='ffill')
+        returns_data = chart_data[['returns', 'benchmark_returns']]
+        drawdown_data = chart_data[['drawdown', 'benchmark_drawdown']]
 
         yearly_comparison_returns = (returns_data + 1).resample('Y').prod() - 1
         yearly_comparison_returns['outperformance'] = yearly_comparison_returns['returns'] - \
@@ -176,11 +209,23 @@ class AnalyzerWindow(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot(AnalysisData)
     def update_plot(self, analysis_data):
-        if analysis_data is not None:
+        if analysis_data is not None and analysis_data.version >= self.analysis_data.version:
             self.analysis_data = analysis_data
 
+        # snapshots queued while a tab repaints are coalesced, only the latest one is rendered
+        if not self.render_pending:
+            self.render_pending = True
+            QtCore.QTimer.singleShot(0, self.render_current_tab)
+
+    def render_current_tab(self):
+        self.render_pending = False
+        tab = self.tab_widget.tabs.currentWidget()
+        if tab is None or self.rendered_versions.get(tab.get_tab_name()) == self.analysis_data.version:
+            return
+
         try:
-            self.tab_widget.tabs.currentWidget().update_plot(self.analysis_data)
+            tab.update_plot(self.analysis_data)
+            self.rendered_versions[tab.get_tab_name()] = self.analysis_data.version
         except Exception as e:
             print(e)
 
@@ -201,3 +246,25 @@ class TabWidget(QtWidgets.QWidget):
 
         self.layout.addWidget(self.tabs)
         self.setLayout(self.layout)
+
+
+def show_stored_run(path):
+    """Open the run stored in ``path`` (see analyzer.result_store) in a window, without a backtest."""
+    from analyzer.result_store import open_run
+
+    QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
+    app = QtWidgets.QApplication(sys.argv)
+    analysis_data = open_run(path)
+    dates = analysis_data.chart_data.index
+    window = AnalyzerWindow(analysis_data, {'start': dates[0], 'end': dates[-1]}, app)
+    window.show()
+    window.updateSignal.emit(analysis_data)
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Show a run of the result store in the analyzer window.')
+    parser.add_argument('run_path', help='run folder, e.g. results/store/<algo name>-<key>')
+    sys.exit(show_stored_run(parser.parse_args().run_path))
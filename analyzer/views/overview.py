@@ -252,14 +252,13 @@ class OverviewWidget(QtWidgets.QTableWidget):
                     else:
                         returns.setStyleSheet('color: grey')
 
-            if np.isnan(strategy_data['alpha']):
-                strategy_data['alpha'] = 0
-            if np.isnan(strategy_data['sharpe_ratio']):
-                strategy_data['sharpe_ratio'] = 0
+            # the snapshot is shared with the other tabs, NaN ratios are shown as 0 without changing it
+            alpha = 0 if np.isnan(strategy_data['alpha']) else strategy_data['alpha']
+            sharpe_ratio = 0 if np.isnan(strategy_data['sharpe_ratio']) else strategy_data['sharpe_ratio']
 
-            self.strategy_ratios[0].setText('{:.2f}%'.format(strategy_data['alpha']*100))
+            self.strategy_ratios[0].setText('{:.2f}%'.format(alpha*100))
             self.strategy_ratios[1].setText('{:.2f}'.format(strategy_data['beta']))
-            self.strategy_ratios[2].setText('{:.2f}'.format(strategy_data['sharpe_ratio']))
+            self.strategy_ratios[2].setText('{:.2f}'.format(sharpe_ratio))
             self.strategy_ratios[3].setText('{:.2f}%'.format(100 * (strategy_data['total_return_pct']-benchmark_data['total_return_pct'])))
 
             self.benchmark_ratios[0].setText('{:.2f}'.format(benchmark_data['alpha']))
@@ -4,10 +4,11 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib import gridspec
 import empyrical
+from analyzer.rolling import rolling_cache
+from analyzer.downsample import min_max_rows, point_budget
 import pandas as pd
 from utils.log_utils import results_path
 import os
-import copy
 
 
 class PerformanceTab(AnalysisTab):
@@ -100,11 +101,10 @@ class PerformanceTab(AnalysisTab):
         return 'some description'
 
     def date_range_change(self):
-        start_date = self.start_date_widget.date()
-        end_date = self.end_date_widget.date()
-        filtered_data = copy.deepcopy(self.analysis_data)
-        filtered_data.chart_data = filtered_data.chart_data[start_date: end_date]
-        self.plotter.plot(filtered_data)
+        start_date = self.start_date_widget.date().toPyDate()
+        end_date = self.end_date_widget.date().toPyDate()
+        # a view of the chart rows in range, the snapshot itself is shared and never copied
+        self.plotter.plot(self.analysis_data.date_range(start_date, end_date))
 
     def enable_date_range_selection(self):
         self.date_range_go_button.setEnabled(True)
@@ -147,6 +147,9 @@ class Plotter(FigureCanvas):
         FigureCanvas.__init__(self, self.fig)
         self.setParent(masterWindow)
         self.plot_type = 'returns'
+        # decimated rows per (plot type, date range, budget) of the current snapshot version
+        self.lod_version = None
+        self.lod_rows = {}
         FigureCanvas.setSizePolicy(self, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
 
         FigureCanvas.updateGeometry(self)
@@ -179,12 +182,24 @@ class Plotter(FigureCanvas):
 
         self.draw()
 
+    def level_of_detail(self, *series):
+        """``series`` decimated to the rows drawn at the canvas width, computed once per date range."""
+        if self.lod_version != self.analysis_data.version:
+            self.lod_version = self.analysis_data.version
+            self.lod_rows = {}
+        key = (self.plot_type, self.analysis_data.view_range, point_budget(self.width()))
+        if key not in self.lod_rows:
+            self.lod_rows[key] = min_max_rows([s.values for s in series], key[-1])
+        rows = self.lod_rows[key]
+        return series if rows is None else [s.iloc[rows] for s in series]
+
     def plot_returns(self):
         self.portfolio_total_returns = empyrical.cum_returns(self.analysis_data.chart_data.returns) * 100
         self.benchmark_total_returns = empyrical.cum_returns(self.analysis_data.chart_data.benchmark_returns) * 100
 
-        self.returns_ax.plot(self.portfolio_total_returns)
-        self.returns_ax.plot(self.benchmark_total_returns)
+        portfolio, benchmark = self.level_of_detail(self.portfolio_total_returns, self.benchmark_total_returns)
+        self.returns_ax.plot(portfolio)
+        self.returns_ax.plot(benchmark)
 
         self.returns_ax.legend(['Strategy', 'SPY'], loc='upper left')
         self.returns_ax.set_ylabel('Return')
@@ -195,37 +210,32 @@ class Plotter(FigureCanvas):
 
         self.plotdata = pd.concat([(100 * self.analysis_data.chart_data.drawdown), (100 * self.analysis_data.chart_data.benchmark_drawdown)], axis=1)
 
-        self.returns_ax.plot(self.plotdata.drawdown)
-        self.returns_ax.plot(self.plotdata.benchmark_drawdown)
+        drawdown, benchmark_drawdown = self.level_of_detail(self.plotdata.drawdown, self.plotdata.benchmark_drawdown)
+        self.returns_ax.plot(drawdown)
+        self.returns_ax.plot(benchmark_drawdown)
         self.returns_ax.legend(['Strategy', 'SPY'], loc='upper left')
 
     def plot_alpha(self):
         self.returns_ax.set_ylabel('Alpha')
         self.returns_ax.yaxis.tick_right()
-        series = empyrical.roll_alpha(self.analysis_data.chart_data.returns,
-                                      self.analysis_data.chart_data.benchmark_returns,
-                                      252) * 100
+        series = rolling_cache.get(self.analysis_data, 'alpha') * 100
 
-        if series is not None and series.shape[0] > 0:
-            series = series.reindex(self.analysis_data.chart_data.index)
+        if series.count() > 0:
             self.plotdata = pd.DataFrame(series)
             self.returns_ax.set_ylim(min(0, series.min()), max(0, series.max()))
-            self.returns_ax.plot(series)
+            self.returns_ax.plot(*self.level_of_detail(series))
 
             self.returns_ax.legend(['Strategy'], loc='upper left')
 
     def plot_beta(self):
         self.returns_ax.set_ylabel('Beta')
         self.returns_ax.yaxis.tick_right()
-        series = empyrical.roll_beta(self.analysis_data.chart_data.returns,
-                                      self.analysis_data.chart_data.benchmark_returns,
-                                     252)
+        series = rolling_cache.get(self.analysis_data, 'beta')
 
-        if series is not None and series.shape[0] > 0:
-            series = series.reindex(self.analysis_data.chart_data.index)
+        if series.count() > 0:
             self.plotdata = pd.DataFrame(series)
             self.returns_ax.set_ylim(min(0, series.min()), max(0, series.max()))
-            self.returns_ax.plot(series)
+            self.returns_ax.plot(*self.level_of_detail(series))
 
             self.returns_ax.legend(['Strategy'], loc='upper left')
 
@@ -233,12 +243,11 @@ class Plotter(FigureCanvas):
         self.returns_ax.set_ylabel('Sharpe')
         self.returns_ax.yaxis.tick_right()
 
-        series = empyrical.roll_sharpe_ratio(self.analysis_data.chart_data.returns, 252)
-        series = series.reindex(self.analysis_data.chart_data.index)
+        series = rolling_cache.get(self.analysis_data, 'sharpe')
         self.plotdata = pd.DataFrame(series)
 
         self.returns_ax.set_ylim(min(0, series.min()), max(0, series.max()))
-        self.returns_ax.plot(series)
+        self.returns_ax.plot(*self.level_of_detail(series))
 
         self.returns_ax.legend(['Strategy'], loc='upper left')
 
@@ -246,12 +255,11 @@ class Plotter(FigureCanvas):
         self.returns_ax.set_ylabel('Std Dev')
         self.returns_ax.yaxis.tick_right()
 
-        series = self.analysis_data.chart_data.returns.rolling(252).std()
-        series = 100 * series.reindex(self.analysis_data.chart_data.index)
+        series = 100 * rolling_cache.get(self.analysis_data, 'std')
         self.plotdata = pd.DataFrame(series)
 
         self.returns_ax.set_ylim(min(0, series.min()), max(0, series.max()))
-        self.returns_ax.plot(series)
+        self.returns_ax.plot(*self.level_of_detail(series))
 
         self.returns_ax.legend(['Strategy'], loc='upper left')
 
@@ -263,7 +271,7 @@ class Plotter(FigureCanvas):
         self.plotdata = pd.DataFrame(series)
 
         self.returns_ax.set_ylim(min(0, series.min()-1), max(0, series.max()+1))
-        self.returns_ax.plot(series)
+        self.returns_ax.plot(*self.level_of_detail(series))
 
         self.returns_ax.legend(['Strategy'], loc='upper left')
 
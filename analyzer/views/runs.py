@@ -0,0 +1,104 @@
+from PyQt5 import QtWidgets, QtCore
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+import traceback
+from analyzer.downsample import min_max_rows, point_budget
+from analyzer.result_store import ResultStore
+from analyzer.run_comparison import RunComparison
+from utils.log_utils import results_path
+
+# metrics shown as percentages in the comparison table
+PCT_METRICS = {'total_return', 'cagr', 'volatility', 'max_drawdown', 'alpha', 'rolling_std', 'rolling_alpha',
+               'benchmark_total_return'}
+
+
+class RunsComparisonDialog(QtWidgets.QDialog):
+    """Compares runs of the result store: metric table and cumulative returns."""
+
+    def __init__(self, parent=None):
+        super(RunsComparisonDialog, self).__init__(parent)
+        self.setWindowTitle('Compare Stored Runs')
+        self.resize(1100, 720)
+        self.comparison = None
+
+        self.runs_list = QtWidgets.QListWidget()
+        self.runs_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.runs_list.setFixedWidth(320)
+        for manifest in ResultStore().runs():
+            item = QtWidgets.QListWidgetItem('{}  {}  {}'.format(manifest['algo_name'], manifest['created'],
+                                                                 manifest['key'][:6]))
+            item.setData(QtCore.Qt.UserRole, manifest['path'])
+            self.runs_list.addItem(item)
+
+        compare_button = QtWidgets.QPushButton('Compare')
+        compare_button.clicked.connect(self.compare)
+        self.export_button = QtWidgets.QPushButton('Export')
+        self.export_button.setEnabled(False)
+        self.export_button.clicked.connect(self.export)
+
+        self.metrics_table = QtWidgets.QTableWidget()
+        self.metrics_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.figure = Figure(figsize=(10, 5))
+        self.returns_ax = self.figure.add_subplot(1, 1, 1)
+        self.canvas = FigureCanvas(self.figure)
+
+        left_layout = QtWidgets.QVBoxLayout()
+        left_layout.addWidget(self.runs_list)
+        buttons_layout = QtWidgets.QHBoxLayout()
+        buttons_layout.addWidget(compare_button)
+        buttons_layout.addWidget(self.export_button)
+        left_layout.addLayout(buttons_layout)
+
+        right_layout = QtWidgets.QVBoxLayout()
+        right_layout.addWidget(self.metrics_table)
+        right_layout.addWidget(self.canvas)
+
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.addLayout(left_layout)
+        layout.addLayout(right_layout)
+        self.setLayout(layout)
+
+    def compare(self):
+        paths = [item.data(QtCore.Qt.UserRole) for item in self.runs_list.selectedItems()]
+        if not paths:
+            return
+        try:
+            self.comparison = RunComparison(paths)
+        except Exception:
+            traceback.print_exc()
+            return
+        self.show_metrics()
+        self.plot_returns()
+        self.export_button.setEnabled(True)
+
+    def show_metrics(self):
+        metrics = self.comparison.metrics()
+        self.metrics_table.setRowCount(len(metrics.index))
+        self.metrics_table.setColumnCount(len(metrics.columns))
+        self.metrics_table.setVerticalHeaderLabels(list(metrics.index))
+        self.metrics_table.setHorizontalHeaderLabels(list(metrics.columns))
+        for row, name in enumerate(metrics.index):
+            fmt = '{:.2%}' if name in PCT_METRICS else '{:.2f}'
+            for column, value in enumerate(metrics.loc[name].values):
+                item = QtWidgets.QTableWidgetItem(fmt.format(value))
+                item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                self.metrics_table.setItem(row, column, item)
+        self.metrics_table.resizeColumnsToContents()
+
+    def plot_returns(self):
+        returns = self.comparison.cumulative_returns() * 100
+        rows = min_max_rows([returns[label].values for label in returns.columns], point_budget(self.canvas.width()))
+        if rows is not None:
+            returns = returns.iloc[rows]
+
+        self.returns_ax.cla()
+        for label in returns.columns:
+            self.returns_ax.plot(returns.index, returns[label].values)
+        self.returns_ax.legend(list(returns.columns), loc='upper left')
+        self.returns_ax.set_ylabel('Return')
+        self.returns_ax.grid(True)
+        self.canvas.draw()
+
+    def export(self):
+        if self.comparison is not None:
+            self.comparison.export(results_path)
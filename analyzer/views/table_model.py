@@ -0,0 +1,136 @@
+from PyQt5 import QtCore
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont
+import numpy as np
+import pandas as pd
+
+
+class ColumnTableModel(QtCore.QAbstractTableModel):
+    """Table model over the columns of a ColumnTable (see analyzer.tables).
+
+    Cells are formatted in data(), so only the rows a view shows are ever formatted. Sorting
+    and filtering reorder an array of table rows, the columns themselves are never copied.
+
+    Args:
+      columns: (header, column name, format) per view column, format is a str.format pattern,
+        or None for str().
+      colored: Column names shown blue when positive and red when negative.
+      filter_columns: Column names searched by set_filter.
+      small_font_columns: Column names shown in a smaller font.
+    """
+
+    def __init__(self, columns, colored=(), filter_columns=(), small_font_columns=(), parent=None):
+        super(ColumnTableModel, self).__init__(parent)
+        self.headers = [header for header, _, _ in columns]
+        self.names = [name for _, name, _ in columns]
+        self.formats = [fmt for _, _, fmt in columns]
+        self.colored = set(colored)
+        self.filter_columns = list(filter_columns)
+        self.small_font_columns = set(small_font_columns)
+        self.small_font = QFont('Arial', 9)
+
+        self.table = None
+        # lineage and version of the snapshot the table is from, see set_table
+        self.lineage = None
+        self.version = None
+        # table rows in display order
+        self.rows = np.empty(0, dtype=np.int64)
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.filter_text = ''
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self.table is None:
+            return None
+        name = self.names[index.column()]
+
+        if role == Qt.DisplayRole:
+            value = self.table.columns[name][self.rows[index.row()]]
+            fmt = self.formats[index.column()]
+            return str(value) if fmt is None else fmt.format(value)
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.ForegroundRole and name in self.colored:
+            value = self.table.columns[name][self.rows[index.row()]]
+            if value > 0:
+                return QColor('blue')
+            if value < 0:
+                return QColor('red')
+        if role == Qt.FontRole and name in self.small_font_columns:
+            return self.small_font
+        return None
+
+    def set_table(self, table, lineage=None, version=None):
+        """Show ``table`` of the snapshot of ``lineage`` and ``version``.
+
+        Rows appended to the current table are inserted without a reset. That is only the
+        case for a newer snapshot of the same run, a table of another run is always reset.
+        """
+        previous, self.table = self.table, table
+        same_run = lineage is not None and lineage == self.lineage and version > self.version
+        self.lineage, self.version = lineage, version
+        appended = same_run and previous is not None and table is not None and table.start == previous.start \
+            and len(table) >= len(previous) and self.sort_column is None
+        if not appended:
+            self.beginResetModel()
+            self.rows = self.display_rows()
+            self.endResetModel()
+            return
+
+        # rows already shown can change, e.g. an exit is marked the day after
+        if len(self.rows) > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, len(self.headers) - 1))
+        new_rows = self.filtered(np.arange(len(previous), len(table)))
+        if len(new_rows) > 0:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows) + len(new_rows) - 1)
+            self.rows = np.concatenate([self.rows, new_rows])
+            self.endInsertRows()
+
+    def set_filter(self, text):
+        """Only show the rows with ``text`` in one of the filter columns, case insensitive."""
+        self.filter_text = text.strip()
+        self.beginResetModel()
+        self.rows = self.display_rows()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # a negative column restores the table order
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = column if column >= 0 else None
+        self.sort_order = order
+        self.rows = self.display_rows()
+        self.layoutChanged.emit()
+
+    def filtered(self, rows):
+        if not self.filter_text or self.table is None:
+            return rows
+        mask = np.zeros(len(rows), dtype=bool)
+        for name in self.filter_columns:
+            values = pd.Series(self.table.columns[name][rows]).astype(str)
+            mask |= values.str.contains(self.filter_text, case=False, regex=False).values
+        return rows[mask]
+
+    def display_rows(self):
+        if self.table is None:
+            return np.empty(0, dtype=np.int64)
+        rows = self.filtered(np.arange(len(self.table)))
+        if self.sort_column is not None:
+            values = self.table.columns[self.names[self.sort_column]][rows]
+            if values.dtype == object:
+                # mixed dates and empty strings, e.g. the exit column, sort by their text
+                values = values.astype(str)
+            rows = rows[np.argsort(values, kind='stable')]
+            if self.sort_order == Qt.DescendingOrder:
+                rows = rows[::-1]
+        return rows
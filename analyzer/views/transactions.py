@@ -2,6 +2,7 @@ from analyzer.views.analysistab import AnalysisTab
 from PyQt5 import QtWidgets
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
+from analyzer.views.table_model import ColumnTableModel
 
 
 class TransactionsTab(AnalysisTab):
@@ -33,7 +34,13 @@ class TransactionsTab(AnalysisTab):
         firstgroup_layout = QtWidgets.QVBoxLayout(firstgroup_widget)
         firstgroup_layout.setContentsMargins(5, 5, 5, 5)
 
+        self.symbol_filter = QtWidgets.QLineEdit()
+        self.symbol_filter.setPlaceholderText('Filter by symbol or name')
+        self.symbol_filter.setFixedWidth(250)
+        firstgroup_layout.addWidget(self.symbol_filter)
+
         self.transactionstable = TransactionsTable()
+        self.symbol_filter.textChanged.connect(self.transactionstable.table_model.set_filter)
         firstgroup_layout.addWidget(self.transactionstable)
 
         grid.addWidget(firstgroup_widget, 1, 0, 1, 2)
@@ -50,14 +57,15 @@ class TransactionsTab(AnalysisTab):
         return self.main_menu
 
     def get_tab_description(self):
-        return "Showcase transactions for the day"
+        return "Showcase every transaction of the run"
 
     def update_plot(self, analysis_data):
         if analysis_data is not None:
             self.analysis_data = analysis_data
 
-        if self.analysis_data is not None and self.analysis_data.monthly_transactions_data is not None:
-            self.transactionstable.update_data(self.analysis_data.monthly_transactions_data)
+        if self.analysis_data is not None:
+            self.transactionstable.table_model.set_table(self.analysis_data.table('transactions_data'),
+                                                         self.analysis_data.lineage, self.analysis_data.version)
 
     def generate_report(self):
         pass
@@ -73,60 +81,31 @@ class TransactionsTab(AnalysisTab):
         #     self.transactionstable.setColumnWidth(col, int(self.scrollArea.size().width() / 6))
 
 
-class TransactionsTable(QtWidgets.QTableWidget):
-    row_count = 20
+class TransactionsTable(QtWidgets.QTableView):
+    """Transaction log, cells are only formatted for the visible rows."""
+
+    columns = [('Count', 'counter', None),
+               ('Date', 'date', None),
+               ('Symbol', 'symbol', None),
+               ('Name', 'company_name', None),
+               ('Transaction Type', 'transaction_type', None),
+               ('Quantity', 'quantity', None),
+               ('Avg Price', 'avg_price', '{:.2f}')]
 
     def __init__(self):
-        super(QtWidgets.QTableWidget, self).__init__()
-        self.column_headers = ['Count', 'Date', 'Symbol', 'Name', 'Transaction Type', 'Quantity', 'Avg Price']
+        super(QtWidgets.QTableView, self).__init__()
+        self.table_model = ColumnTableModel(self.columns, filter_columns=('symbol', 'company_name'),
+                                            small_font_columns=('date',), parent=self)
+        self.setModel(self.table_model)
         self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        self.setRowCount(self.row_count)
         self.verticalHeader().hide()
+        # log order until a column header is clicked
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(True)
 
-        self.setColumnCount(len(self.column_headers))
-
-        # set horizontal header
-        for col in range(0, len(self.column_headers)):
-            self.setHorizontalHeaderItem(col, QtWidgets.QTableWidgetItem(self.column_headers[col]))
-            if self.column_headers[col] == 'Date':
+        for col, (header, _, _) in enumerate(self.columns):
+            if header == 'Date':
                 self.setColumnWidth(col, 130)
             else:
                 self.setColumnWidth(col, 100)
-
-    def update_data(self, row_data_df):
-        if not row_data_df.empty:
-            self.setRowCount(row_data_df.shape[0])
-            for i in range(0, len(row_data_df)):
-                data = row_data_df.iloc[i]
-
-                counter = QtWidgets.QTableWidgetItem(str(data.counter))
-                counter.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 0, counter)
-
-                date = QtWidgets.QTableWidgetItem(str(data.date))
-                date.setTextAlignment(Qt.AlignRight)
-                date.setFont(QFont('Arial', 9))
-                self.setItem(i, 1, date)
-
-                symbol = QtWidgets.QTableWidgetItem(data.symbol)
-                symbol.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 2, symbol)
-
-                company_name = QtWidgets.QTableWidgetItem(data.company_name)
-                company_name.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 3, company_name)
-
-                tran_type = QtWidgets.QTableWidgetItem(data.transaction_type)
-                tran_type.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 4, tran_type)
-
-                quantity = QtWidgets.QTableWidgetItem(str(data.quantity))
-                quantity.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 5, quantity)
-
-                avg_price = QtWidgets.QTableWidgetItem('{:.2f}'.format(data.avg_price))
-                avg_price.setTextAlignment(Qt.AlignRight)
-                self.setItem(i, 6, avg_price)
-        else:
-            self.setRowCount(0)
\ No newline at end of file
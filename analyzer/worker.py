@@ -0,0 +1,101 @@
+"""
+Background analysis of the simulation bars.
+
+The simulation thread only records what the analysis needs from the context (a Bar) and
+queues it. A worker thread runs the per bar analysis and publishes an AnalysisData
+snapshot at most every ``publish_interval`` seconds of wall clock time, so the
+simulation never waits on the analyzer window repainting.
+
+A bar the analysis fails on can leave it half applied, the worker then stops: the error is
+handed to ``on_error`` and later bars are dropped, nothing inconsistent is published.
+"""
+import queue
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+# the zipline Position objects are updated in place by the ledger, their values are copied per bar
+PositionRecord = namedtuple('PositionRecord', ['asset', 'amount', 'cost_basis', 'last_sale_price'])
+Bar = namedtuple('Bar', ['datetime', 'net', 'positions', 'transactions'])
+
+
+def capture_bar(context, transactions):
+    """Bar of the current simulation day, ``transactions`` are the (dt, transaction) pairs new since the last bar."""
+    positions = [PositionRecord(position.asset, position.amount, position.cost_basis, position.last_sale_price)
+                 for position in context.portfolio.positions.values()]
+    return Bar(context.datetime, context.account.equity_with_loan, positions, transactions)
+
+
+class AnalysisWorker:
+    """Runs the per bar analysis on a background thread and publishes throttled snapshots.
+
+    Args:
+      process: Called with every submitted Bar, in submission order.
+      publish: Called without arguments to publish the analysis of the bars processed so far.
+      publish_interval: Minimum seconds between two publications, bars processed in between
+        are published together.
+      on_error: Called with the traceback text when ``process`` raises, on the worker thread.
+    """
+
+    _stop = object()
+
+    def __init__(self, process, publish, publish_interval=0.5, on_error=None):
+        self.process = process
+        self.publish = publish
+        self.publish_interval = publish_interval
+        self.on_error = on_error
+        # traceback of the bar the analysis failed on, None while it runs
+        self.error = None
+        self.queue = queue.Queue()
+        self.worker = None
+
+    def start(self):
+        if self.worker is not None:
+            return
+        self.worker = threading.Thread(target=self._run, name='analysis-worker', daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout=None):
+        """Process every bar still queued and stop the worker, the last bars are left unpublished."""
+        if self.worker is None:
+            return
+        self.queue.put(self._stop)
+        self.worker.join(timeout)
+        self.worker = None
+
+    def submit(self, bar):
+        if self.error is None:
+            self.queue.put(bar)
+
+    def _run(self):
+        last_publish = time.monotonic()
+        unpublished = False
+        while True:
+            # wake up to publish bars still waiting once the interval has passed
+            timeout = None if not unpublished else max(0.0, last_publish + self.publish_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._stop:
+                return
+            if item is not None:
+                try:
+                    self.process(item)
+                    unpublished = True
+                except Exception:
+                    self.error = traceback.format_exc()
+                    print(self.error)
+                    if self.on_error is not None:
+                        self.on_error(self.error)
+                    return
+
+            if unpublished and time.monotonic() - last_publish >= self.publish_interval:
+                try:
+                    self.publish()
+                except Exception:
+                    traceback.print_exc()
+                last_publish = time.monotonic()
+                unpublished = False
@@ -0,0 +1,215 @@
+"""
+Warm backtest server.
+
+Keeps the bundle readers, asset finder, trading environments, benchmark returns and the
+fundamentals/sector arrays loaded in one long lived process. Algo jobs are submitted over
+a local socket and run in worker processes forked from the server, so they share the
+loaded state copy-on-write and a run only costs the simulation itself.
+
+Start the server once, then submit algo scripts as often as needed:
+
+    python backtest_server.py serve --preload 20000101 20190331
+    python backtest_server.py submit algos/long_term_high_risk/lthr_algo.py --start 20000101 --end 20190331
+
+Extra arguments after ``--`` are passed to the algo script. Where fork is not available
+(Windows) jobs run one at a time inside the server process, which still reuses the
+loaded state. Jobs always run headless, there is nobody to close an analyzer window.
+
+The socket is authenticated with BACKTEST_SERVER_KEY, or without it with a random key the
+server writes to ~/.backtest_server_key, readable by its user only, where submit reads it.
+"""
+import argparse
+import multiprocessing
+import os
+import runpy
+import secrets
+import sys
+import time
+import traceback
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PORT = 6001
+KEY_FILE = os.path.join(str(Path.home()), '.backtest_server_key')
+# set for the algo scripts run by the server, Strategy then runs them headless
+HEADLESS_ENV = 'ZIPLINE_ALGO_HEADLESS'
+
+
+def auth_key(create=False, key_file=KEY_FILE):
+    """Key of the server socket: BACKTEST_SERVER_KEY, else the key file, created by the server if missing."""
+    if os.environ.get('BACKTEST_SERVER_KEY'):
+        return os.environ['BACKTEST_SERVER_KEY'].encode()
+    if not os.path.exists(key_file):
+        if not create:
+            raise RuntimeError('No server key, set BACKTEST_SERVER_KEY or start the server to create {}'
+                               .format(key_file))
+        # only the user running the server can read it
+        fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    with open(key_file) as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError('Empty server key in {}'.format(key_file))
+    return key.encode()
+
+
+def to_session(date):
+    import pandas as pd
+    return pd.to_datetime(date, format='%Y%m%d').tz_localize('UTC')
+
+
+class BacktestServer:
+    def __init__(self, bundle='quandl', port=DEFAULT_PORT, workers=None):
+        self.bundle = bundle
+        self.port = port
+        self.workers = workers or multiprocessing.cpu_count()
+        self.preloaded_ranges = set()
+        try:
+            self.context = multiprocessing.get_context('fork')
+        except ValueError:
+            self.context = None
+
+    def preload(self, ranges=()):
+        """Import the heavy modules and load everything the algos share."""
+        start_time = time.time()
+        sys.path.insert(0, ROOT_DIR)
+
+        from zipline.utils import run_algo
+        from alphacompiler.util.sparse_data import load_sparse_data
+        from alphacompiler.util.zipline_data_tools import get_ticker_sid_dict_from_bundle
+        from alphacompiler.data.NASDAQ import load_sid_file, SID_FILE, SID_FILE_IPO
+        from analyzer.analyzer import load_sector_data
+        import strategy  # noqa: imports zipline, pandas and the analyzer modules
+
+        run_algo.enable_resident_cache()
+        run_algo.load_extensions(True, (), False, os.environ)
+        get_ticker_sid_dict_from_bundle(self.bundle)
+        load_sparse_data(os.path.join(str(Path.home()), 'SF1.npy'))
+        load_sid_file(SID_FILE)
+        load_sid_file(SID_FILE_IPO)
+        load_sector_data('NASDAQ_sids.npy')
+        for start, end in ranges:
+            self.preload_range(start, end)
+
+        print('Server warm after {:.1f}s'.format(time.time() - start_time))
+
+    def preload_range(self, start, end):
+        if (start, end) in self.preloaded_ranges:
+            return
+        from zipline.utils import run_algo
+        run_algo.preload(self.bundle, to_session(start), to_session(end))
+        self.preloaded_ranges.add((start, end))
+
+    def serve(self):
+        listener = Listener(('localhost', self.port), authkey=auth_key(create=True))
+        print('Backtest server listening on localhost:{}'.format(self.port))
+        while True:
+            conn = listener.accept()
+            job = conn.recv()
+            if job.get('start') and job.get('end'):
+                self.preload_range(job['start'], job['end'])
+
+            if self.context is None:
+                run_job(job, conn)
+                conn.close()
+                continue
+
+            # bound the number of concurrent simulations
+            while len(self.context.active_children()) >= self.workers:
+                time.sleep(0.5)
+            worker = self.context.Process(target=run_forked_job, args=(job, conn))
+            worker.start()
+            conn.close()
+
+
+def run_forked_job(job, conn):
+    """run_job in a forked worker, after dropping the database connections inherited from the server."""
+    from zipline.utils import run_algo
+    run_algo.dispose_resident_engines()
+    run_job(job, conn)
+
+
+def run_job(job, conn):
+    """Run an algo script as __main__, headless, and report the outcome to the client."""
+    start_time = time.time()
+    result = {'algo_file': job['algo_file']}
+    saved_argv, saved_cwd, saved_stdin = sys.argv, os.getcwd(), sys.stdin
+    saved_headless = os.environ.get(HEADLESS_ENV)
+    os.environ[HEADLESS_ENV] = '1'
+    # algo scripts wait for a key press at the end, there is nobody to press it
+    null_stdin = open(os.devnull)
+    try:
+        os.chdir(job.get('cwd', ROOT_DIR))
+        sys.argv = [job['algo_file']] + list(job.get('argv', []))
+        sys.stdin = null_stdin
+        runpy.run_path(job['algo_file'], run_name='__main__')
+        result['status'] = 'done'
+    except (SystemExit, EOFError):
+        result['status'] = 'done'
+    except Exception:
+        result['status'] = 'failed'
+        result['error'] = traceback.format_exc()
+    finally:
+        null_stdin.close()
+        sys.argv, sys.stdin = saved_argv, saved_stdin
+        os.chdir(saved_cwd)
+        if saved_headless is None:
+            os.environ.pop(HEADLESS_ENV, None)
+        else:
+            os.environ[HEADLESS_ENV] = saved_headless
+
+    result['elapsed'] = time.time() - start_time
+    try:
+        conn.send(result)
+    except (OSError, EOFError):
+        pass
+
+
+def submit(algo_file, argv=(), start=None, end=None, port=DEFAULT_PORT):
+    conn = Client(('localhost', port), authkey=auth_key())
+    conn.send({'algo_file': os.path.abspath(algo_file),
+               'argv': list(argv),
+               'cwd': os.path.dirname(os.path.abspath(algo_file)),
+               'start': start,
+               'end': end})
+    result = conn.recv()
+    conn.close()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Warm backtest server.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='start the server')
+    serve_parser.add_argument('--bundle', default='quandl')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, help='max concurrent backtests, default is the cpu count')
+    serve_parser.add_argument('--preload', nargs=2, action='append', default=[], metavar=('START', 'END'),
+                              help='date range in yyyymmdd format to load ahead of the first job')
+
+    submit_parser = subparsers.add_parser('submit', help='run an algo script on the server')
+    submit_parser.add_argument('algo_file')
+    submit_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    submit_parser.add_argument('--start', help='backtest start in yyyymmdd format, kept warm for later jobs')
+    submit_parser.add_argument('--end', help='backtest end in yyyymmdd format, kept warm for later jobs')
+    submit_parser.add_argument('algo_args', nargs=argparse.REMAINDER)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = BacktestServer(args.bundle, args.port, args.workers)
+        server.preload([(int(start), int(end)) for start, end in args.preload])
+        server.serve()
+    elif args.command == 'submit':
+        algo_args = args.algo_args[1:] if args.algo_args[:1] == ['--'] else args.algo_args
+        result = submit(args.algo_file, algo_args,
+                        int(args.start) if args.start else None,
+                        int(args.end) if args.end else None,
+                        args.port)
+        print('{} {} in {:.1f}s'.format(result['algo_file'], result['status'], result['elapsed']))
+        if result.get('error'):
+            print(result['error'])
+    else:
+        parser.print_help()
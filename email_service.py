@@ -51,53 +51,63 @@ class EmailService:
         self.members = pd.read_sql("select * from member", self.engine)
 
     def SendMessage(self, subject, message_text):
-        """Send an email message.
+        """Send an order notification to the members subscribed to them.
 
         Args:
-          service: Authorized Gmail API service instance.
-          user_id: User's email address. The special value "me"
-          can be used to indicate the authenticated user.
-          message: Message to be sent.
+          subject: The subject of the email message.
+          message_text: The text of the email message.
 
         Returns:
-          Sent Message.
+          Sent Message, None if sending failed.
         """
-        emails = ";".join(list(self.members[self.members['order_notification'] == 1]['email']))
-        message = self.CreateMessage(emails, subject, message_text)
-
         try:
-            message = (self.service.users().messages().send(userId="me", body=message)
-                       .execute())
-            print('Message Id: %s' % message['id'])
-            return message
+            return self._send('order', subject, message_text)
         except errors.HttpError as error:
             print('An error occurred: %s' % error)
 
     def SendNotifications(self, subject, message_text):
-        """Send an email message.
+        """Send a daily summary, html, to the members subscribed to them.
 
         Args:
-          service: Authorized Gmail API service instance.
-          user_id: User's email address. The special value "me"
-          can be used to indicate the authenticated user.
-          message: Message to be sent.
+          subject: The subject of the email message.
+          message_text: The html of the email message body.
 
         Returns:
-          Sent Notifications.
+          Sent Message, None if sending failed.
         """
-        emails = ";".join(list(self.members[self.members['daily_notification'] == 1]['email']))
-
-        content = '<!DOCTYPE html><html><head><body><p>'+message_text+'</p></body></html>'
-        message = self.CreateMessage(emails, subject, content, 'html')
-
         try:
-            message = (self.service.users().messages().send(userId="me", body=message)
-                       .execute())
-            print('Message Id: %s' % message['id'])
-            return message
+            return self._send('daily', subject, message_text, 'html')
         except errors.HttpError as error:
             print('An error occurred: %s' % error)
 
+    def send(self, kind, subject, message_text, msg_type='plain'):
+        """Send a message to the members subscribed to a notification kind.
+
+        Transport interface used by NotificationQueue, unlike SendMessage and
+        SendNotifications errors are raised so the queue can retry.
+
+        Args:
+          kind: 'order' for order notifications, 'daily' for daily summaries.
+          subject: The subject of the email message.
+          message_text: The text of the email message.
+          msg_type: Type of message. Choose between plain for text/html
+
+        Returns:
+          Sent Message.
+        """
+        return self._send(kind, subject, message_text, msg_type)
+
+    def _send(self, kind, subject, message_text, msg_type='plain'):
+        column = 'daily_notification' if kind == 'daily' else 'order_notification'
+        emails = ";".join(list(self.members[self.members[column] == 1]['email']))
+        if msg_type == 'html':
+            message_text = '<!DOCTYPE html><html><head><body><p>' + message_text + '</p></body></html>'
+        message = self.CreateMessage(emails, subject, message_text, msg_type)
+        message = (self.service.users().messages().send(userId="me", body=message)
+                   .execute())
+        print('Message Id: %s' % message['id'])
+        return message
+
     def CreateMessage(self, to, subject, message_text, msg_type='plain'):
         """Create a message for an email.
 
@@ -1,8 +1,13 @@
 """
 Module for building a complete daily dataset from Quandl's WIKI dataset.
 """
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 from io import BytesIO
 import tarfile
+from tempfile import TemporaryDirectory
 from zipfile import ZipFile
 
 from click import progressbar
@@ -19,6 +24,9 @@ import numpy as np
 from sqlalchemy import create_engine
 from pathlib import Path
 import os
+import json
+import shutil
+from contextlib import contextmanager
 
 log = Logger(__name__)
 
@@ -46,262 +54,424 @@ QUANDL_DATA_URL_ETF = (
 )
 
 
-def format_metadata_url(api_key):
-    """ Build the query URL for Quandl WIKI Prices metadata.
+def format_metadata_url(api_key, since=None):
+    """ Build the query URL for Quandl WIKI Prices metadata, only rows updated since ``since`` if given.
     """
     query_params = [('api_key', api_key), ('qopts.export', 'true')]
+    if since is not None:
+        query_params.append(('lastupdated.gte', since))
 
     return (
         QUANDL_DATA_URL + urlencode(query_params)
     )
 
-def format_metadata_url_etf(api_key):
+def format_metadata_url_etf(api_key, since=None):
     """ Build the query URL for Quandl WIKI Prices metadata.
     """
     db_engine = create_engine('sqlite:///{}'.format(os.path.join(str(Path.home()), 'algodb.db')))
     symbols = pd.read_sql('select symbol from etf_ratios', db_engine)
     query_params = [('api_key', api_key), ('qopts.export', 'true'), ('ticker', ",".join(list(symbols.symbol)))]
+    if since is not None:
+        query_params.append(('lastupdated.gte', since))
     return (
         QUANDL_DATA_URL_ETF + urlencode(query_params)
     )
 
-def format_metadata_action_url(api_key):
+def format_metadata_action_url(api_key, since=None):
     """ Build the query URL for Quandl WIKI Prices metadata.
     """
     query_params = [('api_key', api_key), ('qopts.export', 'true')]
+    if since is not None:
+        # actions are filtered by their date, late reported ones are caught by the margin
+        since = (pd.Timestamp(since) - pd.Timedelta(days=ACTIONS_MARGIN_DAYS)).strftime('%Y-%m-%d')
+        query_params.append(('date.gte', since))
 
     return (
         QUANDL_DATA_ACTION_URL + urlencode(query_params)
     )
 
-def format_metadata_tickers_url(api_key):
+def format_metadata_tickers_url(api_key, since=None):
     query_params = [('api_key', api_key), ('qopts.export', 'true')]
+    if since is not None:
+        query_params.append(('lastupdated.gte', since))
 
     return (
             QUANDL_DATA_TICKERS_URL + urlencode(query_params)
     )
 
-def load_data_table(file,
-                    action_file,
-                    tickers_file,
-                    file_etf,
-                    index_col,
+# rows of the SEP/SFP exports parsed at a time, bounds the memory of the ingest
+CHUNK_ROWS = 1000000
+# the spooled prices are split by symbol into this many files, one is in memory at a time
+PARTITIONS = 64
+
+PRICE_COLUMNS = ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume', 'dividends']
+PRICE_DTYPES = {'ticker': 'category', 'open': np.float32, 'high': np.float32, 'low': np.float32,
+                'close': np.float32, 'volume': np.float64, 'dividends': np.float64}
+# float32 keeps ~7 significant digits, the daily bar writer stores prices to 1/1000
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+PRICE_RECORD = np.dtype([('symbol', np.int32), ('day', np.int32), ('open', np.float32), ('high', np.float32),
+                         ('low', np.float32), ('close', np.float32), ('volume', np.int64), ('dividend', np.float64)])
+
+# incremental ingests also fetch the actions dated this many days before the watermark
+ACTIONS_MARGIN_DAYS = 30
+WATERMARKS_FILE = 'watermarks.json'
+TICKERS_FILE = 'tickers.csv'
+
+# the exports are downloaded at the same time, each to its own file
+DOWNLOAD_WORKERS = 4
+# seconds without data before a download attempt is given up and resumed
+DOWNLOAD_TIMEOUT = 60
+EXPORT_FILES = {'file': 'SEP.zip', 'action_file': 'ACTIONS.zip', 'tickers_file': 'TICKERS.zip', 'file_etf': 'SFP.zip'}
+
+
+def iter_zipped_csv(file, **read_csv_kwargs):
+    """ Yield the chunks of the single csv file of a zip file provided by Quandl.
+    """
+    with ZipFile(file) as zip_file:
+        file_names = zip_file.namelist()
+        assert len(file_names) == 1, "Expected a single file from Quandl."
+        with zip_file.open(file_names.pop()) as table_file:
+            for chunk in pd.read_csv(table_file, chunksize=CHUNK_ROWS, **read_csv_kwargs):
+                yield chunk
+
+
+def to_days(dates):
+    return dates.values.astype('datetime64[D]').astype(np.int32)
+
+
+class PriceSpool(object):
+    """
+    Compact price records of the streamed exports, partitioned by symbol on disk.
+
+    Symbols get an id in order of appearance. Per chunk the first and last day of every
+    symbol are updated and the price records are appended to the partition file of their
+    symbol. A row spooled again, e.g. a correction fetched by an incremental ingest,
+    replaces the earlier one. When the bars are built, splits are joined to the rows of a
+    partition through a hash lookup on (symbol id, day) and dividends are collected.
+
+    The spool can be saved and opened again (see save and open), incremental ingests
+    add the rows updated since the previous ingest to the spool of that ingest.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the partition files.
+    partitions : int
+        Number of partition files.
+    """
+
+    def __init__(self, path, partitions=PARTITIONS):
+        self.path = path
+        self.partitions = partitions
+        self.symbol_ids = {}
+        self.first_day = np.empty(0, dtype=np.int32)
+        self.last_day = np.empty(0, dtype=np.int32)
+        self.split_keys = pd.Index([], dtype=np.int64)
+        self.split_values = np.empty(0)
+        self.splits = []
+        self.dividends = []
+
+    def ids(self, tickers):
+        """ Symbol ids of a categorical ticker column, new symbols get the next ids.
+        """
+        categories = tickers.cat.categories
+        category_ids = np.empty(len(categories), dtype=np.int32)
+        for i, ticker in enumerate(categories):
+            category_ids[i] = self.symbol_ids.setdefault(ticker, len(self.symbol_ids))
+        if len(self.symbol_ids) > len(self.first_day):
+            grown = len(self.symbol_ids) - len(self.first_day)
+            self.first_day = np.concatenate([self.first_day, np.full(grown, np.iinfo(np.int32).max, np.int32)])
+            self.last_day = np.concatenate([self.last_day, np.full(grown, np.iinfo(np.int32).min, np.int32)])
+        return category_ids[tickers.cat.codes.values]
+
+    @staticmethod
+    def keys(ids, days):
+        return (ids.astype(np.int64) << 32) | (days.astype(np.int64) & 0xffffffff)
+
+    def add_actions(self, action_file):
+        """ Index the action values of the ACTIONS export by (symbol id, day), the last one of a day wins.
+        """
+        keys, values = [self.split_keys.values], [self.split_values]
+        for chunk in iter_zipped_csv(action_file, usecols=['date', 'ticker', 'value'], parse_dates=['date'],
+                                     dtype={'ticker': 'category', 'value': np.float64}):
+            keys.append(self.keys(self.ids(chunk['ticker']), to_days(chunk['date'])))
+            values.append(chunk['value'].values)
+        ratios = pd.Series(np.concatenate(values), index=np.concatenate(keys).astype(np.int64))
+        ratios = ratios[~ratios.index.duplicated(keep='last')]
+        self.split_keys, self.split_values = ratios.index, ratios.values
+
+    def add(self, chunk):
+        """ Spool a chunk of the SEP or SFP export.
+        """
+        ids = self.ids(chunk['ticker'])
+        days = to_days(chunk['date'])
+        np.minimum.at(self.first_day, ids, days)
+        np.maximum.at(self.last_day, ids, days)
+
+        records = np.empty(len(chunk), dtype=PRICE_RECORD)
+        records['symbol'] = ids
+        records['day'] = days
+        for column in ['open', 'high', 'low', 'close']:
+            records[column] = chunk[column].values
+        records['volume'] = np.rint(np.nan_to_num(chunk['volume'].values))
+        records['dividend'] = np.nan_to_num(chunk['dividends'].values)
+
+        partition = ids % self.partitions
+        order = np.argsort(partition, kind='stable')
+        bounds = np.searchsorted(partition[order], np.arange(self.partitions + 1))
+        for p in range(self.partitions):
+            if bounds[p] < bounds[p + 1]:
+                with open(self.partition_path(p), 'ab') as f:
+                    records[order[bounds[p]:bounds[p + 1]]].tofile(f)
+
+    def partition_path(self, partition):
+        return os.path.join(self.path, 'prices-{}.bin'.format(partition))
+
+    def symbols(self):
+        """ Symbols with prices, sorted, their position is their sid.
+        """
+        priced = self.last_day >= self.first_day
+        return sorted(symbol for symbol, symbol_id in iteritems(self.symbol_ids) if priced[symbol_id])
+
+    def sids(self, symbols):
+        """ Sid per symbol id, -1 for the symbols without prices.
+        """
+        sids = np.full(len(self.symbol_ids), -1, dtype=np.int64)
+        for sid, symbol in enumerate(symbols):
+            sids[self.symbol_ids[symbol]] = sid
+        return sids
+
+    def partition_bars(self, partition, sids, sessions):
+        """ Daily bars, splits and dividends of the symbols of a partition, see grouped_bars.
+        """
+        path = self.partition_path(partition)
+        records = np.fromfile(path, dtype=PRICE_RECORD)
+        rows = latest_rows(records['symbol'], records['day'])
+        if len(rows) < len(records):
+            # rows spooled again replace the earlier ones, the file is rewritten without them
+            records = records[rows]
+            records.tofile(path + '.tmp')
+            os.replace(path + '.tmp', path)
+        else:
+            records = records[rows]
+        ids, days = records['symbol'], records['day']
+
+        positions = self.split_keys.get_indexer(self.keys(ids, days))
+        ratios = np.where(positions >= 0, self.split_values[positions], 1.0)
+        # a missing value is no split, as in the former left join filled with 1
+        split = (ratios != 1) & ~np.isnan(ratios)
+        paid = records['dividend'] != 0
+
+        columns = {column: records[column] for column in BAR_COLUMNS}
+        bars = list(grouped_bars(sids[ids], days, columns, sessions))
+        return bars, (ids[split], days[split], ratios[split]), (ids[paid], days[paid], records['dividend'][paid])
+
+    def bars(self, symbols, sessions, workers=4):
+        """ Yield (sid, bars) of every symbol, partitions are built ``workers`` at a time in threads.
+
+        A partition holds the symbols of symbol id % partitions, its sids are scattered, so bars
+        come out sorted by sid within a partition only. The daily bar writer does not need
+        ascending sids, it keys the rows of every sid by the sid itself (first_row, last_row
+        and calendar_offset).
+        """
+        sids = self.sids(symbols)
+        partitions = [p for p in range(self.partitions) if os.path.exists(self.partition_path(p))]
+        self.splits, self.dividends = [], []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for p in partitions:
+                pending.append(pool.submit(self.partition_bars, p, sids, sessions))
+                # a few partitions ahead of the writer, not all of them in memory
+                while len(pending) > workers or (pending and p == partitions[-1]):
+                    bars, splits, dividends = pending.popleft().result()
+                    self.splits.append(splits)
+                    self.dividends.append(dividends)
+                    for bar in bars:
+                        yield bar
+
+    def adjustments(self, symbols):
+        """ Splits and dividends of the spooled prices, as parse_splits and parse_dividends expect them.
+
+        They are collected while the bars are built, call bars first.
+        """
+        sids = self.sids(symbols)
+
+        def frame(rows, value_column):
+            ids = np.concatenate([r[0] for r in rows]) if rows else np.empty(0, dtype=np.int32)
+            days = np.concatenate([r[1] for r in rows]) if rows else np.empty(0, dtype=np.int32)
+            values = np.concatenate([r[2] for r in rows]) if rows else np.empty(0)
+            return pd.DataFrame({'sid': sids[ids],
+                                 'date': days.astype('datetime64[D]').astype('datetime64[ns]'),
+                                 value_column: values.astype(np.float64)})
+
+        return frame(self.splits, 'split_ratio'), frame(self.dividends, 'ex_dividend')
+
+    def save(self):
+        """ Write the symbol ids, symbol extents and actions next to the partition files.
+        """
+        with open(os.path.join(self.path, 'spool.json.tmp'), 'w') as f:
+            json.dump({'partitions': self.partitions, 'symbol_ids': self.symbol_ids}, f)
+        np.savez(os.path.join(self.path, 'spool.tmp.npz'), first_day=self.first_day, last_day=self.last_day,
+                 split_keys=self.split_keys.values, split_values=self.split_values)
+        os.replace(os.path.join(self.path, 'spool.tmp.npz'), os.path.join(self.path, 'spool.npz'))
+        os.replace(os.path.join(self.path, 'spool.json.tmp'), os.path.join(self.path, 'spool.json'))
+
+    @classmethod
+    def open(cls, path):
+        """ Spool saved in ``path``.
+        """
+        with open(os.path.join(path, 'spool.json')) as f:
+            state = json.load(f)
+        spool = cls(path, state['partitions'])
+        spool.symbol_ids = state['symbol_ids']
+        with np.load(os.path.join(path, 'spool.npz')) as arrays:
+            spool.first_day, spool.last_day = arrays['first_day'], arrays['last_day']
+            spool.split_keys, spool.split_values = pd.Index(arrays['split_keys']), arrays['split_values']
+        return spool
+
+
+def load_data_table(spool,
+                    downloads,
                     show_progress=False):
+    """ Stream the ACTIONS, SEP and SFP exports provided by Quandl into ``spool``, a chunk at a time.
 
+    ``downloads`` holds the futures of fetch_data_table, each export is parsed as soon as
+    its download completes while the others are still downloading. SFP is spooled after SEP,
+    of a row in both the SFP one wins.
+    """
+    spool.add_actions(downloads['action_file'].result())
+    for name in ['file', 'file_etf']:
+        price_file = downloads[name].result()
+        if show_progress:
+            log.info('Parsing {}.'.format(os.path.basename(price_file)))
+        for chunk in iter_zipped_csv(price_file, usecols=PRICE_COLUMNS, parse_dates=['date'], dtype=PRICE_DTYPES):
+            spool.add(chunk)
+    return spool
 
-    with ZipFile(tickers_file) as zip_file:
-        file_names = zip_file.namelist()
-        assert len(file_names) == 1, "Expected a single file from Quandl."
-        wiki_prices = file_names.pop()
-        with zip_file.open(wiki_prices) as table_file:
-            with zip_file.open(wiki_prices) as table_file:
-                if show_progress:
-                    log.info('Parsing raw data.')
-                data_table_tickers = pd.read_csv(
-                    table_file,
-                    # index_col='ticker',
-                    usecols=[
-                        'ticker',
-                        # 'action',
-                        'exchange',
-                        'name',
-                        'isdelisted',
-                        # 'contraticker',
-                        # 'contraname',
-                    ],
-                )
-
-
-    """ Load data table from zip file provided by Quandl.
+
+def load_tickers(tickers_file):
+    """ Exchange and name per ticker of the TICKERS export, the first row of a ticker wins.
     """
-    with ZipFile(action_file) as zip_file:
-        file_names = zip_file.namelist()
-        assert len(file_names) == 1, "Expected a single file from Quandl."
-        wiki_prices = file_names.pop()
-        with zip_file.open(wiki_prices) as table_file:
-            with zip_file.open(wiki_prices) as table_file:
-                if show_progress:
-                    log.info('Parsing raw data.')
-                data_table_action = pd.read_csv(
-                    table_file,
-                    parse_dates=['date'],
-                    index_col=index_col,
-                    usecols=[
-                        'date',
-                        # 'action',
-                        'ticker',
-                        # 'name',
-                        'value',
-                        # 'contraticker',
-                        # 'contraname',
-                    ],
-                )
+    tickers = pd.concat(iter_zipped_csv(tickers_file, usecols=['ticker', 'exchange', 'name']))
+    return tickers.drop_duplicates(subset='ticker').set_index('ticker')
 
-    with ZipFile(file) as zip_file:
-        file_names = zip_file.namelist()
-        assert len(file_names) == 1, "Expected a single file from Quandl."
-        wiki_prices = file_names.pop()
-        with zip_file.open(wiki_prices) as table_file:
-            if show_progress:
-                log.info('Parsing raw data.')
-            data_table = pd.read_csv(
-                table_file,
-                parse_dates=['date'],
-                index_col=index_col,
-                usecols=[
-                    'ticker',
-                    'date',
-                    'open',
-                    'high',
-                    'low',
-                    'close',
-                    'volume',
-                    'dividends',
-                    # 'ex-dividend',
-                    # 'split_ratio',
-                ],
-            )
 
-    with ZipFile(file_etf) as zip_file:
-        file_names = zip_file.namelist()
-        assert len(file_names) == 1, "Expected a single file from Quandl."
-        wiki_prices = file_names.pop()
-        with zip_file.open(wiki_prices) as table_file:
-            if show_progress:
-                log.info('Parsing raw data.')
-                etf_data = pd.read_csv(
-                    table_file,
-                    parse_dates=['date'],
-                    usecols=[
-                        'ticker',
-                        'date',
-                        'open',
-                        'high',
-                        'low',
-                        'close',
-                        'volume',
-                        'dividends',
-                        # 'ex-dividend',
-                        # 'split_ratio',
-                    ],
-                )
-
-    # data_table_action = data_table_action.set_index(['date', 'ticker'])
-    # data_table = data_table.set_index(['date', 'ticker'])
-    data_table = pd.concat([data_table, etf_data])
-    data_table = pd.merge(data_table, data_table_action, how='left', on=['date', 'ticker'])
-    data_table = pd.merge(data_table, data_table_tickers.drop_duplicates(subset='ticker'), how='left', on=['ticker'])
-    data_table.loc[:, ['value']] = data_table.value.fillna(1)
-
-    # tickers = data_table_tickers.loc[
-    #     (data_table_tickers['exchange'] == 'NYSE')]
-
-    # if you want to bring all the symbols please comment below line
-    # once you do the change here you will have to deploy this file to your env
-    # find env path by "conda env list"
-    # C:\ProgramData\Anaconda3\envs\zipline\Lib\site-packages\zipline\data\bundles (example path)
-    # data_table = data_table.loc[data_table['ticker'].isin(tickers.index)]
-    data_table.rename(
-        columns={
-            'ticker': 'symbol',
-            'dividends': 'ex_dividend',
-            'value': 'split_ratio'
-        },
-        inplace=True,
-        copy=False,
-    )
-    return data_table
+def merge_tickers(path, tickers):
+    """ Tickers saved in ``path`` updated with ``tickers``, saved again.
+    """
+    tickers_path = os.path.join(path, TICKERS_FILE)
+    if os.path.exists(tickers_path):
+        saved = pd.read_csv(tickers_path, index_col='ticker', keep_default_na=False, na_values=[''])
+        tickers = pd.concat([saved[~saved.index.isin(tickers.index)], tickers])
+    tickers.to_csv(tickers_path + '.tmp')
+    os.replace(tickers_path + '.tmp', tickers_path)
+    return tickers
+
+
+def read_watermarks(path):
+    """ Watermarks of the last ingest into the spool in ``path``, empty if there was none
+    or it did not complete.
+    """
+    try:
+        with open(os.path.join(path, WATERMARKS_FILE)) as f:
+            watermarks = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    return watermarks if watermarks.get('complete') else {}
 
 
-def fetch_data_table(api_key,
-                     show_progress,
-                     retries):
-    """ Fetch WIKI Prices data table from Quandl
+def write_watermarks(path, watermarks):
+    with open(os.path.join(path, WATERMARKS_FILE + '.tmp'), 'w') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(os.path.join(path, WATERMARKS_FILE + '.tmp'), os.path.join(path, WATERMARKS_FILE))
+
+
+@contextmanager
+def spool_folder(path):
+    """ ``path`` if given, else a temporary folder removed on exit.
+    """
+    if path is None:
+        with TemporaryDirectory() as tmp_path:
+            yield tmp_path
+    else:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        yield path
+
+
+def incremental_spool(path, since):
+    """ Spool of the previous ingest in ``path`` if there is a watermark to continue from,
+    else a new spool in the emptied folder.
+    """
+    if since is not None:
+        return PriceSpool.open(path)
+    for entry in os.listdir(path):
+        entry_path = os.path.join(path, entry)
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path)
+        else:
+            os.remove(entry_path)
+    return PriceSpool(path)
+
+
+def export_link(metadata_url, retries):
+    """ Link of the zip file of a Quandl export, from its metadata.
     """
     for _ in range(retries):
         try:
-            if show_progress:
-                log.info('Downloading WIKI metadata.')
+            return pd.read_csv(metadata_url).loc[0, 'file.link']
+        except Exception:
+            log.exception("Exception raised reading Quandl metadata. Retrying.")
+    raise ValueError(
+        "Failed to read Quandl metadata after %d attempts." % (retries)
+    )
 
-            metadata = pd.read_csv(
-                format_metadata_url(api_key)
-            )
-            metadata_action = pd.read_csv(
-                format_metadata_action_url(api_key)
-            )
-            metadata_tickers = pd.read_csv(
-                format_metadata_tickers_url(api_key)
-            )
-            metadata_etf = pd.read_csv(
-                format_metadata_url_etf(api_key)
-            )
-            # Extract link from metadata and download zip file.
-            table_url = metadata.loc[0, 'file.link']
-            table_action_url = metadata_action.loc[0, 'file.link']
-            table_tickers_url = metadata_tickers.loc[0, 'file.link']
-            table_etf = metadata_etf.loc[0, 'file.link']
-            if show_progress:
-                raw_file = download_with_progress(
-                    table_url,
-                    chunk_size=ONE_MEGABYTE,
-                    label="Downloading Sharadar Prices table from Quandl"
-                )
-                raw_file_action = download_with_progress(
-                    table_action_url,
-                    chunk_size=ONE_MEGABYTE,
-                    label="Downloading Sharadar Prices table from Quandl"
-                )
-                raw_file_tickers = download_with_progress(
-                    table_tickers_url,
-                    chunk_size=ONE_MEGABYTE,
-                    label="Downloading Sharadar tickers from Quandl"
-                )
-                raw_file_etf = download_with_progress(
-                    table_etf,
-                    chunk_size=ONE_MEGABYTE,
-                    label="Downloading ETF data from Quandl"
-                )
-            else:
-                raw_file = download_without_progress(table_url)
-                raw_file_action = download_without_progress(table_action_url)
-                raw_file_tickers = download_without_progress(table_tickers_url)
-                raw_file_etf = download_without_progress(table_etf)
-
-            return load_data_table(
-                file=raw_file,
-                action_file=raw_file_action,
-                tickers_file=raw_file_tickers,
-                file_etf=raw_file_etf,
-                index_col=None,
-                show_progress=show_progress,
-            )
 
-        except Exception:
-            log.exception("Exception raised reading Quandl data. Retrying.")
+def fetch_export(metadata_url, path, retries, show_progress):
+    download_to_file(export_link(metadata_url, retries), path, retries)
+    if show_progress:
+        log.info('Downloaded {} ({:.1f} MB).'.format(os.path.basename(path), os.path.getsize(path) / ONE_MEGABYTE))
+    return path
 
-    else:
-        raise ValueError(
-            "Failed to download Quandl data after %d attempts." % (retries)
-        )
+
+def fetch_data_table(api_key,
+                     show_progress,
+                     retries,
+                     path,
+                     executor,
+                     since=None):
+    """ Fetch the Sharadar SEP, ACTIONS, TICKERS and SFP exports from Quandl, only the rows
+    updated since ``since`` (YYYY-MM-DD) if given.
+
+    The exports are downloaded concurrently in ``executor`` to zip files in ``path``, see
+    download_to_file. Returns the future of the file of each export, in the keys of
+    EXPORT_FILES.
+    """
+    if show_progress:
+        log.info('Downloading Sharadar exports from Quandl.')
+    metadata_urls = {'file': format_metadata_url(api_key, since),
+                     'action_file': format_metadata_action_url(api_key, since),
+                     'tickers_file': format_metadata_tickers_url(api_key, since),
+                     'file_etf': format_metadata_url_etf(api_key, since)}
+    return {name: executor.submit(fetch_export, metadata_url, os.path.join(path, EXPORT_FILES[name]), retries,
+                                  show_progress)
+            for name, metadata_url in iteritems(metadata_urls)}
 
 
-def gen_asset_metadata(data, show_progress):
+def gen_asset_metadata(spool, symbols, tickers, show_progress):
     if show_progress:
         log.info('Generating asset metadata.')
 
-    data = data.groupby(
-        by='symbol'
-    ).agg(
-        {'date': [np.min, np.max]}
-    )
-    data.reset_index(inplace=True)
-    data['start_date'] = data.date.amin
+    ids = [spool.symbol_ids[symbol] for symbol in symbols]
+    data = pd.DataFrame({'symbol': symbols})
+    data['start_date'] = spool.first_day[ids].astype('datetime64[D]').astype('datetime64[ns]')
     data['end_date'] = pd.Timestamp(pd.datetime.now() + pd.Timedelta(days=1))
-    del data['date']
-    data.columns = data.columns.get_level_values(0)
 
     # data['exchange'] = 'QUANDL'
     data['auto_close_date'] = data['end_date'].values + pd.Timedelta(days=1)
+    ticker_data = tickers.reindex(symbols)
+    data['exchange'] = ticker_data['exchange'].fillna('NA').values
+    data['asset_name'] = ticker_data['name'].fillna('NA').values
     return data
 
 
@@ -337,17 +507,67 @@ def parse_dividends(data, show_progress):
     return data
 
 
+def latest_rows(sids, days):
+    """ Rows sorted by (sid, day), of the rows of a (sid, day) only the last one.
+    """
+    order = np.lexsort((days, sids))
+    sorted_sids, sorted_days = sids[order], days[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (sorted_sids[1:] != sorted_sids[:-1]) | (sorted_days[1:] != sorted_days[:-1])
+    return order[last]
+
+
+def grouped_bars(sids, days, columns, sessions):
+    """
+    Yield (sid, bars on ``sessions``) per sid in a single pass.
+
+    The rows are sorted once by (sid, day), every sid is then a contiguous slice of the
+    sorted columns, and its days are placed on the session calendar through positions
+    computed once with searchsorted. Days off the calendar are dropped, sessions without a
+    row are 0, as a reindex filled with 0 would do. Of several rows of a day the last wins.
+
+    Parameters
+    ----------
+    sids : np.array[int]
+        Sid of every row, rows with a negative sid are skipped.
+    days : np.array[int]
+        Day of every row, as days since the epoch.
+    columns : dict[str -> np.array]
+        Bar columns, e.g. open, high, low, close and volume.
+    sessions : pd.DatetimeIndex
+        Session calendar of the bars.
+    """
+    index = sessions.tz_localize(None)
+    session_days = index.values.astype('datetime64[D]').astype(np.int64)
+    order = latest_rows(sids, days)
+    order = order[sids[order] >= 0]
+    sorted_sids = sids[order]
+    positions = np.searchsorted(session_days, days[order])
+    on_calendar = positions < len(session_days)
+    on_calendar[on_calendar] = session_days[positions[on_calendar]] == days[order][on_calendar]
+    sorted_columns = {name: values[order] for name, values in iteritems(columns)}
+
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(sorted_sids)) + 1, [len(sorted_sids)]])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if start == end:
+            continue
+        rows = np.arange(start, end)[on_calendar[start:end]]
+        bars = {}
+        for name, values in iteritems(sorted_columns):
+            bars[name] = np.zeros(len(index))
+            bars[name][positions[rows]] = values[rows]
+        yield int(sorted_sids[start]), pd.DataFrame(bars, index=index, columns=list(columns))
+
+
 def parse_pricing_and_vol(data,
                           sessions,
                           symbol_map):
-    for asset_id, symbol in iteritems(symbol_map):
-        asset_data = data.xs(
-            symbol,
-            level=1
-        ).reindex(
-            sessions.tz_localize(None)
-        ).fillna(0.0)
-        yield asset_id, asset_data
+    """ Bars per asset of ``data`` indexed by (date, symbol), in the order of the sids.
+    """
+    sid_of_symbol = pd.Series(symbol_map.index, index=symbol_map.values)
+    sids = sid_of_symbol.reindex(data.index.get_level_values(1)).fillna(-1).values.astype(np.int64)
+    days = data.index.get_level_values(0).values.astype('datetime64[D]').astype(np.int64)
+    return grouped_bars(sids, days, {name: data[name].values for name in data.columns}, sessions)
 
 
 @bundles.register('quandl')
@@ -365,6 +585,12 @@ def quandl_bundle(environ,
     """
     quandl_bundle builds a daily dataset using Quandl's SHARADAR Prices dataset.
 
+    With QUANDL_INCREMENTAL set the spooled prices are kept in QUANDL_INCREMENTAL_PATH
+    (~/quandl_incremental by default) together with the watermark of the ingest. The next
+    ingest only downloads the rows updated since then and adds them to the spool, the
+    bundle is then written from the whole spool. A missing or incomplete spool falls back
+    to a full download.
+
     For more information on Quandl's API and how to obtain an API key,
     please visit https://docs.quandl.com/docs#section-authentication
     """
@@ -374,60 +600,73 @@ def quandl_bundle(environ,
             "Please set your QUANDL_API_KEY environment variable and retry."
         )
 
-    raw_data = fetch_data_table(
-        api_key,
-        show_progress,
-        environ.get('QUANDL_DOWNLOAD_ATTEMPTS', 5)
-    )
-    asset_metadata = gen_asset_metadata(
-        raw_data[['symbol', 'date']],
-        show_progress
-    )
-    asset_metadata = pd.merge(asset_metadata, raw_data[['symbol', 'exchange', 'name']].drop_duplicates(), how='left', on=['symbol'])
-    asset_metadata.loc[asset_metadata.exchange.isna(), ['exchange']] = 'NA'
-    asset_metadata.loc[asset_metadata.name.isna(), ['name']] = 'NA'
-    asset_metadata = asset_metadata.rename(columns={'name': 'asset_name'})
-    asset_db_writer.write(asset_metadata)
-
-    # now drop echange and is delisted columns
-    del raw_data['exchange']
-    del raw_data['isdelisted']
-    del raw_data['name']
-
-    symbol_map = asset_metadata.symbol
-    sessions = calendar.sessions_in_range(start_session, end_session)
-
-    raw_data.set_index(['date', 'symbol'], inplace=True)
-    daily_bar_writer.write(
-        parse_pricing_and_vol(
-            raw_data,
-            sessions,
-            symbol_map
-        ),
-        show_progress=show_progress
-    )
-
-    raw_data.reset_index(inplace=True)
-    raw_data['symbol'] = raw_data['symbol'].astype('category')
-    raw_data['sid'] = raw_data.symbol.cat.codes
-    adjustment_writer.write(
-        splits=parse_splits(
-            raw_data[[
-                'sid',
-                'date',
-                'split_ratio',
-            ]].loc[raw_data.split_ratio != 1],
+    incremental_path = None
+    if environ.get('QUANDL_INCREMENTAL'):
+        incremental_path = environ.get('QUANDL_INCREMENTAL_PATH',
+                                       os.path.join(str(Path.home()), 'quandl_incremental'))
+
+    with spool_folder(incremental_path) as spool_path, TemporaryDirectory() as download_path, \
+            ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        watermarks = read_watermarks(spool_path) if incremental_path else {}
+        since = watermarks.get('lastupdated')
+        # rows updated while the exports are prepared are fetched again next time
+        started = pd.Timestamp.utcnow()
+        if show_progress and since is not None:
+            log.info('Fetching the rows updated since {}.'.format(since))
+
+        downloads = fetch_data_table(
+            api_key,
+            show_progress,
+            int(environ.get('QUANDL_DOWNLOAD_ATTEMPTS', 5)),
+            download_path,
+            executor,
+            since
+        )
+        if incremental_path:
+            spool = incremental_spool(spool_path, since)
+            write_watermarks(spool_path, dict(watermarks, complete=False))
+        else:
+            spool = PriceSpool(spool_path)
+        spool = load_data_table(
+            spool,
+            downloads,
             show_progress=show_progress
-        ),
-        dividends=parse_dividends(
-            raw_data[[
-                'sid',
-                'date',
-                'ex_dividend',
-            ]].loc[raw_data.ex_dividend != 0],
+        )
+        tickers = load_tickers(downloads['tickers_file'].result())
+        if incremental_path:
+            tickers = merge_tickers(spool_path, tickers)
+            spool.save()
+            write_watermarks(spool_path, {'lastupdated': started.strftime('%Y-%m-%d'),
+                                          'ingested': started.strftime('%Y-%m-%dT%H:%M:%S'),
+                                          'full': since is None,
+                                          'complete': True})
+
+        symbols = spool.symbols()
+        asset_metadata = gen_asset_metadata(
+            spool,
+            symbols,
+            tickers,
+            show_progress
+        )
+        asset_db_writer.write(asset_metadata)
+
+        sessions = calendar.sessions_in_range(start_session, end_session)
+        daily_bar_writer.write(
+            spool.bars(symbols, sessions),
             show_progress=show_progress
         )
-    )
+
+        splits, dividends = spool.adjustments(symbols)
+        adjustment_writer.write(
+            splits=parse_splits(
+                splits,
+                show_progress=show_progress
+            ),
+            dividends=parse_dividends(
+                dividends,
+                show_progress=show_progress
+            )
+        )
 
 
 def download_with_progress(url, chunk_size, **progress_kwargs):
@@ -463,6 +702,100 @@ def download_with_progress(url, chunk_size, **progress_kwargs):
     return data
 
 
+def expected_md5(resp):
+    """ MD5 hex digest of the whole file a response is part of, None if the server does not state it.
+    """
+    if resp.status_code == 200 and 'Content-MD5' in resp.headers:
+        return base64.b64decode(resp.headers['Content-MD5']).hex()
+    # the ETag of an S3 object uploaded in one part is the MD5 of its content
+    etag = resp.headers.get('ETag', '').strip('"').lower()
+    if len(etag) == 32 and all(c in '0123456789abcdef' for c in etag):
+        return etag
+    return None
+
+
+def file_md5(path, chunk_size=ONE_MEGABYTE):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_to_file(url, path, retries=5, chunk_size=ONE_MEGABYTE):
+    """
+    Download a URL to a file, streaming it to disk.
+
+    The data is written to ``path`` + '.part'. A failed attempt keeps what was written and
+    the next one asks for the rest with a Range request (If-Range the ETag, a changed file
+    is sent whole). The complete file is checked against its size and, where the server
+    states it in Content-MD5 or the ETag, its MD5 before it is renamed to ``path``.
+
+    Parameters
+    ----------
+    url : str
+        A URL that can be understood by ``requests.get``.
+    path : str
+        The file to write.
+    retries : int
+        Number of attempts.
+    chunk_size : int
+        Number of bytes to read at a time from requests.
+
+    Returns
+    -------
+    path : str
+        The downloaded file.
+    """
+    part_path = path + '.part'
+    etag = md5 = None
+    for _ in range(retries):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # the size must be that of the data on the wire
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+            if etag:
+                headers['If-Range'] = etag
+        try:
+            with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as resp:
+                if resp.status_code == 416:
+                    # the part file does not belong to the file on the server
+                    os.remove(part_path)
+                    continue
+                resp.raise_for_status()
+                if resp.status_code != 206:
+                    offset = 0
+                    md5 = None
+                etag = resp.headers.get('ETag', etag)
+                md5 = expected_md5(resp) or md5
+                if resp.status_code == 206:
+                    total_size = int(resp.headers['Content-Range'].rsplit('/', 1)[1])
+                else:
+                    total_size = int(resp.headers.get('content-length', -1))
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in resp.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+        except (requests.RequestException, IOError):
+            log.exception("Exception raised downloading %s. Resuming." % url)
+            continue
+
+        size = os.path.getsize(part_path)
+        if total_size >= 0 and size != total_size:
+            log.info("Download of %s ended at %d of %d bytes. Resuming." % (url, size, total_size))
+            continue
+        if md5 is not None and file_md5(part_path) != md5:
+            log.info("Checksum of %s does not match. Downloading again." % url)
+            os.remove(part_path)
+            continue
+        os.replace(part_path, path)
+        return path
+
+    raise ValueError(
+        "Failed to download %s after %d attempts." % (url, retries)
+    )
+
+
 def download_without_progress(url):
     """
     Download data from a URL, returning a BytesIO containing the loaded data.
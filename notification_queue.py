@@ -0,0 +1,146 @@
+import json
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+
+ORDER_NOTIFICATION = 'order'
+DAILY_NOTIFICATION = 'daily'
+
+
+class FileTransport:
+    """Appends every notification as a json line to a local file, used for tests and dry runs."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def initialize(self):
+        pass
+
+    def send(self, kind, subject, message_text, msg_type='plain'):
+        record = {'time': time.time(), 'kind': kind, 'subject': subject, 'type': msg_type, 'message': message_text}
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+class SmtpTransport:
+    """Sends notifications through an SMTP server, e.g. a local debugging server in tests."""
+
+    def __init__(self, host, port, sender, recipients, user=None, password=None, use_tls=False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+
+    def initialize(self):
+        pass
+
+    def send(self, kind, subject, message_text, msg_type='plain'):
+        message = MIMEText(message_text, msg_type)
+        message['from'] = self.sender
+        message['bcc'] = ';'.join(self.recipients)
+        message['subject'] = subject
+        with smtplib.SMTP(self.host, self.port, timeout=30) as server:
+            if self.use_tls:
+                server.starttls()
+            if self.user is not None:
+                server.login(self.user, self.password)
+            server.sendmail(self.sender, self.recipients, message.as_string())
+
+
+class NotificationQueue:
+    """Delivers notifications from a background thread so trading never waits on the transport.
+
+    Order notifications arriving within ``coalesce_window`` seconds of each other are sent
+    as one digest. Failed sends are retried with exponential backoff.
+
+    Args:
+      transport: Object with ``initialize()`` and ``send(kind, subject, message_text, msg_type)``,
+        e.g. EmailService, FileTransport or SmtpTransport.
+      coalesce_window: Seconds to wait for further order notifications before sending a digest.
+      max_retries: Number of attempts per notification before it is dropped.
+      backoff: Delay in seconds before the first retry, doubled on every further retry.
+    """
+
+    _stop = object()
+
+    def __init__(self, transport, coalesce_window=5.0, max_retries=5, backoff=1.0):
+        self.transport = transport
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue = queue.Queue()
+        self.worker = None
+
+    def start(self):
+        if self.worker is not None:
+            return
+        self.transport.initialize()
+        self.worker = threading.Thread(target=self._run, name='notification-queue', daemon=True)
+        self.worker.start()
+
+    def stop(self, timeout=None):
+        """Deliver everything still queued and stop the worker."""
+        if self.worker is None:
+            return
+        self.queue.put(self._stop)
+        self.worker.join(timeout)
+        self.worker = None
+
+    def notify_order(self, subject, message_text):
+        self.queue.put((ORDER_NOTIFICATION, subject, message_text, 'plain'))
+
+    def notify(self, kind, subject, message_text, msg_type='plain'):
+        self.queue.put((kind, subject, message_text, msg_type))
+
+    def _run(self):
+        pending_orders = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._deliver_orders(pending_orders)
+                pending_orders, deadline = [], None
+                continue
+
+            if item is self._stop:
+                self._deliver_orders(pending_orders)
+                return
+
+            if item[0] == ORDER_NOTIFICATION:
+                pending_orders.append(item)
+                if deadline is None:
+                    deadline = time.time() + self.coalesce_window
+            else:
+                # keep delivery in submission order, orders placed before this message go first
+                self._deliver_orders(pending_orders)
+                pending_orders, deadline = [], None
+                self._deliver(*item)
+
+    def _deliver_orders(self, orders):
+        if len(orders) == 0:
+            return
+        if len(orders) == 1:
+            self._deliver(*orders[0])
+            return
+        lines = ['{}: {}'.format(subject, message_text) for _, subject, message_text, _ in orders]
+        self._deliver(ORDER_NOTIFICATION, 'Order Notifications ({})'.format(len(orders)), '\n'.join(lines), 'plain')
+
+    def _deliver(self, kind, subject, message_text, msg_type):
+        for attempt in range(self.max_retries):
+            try:
+                self.transport.send(kind, subject, message_text, msg_type)
+                return
+            except Exception as e:
+                print('Notification attempt {} failed: {}'.format(attempt + 1, e))
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        print('Dropping notification after {} attempts: {}'.format(self.max_retries, subject))
@@ -0,0 +1,12 @@
+title run history compaction
+
+set anaconda=C:\ProgramData\Anaconda3
+set env=zipline
+
+CALL %anaconda%\Scripts\activate.bat %env%
+
+set path=%anaconda%\Library\bin;%path%
+
+python utils\history_archive.py
+
+CALL %anaconda%\Scripts\deactivate.bat
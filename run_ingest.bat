@@ -7,6 +7,8 @@ CALL %anaconda%\Scripts\activate.bat %env%
 
 set path=%anaconda%\Library\bin;%path%
 
+set QUANDL_INCREMENTAL=1
+
 zipline ingest -b quandl
 
 CALL %anaconda%\Scripts\deactivate.bat
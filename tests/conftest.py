@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the repo's top level packages and modules, as the algo scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
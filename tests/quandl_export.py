@@ -0,0 +1,68 @@
+"""
+Ingestion module and synthetic Sharadar exports for the ingestion tests.
+
+``ingestion process/quandl.py`` replaces zipline's quandl bundle, it is loaded into the
+``zipline.data.bundles`` package as it is when installed there.
+"""
+import importlib.util
+import io
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+QUANDL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'ingestion process', 'quandl.py')
+
+_modules = {}
+
+
+def load_quandl():
+    """The ingestion module, the calling test is skipped without zipline."""
+    pytest.importorskip('zipline.data.bundles.core')
+    if 'quandl' not in _modules:
+        spec = importlib.util.spec_from_file_location('zipline.data.bundles.quandl_ingestion', QUANDL_FILE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules['quandl'] = module
+    return _modules['quandl']
+
+
+def zipped(frame, name):
+    """Zip file content of ``frame`` as the csv file ``name``, as Quandl exports it."""
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_file:
+        zip_file.writestr(name, frame.to_csv(index=False))
+    return data.getvalue()
+
+
+def synthetic_exports(symbols=40, seed=0, start='2015-01-01', end='2016-06-30'):
+    """SEP, SFP, ACTIONS and TICKERS frames of random symbols listed for a random part of the sessions."""
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(start, end)
+    tickers = ['S{:03d}'.format(i) for i in range(symbols)]
+    rows = []
+    for ticker in tickers:
+        first, last = sorted(rng.choice(len(sessions), 2, replace=False))
+        days = sessions[first:last + 1]
+        close = np.round(rng.uniform(1, 300, len(days)), 2)
+        rows.append(pd.DataFrame({'ticker': ticker, 'date': days.strftime('%Y-%m-%d'),
+                                  'open': close, 'high': close + 1, 'low': close - 0.5, 'close': close,
+                                  'volume': rng.integers(0, 1000000, len(days)).astype(float),
+                                  'dividends': np.where(rng.random(len(days)) < 0.01,
+                                                        np.round(rng.uniform(0.01, 2, len(days)), 4), 0.0),
+                                  'lastupdated': '2020-01-01'}))
+    # the exports are not sorted
+    prices = pd.concat(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+    etf = prices[prices['ticker'].isin(tickers[:3])].copy()
+    etf['ticker'] = etf['ticker'].str.replace('S', 'E')
+
+    actions = prices.sample(60, random_state=seed + 1)[['date', 'ticker']].copy()
+    actions['value'] = np.round(rng.uniform(0.2, 4, len(actions)), 3)
+    actions['action'] = 'split'
+    exchanges = pd.DataFrame({'ticker': tickers + [tickers[0]], 'exchange': ['NYSE'] * symbols + ['OTC'],
+                              'name': ['Company ' + ticker for ticker in tickers] + ['Duplicate'],
+                              'isdelisted': 'N'})
+    return prices, etf, actions, exchanges, sessions
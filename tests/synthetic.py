@@ -0,0 +1,100 @@
+"""
+Synthetic backtest for the analyzer tests.
+
+A random portfolio over ``symbols`` assets is traded for ``days`` sessions. The run is
+available both as the Bars the per bar analysis processes and as the perf frame zipline
+hands to ``analyze(context, perf)``.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from analyzer import analyzer as analyzer_module
+from analyzer.analyzer import Analyzer
+from analyzer.worker import Bar, PositionRecord
+
+
+class Asset:
+    """Stands in for a zipline Equity."""
+
+    def __init__(self, sid, symbol, asset_name):
+        self.sid, self.symbol, self.asset_name = sid, symbol, asset_name
+
+    def __repr__(self):
+        return 'Equity({} [{}])'.format(self.sid, self.symbol)
+
+
+CAPITAL_BASE = 100000.0
+SECTOR_FILE = 'NASDAQ_sids.npy'
+
+
+def synthetic_run(days=500, symbols=30, seed=0, start='2017-01-02'):
+    """Sessions, benchmark returns, bars and perf frame of a random run."""
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(start, periods=days, tz='UTC')
+    assets = [Asset(10 + 3 * i, 'S{:02d}'.format(i), 'Company {}'.format(i)) for i in range(symbols)]
+    prices = 50 * np.cumprod(1 + rng.normal(0.0005, 0.02, (days, symbols)), axis=0)
+    # a few sessions without a benchmark return, as around holidays of the benchmark
+    benchmark = pd.Series(rng.normal(0.0004, 0.01, days), index=sessions)
+    benchmark = benchmark.drop(sessions[[5, days // 4, days // 4 + 1]])
+
+    cash = CAPITAL_BASE
+    holdings = {}
+    bars, perf_rows = [], []
+    order_id = 0
+    for day, session in enumerate(sessions):
+        transactions = []
+        for i in rng.choice(symbols, 3, replace=False):
+            asset, price = assets[i], prices[day, i]
+            amount, cost = holdings.get(i, (0, 0.0))
+            if amount and rng.random() < 0.5:
+                # sell all or half
+                traded = -amount if rng.random() < 0.6 else -(amount // 2)
+            elif cash > 5000:
+                traded = int(rng.integers(5, 40))
+            else:
+                continue
+            if traded == 0:
+                continue
+            order_id += 1
+            transactions.append({'sid': asset, 'amount': traded, 'price': price,
+                                 'order_id': 'order-{}'.format(order_id), 'dt': session})
+            cash -= traded * price
+            if amount + traded == 0:
+                del holdings[i]
+            elif traded > 0:
+                holdings[i] = (amount + traded, (amount * cost + traded * price) / (amount + traded))
+            else:
+                holdings[i] = (amount + traded, cost)
+
+        positions = [PositionRecord(assets[i], amount, cost, prices[day, i])
+                     for i, (amount, cost) in sorted(holdings.items())]
+        net = cash + sum(position.amount * position.last_sale_price for position in positions)
+        bars.append(Bar(session, net, positions, [(session, transaction) for transaction in transactions]))
+        perf_rows.append({'portfolio_value': net,
+                          'positions': [{'sid': position.asset, 'amount': position.amount,
+                                         'cost_basis': position.cost_basis,
+                                         'last_sale_price': position.last_sale_price} for position in positions],
+                          'transactions': transactions})
+
+    perf = pd.DataFrame(perf_rows, index=sessions)
+    sector_data = np.arange(max(asset.sid for asset in assets) + 1) % 12
+    return SimpleNamespace(sessions=sessions, benchmark_returns=benchmark, bars=bars, perf=perf,
+                           sector_data=sector_data)
+
+
+def run_analyzer(run, **strategy_data):
+    """Headless Analyzer that processed every bar of ``run``."""
+    analyzer_module._sector_data[SECTOR_FILE] = run.sector_data
+    strategy_data = dict({'headless': True, 'algo_name': 'synthetic', 'capital_base': CAPITAL_BASE,
+                          'benchmark_symbol': 'SPY', 'start': run.sessions[0], 'end': run.sessions[-1]},
+                         **strategy_data)
+    analyzer = Analyzer(SimpleNamespace(strategy_data=strategy_data))
+    context = SimpleNamespace(trading_environment=SimpleNamespace(benchmark_returns=run.benchmark_returns),
+                              sim_params=SimpleNamespace(sessions=run.sessions),
+                              datetime=run.sessions[0])
+    analyzer.load_benchmark(context)
+    for bar in run.bars:
+        analyzer.process_bar(bar)
+    return analyzer
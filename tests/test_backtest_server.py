@@ -0,0 +1,82 @@
+import os
+import stat
+from multiprocessing import Pipe
+
+import pytest
+
+import backtest_server
+from backtest_server import HEADLESS_ENV, auth_key, run_job
+
+
+def run(path, argv=()):
+    receiver, sender = Pipe(duplex=False)
+    run_job({'algo_file': str(path), 'argv': list(argv), 'cwd': str(path.parent)}, sender)
+    return receiver.recv()
+
+
+def test_run_job_reports_failure_with_traceback(tmp_path):
+    algo = tmp_path / 'failing_algo.py'
+    algo.write_text("raise ValueError('bad parameter')\n")
+    result = run(algo)
+    assert result['status'] == 'failed'
+    assert 'Traceback' in result['error'] and 'ValueError: bad parameter' in result['error']
+    assert HEADLESS_ENV not in os.environ
+
+
+def test_run_job_runs_headless(tmp_path):
+    algo = tmp_path / 'algo.py'
+    algo.write_text("import os, sys\n"
+                    "open(sys.argv[1], 'w').write(os.environ.get('{}', ''))\n"
+                    "input('press a key')\n".format(HEADLESS_ENV))
+    result = run(algo, [str(tmp_path / 'headless.txt')])
+    assert result['status'] == 'done'
+    assert (tmp_path / 'headless.txt').read_text() == '1'
+    assert HEADLESS_ENV not in os.environ
+
+
+def test_auth_key_file(tmp_path, monkeypatch):
+    monkeypatch.delenv('BACKTEST_SERVER_KEY', raising=False)
+    key_file = str(tmp_path / 'key')
+    with pytest.raises(RuntimeError):
+        auth_key(key_file=key_file)
+
+    key = auth_key(create=True, key_file=key_file)
+    assert len(key) == 64 and key != b'zipline_algo'
+    assert stat.S_IMODE(os.stat(key_file).st_mode) == 0o600
+    assert auth_key(key_file=key_file) == key
+
+    monkeypatch.setenv('BACKTEST_SERVER_KEY', 'secret')
+    assert auth_key(key_file=key_file) == b'secret'
+
+
+def test_load_bundle_is_cached(monkeypatch):
+    run_algo = pytest.importorskip('zipline.utils.run_algo')
+    if not hasattr(run_algo, 'enable_resident_cache'):
+        pytest.skip('zipline without the resident cache of zipline_package_files')
+
+    class Finder:
+        disposed = 0
+
+        class engine:
+            url = 'sqlite:///assets.db'
+
+            @classmethod
+            def dispose(cls):
+                Finder.disposed += 1
+
+    class BundleData:
+        asset_finder = Finder
+        equity_daily_bar_reader = adjustment_reader = None
+
+    loads = []
+    monkeypatch.setattr(run_algo, '_resident_cache', None)
+    monkeypatch.setattr(run_algo.bundles, 'load', lambda *args: loads.append(args) or BundleData)
+    monkeypatch.setattr(run_algo, 'USEquityPricingLoader', lambda *args: 'loader')
+
+    run_algo.enable_resident_cache()
+    first = run_algo._load_bundle_data('quandl', {}, None)
+    assert run_algo._load_bundle_data('quandl', {}, None) is first
+    assert len(loads) == 1
+
+    run_algo.dispose_resident_engines()
+    assert Finder.disposed == 1
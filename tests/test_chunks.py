@@ -0,0 +1,31 @@
+import pandas as pd
+
+from analyzer.chunks import history_tables, write_history_csv
+from analyzer.result_store import ResultStore, open_run
+from synthetic import run_analyzer, synthetic_run
+
+
+def test_out_of_core_matches_in_memory(tmp_path):
+    run = synthetic_run(days=300, symbols=20)
+    in_memory = run_analyzer(run).build_snapshot()
+    spilled = run_analyzer(run, out_of_core=True, holdings_window_days=31,
+                           results_path=str(tmp_path / 'spilled')).build_snapshot()
+    assert len(spilled.holdings_chunks) > 0
+    assert len(spilled.table('holdings_data_historical')) < len(in_memory.table('holdings_data_historical'))
+
+    for date_once in [False, True]:
+        write_history_csv(in_memory, str(tmp_path / 'in_memory.csv'), date_once)
+        write_history_csv(spilled, str(tmp_path / 'spilled.csv'), date_once)
+        assert (tmp_path / 'in_memory.csv').read_text() == (tmp_path / 'spilled.csv').read_text()
+
+    # the rows of the chunks and of the window keep their journal row labels
+    starts = [table.start for table in history_tables(spilled)]
+    assert starts[0] == 0 and starts[-1] == spilled.table('holdings_data_historical').start
+    pd.testing.assert_frame_equal(spilled.holdings_data, in_memory.holdings_data)
+    pd.testing.assert_frame_equal(spilled.chart_data, in_memory.chart_data)
+
+    # stored runs keep the chunks
+    stored = open_run(ResultStore(str(tmp_path / 'store')).write(spilled, 'synthetic', {}, None, 'code'))
+    write_history_csv(stored, str(tmp_path / 'stored.csv'))
+    write_history_csv(in_memory, str(tmp_path / 'in_memory.csv'))
+    assert (tmp_path / 'stored.csv').read_text() == (tmp_path / 'in_memory.csv').read_text()
@@ -0,0 +1,32 @@
+import re
+from types import SimpleNamespace
+
+import pandas as pd
+
+from utils.daily_summary import EMAIL_COLUMNS, PORTFOLIO_COLUMNS, build_holdings_summary, render_summary_html
+
+
+def position(sid, symbol, amount, cost_basis, last_sale_price):
+    return SimpleNamespace(asset=SimpleNamespace(sid=sid, symbol=symbol, asset_name=symbol + ' Inc'),
+                           amount=amount, cost_basis=cost_basis, last_sale_price=last_sale_price)
+
+
+def test_render_summary_html():
+    positions = [position(1, 'AAPL', 10, 150.12345, 160.5),
+                 position(2, 'MSFT', 4, 300.0, 310.25),
+                 position(3, 'NVDA', 7, 95.5, 101.1)]
+    # AAPL was snapshotted twice by a rerun, NVDA is new today
+    prev_last_prices = pd.Series([150.0, 155.25, 305.1], index=['AAPL', 'AAPL', 'MSFT'])
+    portfolio = SimpleNamespace(portfolio_value=10000.0, pnl=250.0, cash=3000.0, positions_value=7000.0)
+
+    html = render_summary_html(build_holdings_summary(positions, prev_last_prices, 10000.0), portfolio)
+
+    assert re.findall(r'<th>(.*?)</th>', html) == EMAIL_COLUMNS + PORTFOLIO_COLUMNS
+    cells = re.findall(r'<td>(.*?)</td>', html)
+    # percentages are the gain over the previous or buy price, as str(round(gain / price * 100, 4))
+    assert cells[:10] == ['AAPL', '10', '150.1234', '155.25', '160.5', '5.25', '3.3816 %',
+                          str(160.5 - 150.12345), '6.912 %', '1605.0']
+    assert cells[10:20] == ['MSFT', '4', '300.0', '305.1', '310.25', str(310.25 - 305.1), '1.688 %',
+                            '10.25', '3.4167 %', '1241.0']
+    assert cells[20:30] == ['NVDA', '7', '95.5', '-', '101.1', '-', '-', '-', '-', str(7 * 101.1)]
+    assert cells[30:] == ['10000.0', '250.0', '0.0256 %', '3000.0', '7000.0']
@@ -0,0 +1,65 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+from utils.history_archive import HistoryArchive, parse_dates
+
+pytest.importorskip('pyarrow')
+
+
+def make_db(path):
+    connection = sqlite3.connect(path)
+    connection.execute('create table daily_portfolio (date date, algo_id INTEGER, portfolio_net float)')
+    connection.execute('create table daily_holdings (date date, algo_id INTEGER, holding_name TEXT, '
+                       'quantity INTEGER, buy_price NUMERIC, last_price NUMERIC)')
+    connection.execute('create table prev_run_date (algo_id INTEGER, date date)')
+    # older rows were written as DD-MM-YYYY, a string comparison would sort them by day of month
+    connection.executemany('insert into daily_portfolio values (?, 1, ?)',
+                           [('30-07-2019', 99000.0), ('14-08-2019', 100000.0)])
+    connection.executemany('insert into daily_holdings values (?, 1, ?, 10, 1.0, 1.0)',
+                           [('30-07-2019', 'AAPL'), ('2019-08-15', 'AAPL'), ('2019-08-15', 'MSFT'),
+                            ('2019-09-03', 'AAPL')])
+    connection.execute("insert into prev_run_date values (1, '2019-11-01')")
+    connection.commit()
+    connection.close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    db_path = str(tmp_path / 'algodb.db')
+    make_db(db_path)
+    return HistoryArchive(db_path, str(tmp_path / 'archive'))
+
+
+def test_parse_dates():
+    dates = parse_dates(['2019-08-15', '14-08-2019', '2019-08-15 00:00:00', 'n/a'])
+    assert list(dates[:3].dt.strftime('%Y-%m-%d')) == ['2019-08-15', '2019-08-14', '2019-08-15']
+    assert dates.isnull()[3]
+
+
+def test_compact_keeps_newest_snapshot(archive):
+    assert archive.compact() == {'daily_holdings': 3, 'daily_portfolio': 1}
+    connection = sqlite3.connect(archive.db_engine.url.database)
+    assert connection.execute('select date, portfolio_net from daily_portfolio').fetchall() == \
+        [('14-08-2019', 100000.0)]
+    assert connection.execute('select date, holding_name from daily_holdings').fetchall() == \
+        [('2019-09-03', 'AAPL')]
+    connection.close()
+
+    portfolio = archive.load_portfolio(1)
+    assert list(portfolio['date'].dt.strftime('%Y-%m-%d')) == ['2019-07-30', '2019-08-14']
+    assert len(archive.load_holdings(1)) == 4
+    assert len(archive.load_holdings(1, start='2019-08-01', end='2019-08-31')) == 2
+
+    # compacting again moves nothing
+    assert archive.compact() == {'daily_holdings': 0, 'daily_portfolio': 0}
+
+
+def test_latest_portfolio_info_after_compact(archive):
+    virtual_broker = pytest.importorskip('zipline.gens.brokers.virtual_broker')
+    archive.compact()
+    broker = SimpleNamespace(_algo_id=1, _db_engine=create_engine(archive.db_engine.url))
+    latest = virtual_broker.VirtualBroker.get_latest_portfolio_info(broker)
+    assert latest['portfolio_net'] == 100000.0
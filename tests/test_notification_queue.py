@@ -0,0 +1,116 @@
+import base64
+import email
+import json
+
+import pandas as pd
+import pytest
+
+from notification_queue import DAILY_NOTIFICATION, FileTransport, NotificationQueue
+
+
+class FlakyTransport:
+    """Fails the first ``failures`` sends, keeps the sent notifications."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+        self.sent = []
+
+    def initialize(self):
+        pass
+
+    def send(self, kind, subject, message_text, msg_type='plain'):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise IOError('connection refused')
+        self.sent.append((kind, subject, message_text, msg_type))
+
+
+def records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_orders_are_coalesced_into_a_digest(tmp_path):
+    path = tmp_path / 'notifications.jsonl'
+    notifications = NotificationQueue(FileTransport(str(path)), coalesce_window=60)
+    notifications.start()
+    notifications.notify_order('order_placed', 'AAPL:BUY:10')
+    notifications.notify_order('order_placed', 'MSFT:SELL:5')
+    notifications.notify(DAILY_NOTIFICATION, 'Daily Summary', '<p>summary</p>', 'html')
+    notifications.notify_order('order_placed', 'GOOG:BUY:1')
+    notifications.stop(5)
+
+    sent = records(path)
+    # the orders placed before the summary go first, as one digest
+    assert [(record['kind'], record['subject'], record['type']) for record in sent] == [
+        ('order', 'Order Notifications (2)', 'plain'),
+        ('daily', 'Daily Summary', 'html'),
+        ('order', 'order_placed', 'plain')]
+    assert sent[0]['message'] == 'order_placed: AAPL:BUY:10\norder_placed: MSFT:SELL:5'
+    assert sent[2]['message'] == 'GOOG:BUY:1'
+
+
+def test_failed_sends_are_retried():
+    transport = FlakyTransport(failures=2)
+    notifications = NotificationQueue(transport, coalesce_window=0, max_retries=3, backoff=0)
+    notifications.start()
+    notifications.notify(DAILY_NOTIFICATION, 'Daily Summary', 'summary')
+    notifications.stop(5)
+    assert transport.attempts == 3
+    assert transport.sent == [('daily', 'Daily Summary', 'summary', 'plain')]
+
+
+def test_notification_is_dropped_after_max_retries():
+    transport = FlakyTransport(failures=10)
+    notifications = NotificationQueue(transport, coalesce_window=0, max_retries=3, backoff=0)
+    notifications.start()
+    notifications.notify_order('order_placed', 'AAPL:BUY:10')
+    notifications.notify_order('order_placed', 'MSFT:SELL:5')
+    notifications.stop(5)
+    assert transport.attempts == 3 and transport.sent == []
+
+
+class FakeGmail:
+    """Stands in for the Gmail API service, keeps the sent messages."""
+
+    def __init__(self):
+        self.sent = []
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body):
+        self.sent.append(email.message_from_bytes(base64.urlsafe_b64decode(body['raw'])))
+        return self
+
+    def execute(self):
+        return {'id': str(len(self.sent))}
+
+
+@pytest.fixture
+def email_service():
+    pytest.importorskip('googleapiclient')
+    from email_service import EmailService
+
+    service = EmailService()
+    service.service = FakeGmail()
+    service.members = pd.DataFrame({'email': ['a@example.com', 'b@example.com', 'c@example.com'],
+                                    'order_notification': [1, 0, 1],
+                                    'daily_notification': [0, 1, 1]})
+    return service
+
+
+def test_email_service_wrappers_share_the_send_path(email_service):
+    assert email_service.SendMessage('order_placed', 'AAPL:BUY:10') == {'id': '1'}
+    assert email_service.SendNotifications('Daily Summary', '<table></table>') == {'id': '2'}
+    email_service.send('daily', 'Daily Summary', '<table></table>', 'html')
+
+    order, daily, queued_daily = email_service.service.sent
+    assert order['bcc'] == 'a@example.com;c@example.com' and order.get_content_type() == 'text/plain'
+    assert order.get_payload(decode=True) == b'AAPL:BUY:10'
+    assert daily['bcc'] == 'b@example.com;c@example.com' and daily.get_content_type() == 'text/html'
+    assert daily.get_payload(decode=True) == queued_daily.get_payload(decode=True)
+    assert b'<p><table></table></p>' in daily.get_payload(decode=True)
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from analyzer.analysis_data import AnalysisData
+from analyzer.perf_analysis import analyze_perf
+from synthetic import CAPITAL_BASE, run_analyzer, synthetic_run
+
+
+def test_deferred_analysis_matches_per_bar():
+    run = synthetic_run(days=500, symbols=30)
+    analyzer = run_analyzer(run)
+    streamed = analyzer.build_snapshot()
+    deferred = analyze_perf(AnalysisData(), run.perf, run.benchmark_returns, CAPITAL_BASE, analyzer.sector_names)
+
+    pd.testing.assert_frame_equal(deferred.chart_data, streamed.chart_data, check_dtype=False, check_names=False)
+    for streamed_report, deferred_report in [(streamed.strategy_report, deferred.strategy_report),
+                                             (streamed.benchmark_report, deferred.benchmark_report)]:
+        assert set(deferred_report) <= set(streamed_report)
+        for key, value in deferred_report.items():
+            np.testing.assert_allclose(streamed_report[key], value, rtol=1e-9, err_msg=key)
+
+    for name in ['holdings_data_historical', 'holdings_data', 'transactions_data', 'monthly_transactions_data']:
+        streamed_table = getattr(streamed, name).reset_index(drop=True)
+        deferred_table = getattr(deferred, name).reset_index(drop=True)
+        pd.testing.assert_frame_equal(deferred_table[streamed_table.columns], streamed_table,
+                                      check_dtype=False, obj=name)
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from quandl_export import load_quandl
+
+
+class ExportServer:
+    """Local stand-in of the export file host, serves ``data`` with its MD5 as the ETag.
+
+    ``drops`` responses are cut off after a third of the body and ``corrupt`` full responses
+    have a byte flipped.
+    """
+
+    def __init__(self, data, drops=0, corrupt=0):
+        self.data, self.drops, self.corrupt = data, drops, corrupt
+        self.etag = '"{}"'.format(hashlib.md5(data).hexdigest())
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.respond(self)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/SEP.zip'.format(self.httpd.server_port)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def respond(self, handler):
+        requested = handler.headers.get('Range')
+        if_range = handler.headers.get('If-Range')
+        self.requests.append((requested, if_range))
+        start = 0
+        if requested and if_range in (None, self.etag):
+            start = int(requested[len('bytes='):-1])
+            handler.send_response(206)
+            handler.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(self.data) - 1, len(self.data)))
+        else:
+            handler.send_response(200)
+        body = self.data[start:]
+        handler.send_header('Content-Length', str(len(body)))
+        handler.send_header('ETag', self.etag)
+        handler.end_headers()
+        if self.drops:
+            self.drops -= 1
+            handler.wfile.write(body[:len(body) // 3])
+            handler.wfile.flush()
+            handler.connection.shutdown(2)
+            return
+        if self.corrupt and start == 0:
+            self.corrupt -= 1
+            body = bytearray(body)
+            body[10] ^= 1
+        handler.wfile.write(bytes(body))
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def quandl():
+    return load_quandl()
+
+
+@pytest.fixture
+def data():
+    return np.random.default_rng(0).bytes(200000)
+
+
+def test_download_resumes_after_dropped_connection(quandl, data, tmp_path):
+    server = ExportServer(data, drops=2)
+    try:
+        path = quandl.download_to_file(server.url, str(tmp_path / 'SEP.zip'), retries=3, chunk_size=1024)
+    finally:
+        server.close()
+    assert open(path, 'rb').read() == data
+    assert not (tmp_path / 'SEP.zip.part').exists()
+    # the later attempts ask for the rest of the same file
+    assert server.requests[0] == (None, None)
+    for requested, if_range in server.requests[1:]:
+        assert requested.startswith('bytes=') and requested != 'bytes=0-'
+        assert if_range == server.etag
+
+
+def test_download_rejects_corrupted_body(quandl, data, tmp_path):
+    server = ExportServer(data, corrupt=1)
+    try:
+        path = quandl.download_to_file(server.url, str(tmp_path / 'SEP.zip'), retries=3, chunk_size=1024)
+    finally:
+        server.close()
+    assert open(path, 'rb').read() == data
+    # the corrupted file is downloaded again whole
+    assert server.requests == [(None, None), (None, None)]
+
+
+def test_download_fails_on_corrupted_bodies(quandl, data, tmp_path):
+    server = ExportServer(data, corrupt=3)
+    try:
+        with pytest.raises(ValueError):
+            quandl.download_to_file(server.url, str(tmp_path / 'SEP.zip'), retries=3, chunk_size=1024)
+    finally:
+        server.close()
+    assert not (tmp_path / 'SEP.zip').exists()
+
+
+def test_download_discards_part_of_another_file(quandl, data, tmp_path):
+    # a part left by an earlier export, the rest of the new file does not complete it and the
+    # checksum has it downloaded again whole
+    (tmp_path / 'SEP.zip.part').write_bytes(b'stale' * 100)
+    server = ExportServer(data)
+    try:
+        path = quandl.download_to_file(server.url, str(tmp_path / 'SEP.zip'), retries=3, chunk_size=1024)
+    finally:
+        server.close()
+    assert open(path, 'rb').read() == data
+    assert server.requests[-1] == (None, None)
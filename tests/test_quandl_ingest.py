@@ -0,0 +1,161 @@
+import io
+import json
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from quandl_export import load_quandl, synthetic_exports, zipped
+
+
+class Writers:
+    """Keeps what the bundle writes, stands in for the asset db, daily bar and adjustment writers."""
+
+    def write(self, *args, **kwargs):
+        if kwargs.get('splits') is not None:
+            self.splits, self.dividends = kwargs['splits'], kwargs['dividends']
+        elif isinstance(args[0], pd.DataFrame):
+            self.assets = args[0]
+        else:
+            self.bars = {sid: bars.copy() for sid, bars in args[0]}
+
+
+class Calendar:
+    def __init__(self, sessions):
+        self.sessions = pd.DatetimeIndex(sessions, tz='UTC')
+
+    def sessions_in_range(self, start, end):
+        return self.sessions
+
+
+def done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def reference(prices, etf, actions, tickers, sessions):
+    """Assets, bars, splits and dividends of the exports, computed with pandas."""
+    # of a row in both exports the SFP one wins
+    rows = pd.concat([prices, etf]).drop_duplicates(['ticker', 'date'], keep='last')
+    rows = rows.assign(date=pd.to_datetime(rows['date']).astype('datetime64[ns]'))
+    for column in ['open', 'high', 'low', 'close']:
+        rows[column] = rows[column].astype(np.float32).astype(np.float64)
+    symbols = sorted(rows['ticker'].unique())
+    sids = pd.Series(np.arange(len(symbols)), index=symbols)
+    rows['sid'] = sids.reindex(rows['ticker']).values
+
+    index = pd.DatetimeIndex(sessions).tz_localize(None)
+    bars = {sids[symbol]: group.set_index('date')[['open', 'high', 'low', 'close', 'volume']]
+                               .reindex(index, fill_value=0).astype(np.float64)
+            for symbol, group in rows.groupby('ticker')}
+
+    ratios = actions.drop_duplicates(['ticker', 'date'], keep='last')
+    ratios = ratios.assign(date=pd.to_datetime(ratios['date']).astype('datetime64[ns]'))
+    splits = rows.merge(ratios, on=['ticker', 'date'])
+    splits = splits[splits['value'] != 1]
+    splits = pd.DataFrame({'sid': splits['sid'], 'effective_date': splits['date'], 'ratio': 1.0 / splits['value']})
+    paid = rows[rows['dividends'] != 0]
+    dividends = pd.DataFrame({'sid': paid['sid'], 'ex_date': paid['date'], 'amount': paid['dividends']})
+
+    names = tickers.drop_duplicates('ticker').set_index('ticker').reindex(symbols)
+    assets = pd.DataFrame({'symbol': symbols,
+                           'start_date': rows.groupby('ticker')['date'].min().reindex(symbols).values,
+                           'exchange': names['exchange'].fillna('NA').values,
+                           'asset_name': names['name'].fillna('NA').values})
+    return assets, bars, splits, dividends
+
+
+def sorted_rows(frame, columns):
+    return frame[columns].sort_values(columns[:2]).reset_index(drop=True)
+
+
+def assert_ingested(writers, expected):
+    assets, bars, splits, dividends = expected
+    pd.testing.assert_frame_equal(writers.assets[assets.columns], assets, check_dtype=False)
+    assert sorted(writers.bars) == sorted(bars)
+    for sid, sid_bars in bars.items():
+        pd.testing.assert_frame_equal(writers.bars[sid], sid_bars, check_dtype=False, check_freq=False)
+    pd.testing.assert_frame_equal(sorted_rows(writers.splits, list(splits.columns)),
+                                  sorted_rows(splits, list(splits.columns)), check_dtype=False)
+    pd.testing.assert_frame_equal(sorted_rows(writers.dividends, list(dividends.columns)),
+                                  sorted_rows(dividends, list(dividends.columns)), check_dtype=False)
+
+
+@pytest.fixture
+def quandl():
+    return load_quandl()
+
+
+@pytest.fixture
+def ingest(quandl, monkeypatch):
+    """Runs the bundle on in-memory exports, returns the writers; the ``since`` of every fetch is kept."""
+    fetched = []
+
+    def run(exports, sessions, environ):
+        prices, etf, actions, tickers = exports
+
+        def fetch_data_table(api_key, show_progress, retries, path, executor, since=None):
+            fetched.append(since)
+            return {'file': done(io.BytesIO(zipped(prices, 'SEP.csv'))),
+                    'action_file': done(io.BytesIO(zipped(actions, 'ACTIONS.csv'))),
+                    'tickers_file': done(io.BytesIO(zipped(tickers, 'TICKERS.csv'))),
+                    'file_etf': done(io.BytesIO(zipped(etf, 'SFP.csv')))}
+
+        monkeypatch.setattr(quandl, 'fetch_data_table', fetch_data_table)
+        writers = Writers()
+        quandl.quandl_bundle(dict(environ, QUANDL_API_KEY='key'), writers, None, writers, writers,
+                             Calendar(sessions), None, None, None, False, None)
+        return writers
+    run.fetched = fetched
+    return run
+
+
+def test_ingest_matches_pandas(ingest):
+    prices, etf, actions, tickers, sessions = synthetic_exports()
+    # an action of a ticker without prices is left out
+    actions = pd.concat([actions, pd.DataFrame({'date': ['2015-03-02'], 'ticker': ['NOPRICE'],
+                                                'value': [2.0], 'action': ['split']})])
+    writers = ingest((prices, etf, actions, tickers), sessions, {})
+    assert len(writers.splits) and len(writers.dividends)
+    assert_ingested(writers, reference(prices, etf, actions, tickers, sessions))
+
+
+def test_incremental_ingest_matches_full(ingest, tmp_path):
+    prices, etf, actions, tickers, sessions = synthetic_exports()
+    environ = {'QUANDL_INCREMENTAL': '1', 'QUANDL_INCREMENTAL_PATH': str(tmp_path)}
+    cut = '2016-03-01'
+    first = prices[prices['date'] < cut]
+    first_actions = actions[actions['date'] < cut]
+    ingest((first, etf[etf['date'] < cut], first_actions, tickers), sessions, environ)
+    watermarks = json.loads((tmp_path / 'watermarks.json').read_text())
+    assert watermarks['complete'] and watermarks['full']
+
+    # corrected rows of earlier days, a new symbol and a renamed one
+    corrected = first.sample(50, random_state=3).copy()
+    corrected['close'] += 7
+    corrected['dividends'] = np.where(np.arange(50) % 5 == 0, 0.5, corrected['dividends'])
+    new_symbol = prices[prices['ticker'] == 'S001'].assign(ticker='ZNEW')
+    update = pd.concat([prices[prices['date'] >= cut], corrected, new_symbol])
+    update_actions = pd.concat([actions[actions['date'] >= '2016-01-15'],
+                                pd.DataFrame({'date': [corrected['date'].iloc[0]], 'ticker': [corrected['ticker'].iloc[0]],
+                                              'value': [3.0], 'action': ['split']})])
+    update_tickers = pd.DataFrame({'ticker': ['ZNEW', 'S001'], 'exchange': ['NASDAQ', 'NASDAQ'],
+                                   'name': ['New', 'Renamed'], 'isdelisted': 'N'})
+    writers = ingest((update, etf[etf['date'] >= cut], update_actions, update_tickers), sessions, environ)
+    assert ingest.fetched == [None, watermarks['lastupdated']]
+
+    all_prices = pd.concat([first.drop(corrected.index), corrected, prices[prices['date'] >= cut], new_symbol])
+    all_actions = pd.concat([first_actions, update_actions])
+    all_tickers = pd.concat([update_tickers, tickers])
+    expected = reference(all_prices, etf, all_actions, all_tickers, sessions)
+    assert_ingested(writers, expected)
+    assert writers.assets.set_index('symbol').loc['S001', 'asset_name'] == 'Renamed'
+
+    # an ingest interrupted after the spool was changed is not continued, the next one is full
+    watermarks = json.loads((tmp_path / 'watermarks.json').read_text())
+    (tmp_path / 'watermarks.json').write_text(json.dumps(dict(watermarks, complete=False)))
+    writers = ingest((all_prices, etf, all_actions, all_tickers), sessions, environ)
+    assert ingest.fetched[-1] is None
+    assert_ingested(writers, expected)
@@ -0,0 +1,50 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyzer import result_store
+from analyzer.result_store import ResultStore, open_run
+from synthetic import run_analyzer, synthetic_run
+
+
+@pytest.fixture(scope='module')
+def snapshot():
+    return run_analyzer(synthetic_run(days=120, symbols=10)).build_snapshot()
+
+
+def store_run(store, snapshot, params):
+    return store.write(snapshot, 'synthetic', params, '2019-04-01T00;00;00', 'code')
+
+
+def test_write_open_run_round_trip(tmp_path, snapshot):
+    store = ResultStore(str(tmp_path))
+    path = store_run(store, snapshot, {'capital_base': 100000})
+    assert store.find('synthetic', {'capital_base': 100000}, '2019-04-01T00;00;00', 'code') == path
+
+    stored = open_run(path)
+    assert stored.info_data['algo_name'] == 'synthetic'
+    assert stored.strategy_report == pytest.approx(snapshot.strategy_report)
+    assert stored.benchmark_report == pytest.approx(snapshot.benchmark_report)
+    pd.testing.assert_frame_equal(stored.chart_data, snapshot.chart_data, check_index_type=False)
+
+    for name in ['holdings_data_historical', 'transactions_data', 'holdings_data']:
+        expected, actual = snapshot.table(name), stored.table(name)
+        assert actual.start == expected.start and list(actual.columns) == list(expected.columns)
+        for column, values in expected.columns.items():
+            if values.dtype == object:
+                assert [str(value) for value in actual.columns[column]] == [str(value) for value in values]
+            else:
+                np.testing.assert_array_equal(actual.columns[column], values)
+    assert list(stored.table('transactions_data').index) == list(snapshot.table('transactions_data').index)
+
+
+def test_prune_keeps_newest_runs(tmp_path, snapshot, monkeypatch):
+    times = itertools.count()
+    monkeypatch.setattr(result_store.time, 'strftime', lambda fmt: '2019-04-01T00:00:{:02d}'.format(next(times)))
+    store = ResultStore(str(tmp_path))
+    paths = [store_run(store, snapshot, {'run': run}) for run in range(4)]
+
+    assert sorted(store.prune('synthetic', 2)) == sorted(paths[:2])
+    assert [manifest['path'] for manifest in store.runs('synthetic')] == paths[:1:-1]
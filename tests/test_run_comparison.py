@@ -0,0 +1,19 @@
+import empyrical
+import numpy as np
+import pandas as pd
+
+from analyzer.perf_analysis import drawdown
+from analyzer.run_comparison import METRICS, metric_table
+
+
+def test_max_drawdown_counts_a_first_day_loss():
+    returns = np.array([[-0.05, 0.01], [0.02, -0.03], [-0.01, 0.02], [0.03, 0.01]])
+    benchmark = np.full_like(returns, 0.001)
+    table = metric_table(returns, benchmark, window=3)
+    max_drawdown = table[METRICS.index('max_drawdown')]
+
+    for run in range(returns.shape[1]):
+        assert np.isclose(max_drawdown[run], empyrical.max_drawdown(pd.Series(returns[:, run])))
+        assert np.isclose(max_drawdown[run], drawdown(returns[:, run]).min())
+    # the first day is the trough, measured from the start
+    assert np.isclose(max_drawdown[0], -0.05)
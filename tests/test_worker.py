@@ -0,0 +1,32 @@
+import threading
+
+from analyzer.worker import AnalysisWorker
+
+
+def test_worker_stops_on_error():
+    processed, published, errors = [], [], []
+    failed = threading.Event()
+
+    def process(bar):
+        if bar == 2:
+            raise ValueError('bad bar')
+        processed.append(bar)
+
+    def on_error(error):
+        errors.append(error)
+        failed.set()
+
+    worker = AnalysisWorker(process, lambda: published.append(list(processed)), publish_interval=0,
+                            on_error=on_error)
+    worker.start()
+    for bar in range(5):
+        worker.submit(bar)
+    assert failed.wait(5)
+    worker.submit(5)
+    worker.stop(5)
+
+    assert processed == [0, 1]
+    assert len(errors) == 1 and 'ValueError: bad bar' in errors[0] and worker.error == errors[0]
+    # nothing is published once a bar failed
+    assert all(bars in ([0], [0, 1]) for bars in published)
+    assert worker.queue.qsize() <= 3
@@ -0,0 +1,125 @@
+"""
+Vectorized end of day holdings summary.
+
+The per holding numbers (daily and total gain, weight, book and market value) are
+computed once for all positions as arrays. The same frame feeds the live daily
+summary email, the daily_holdings snapshot and the analyzer's positions history.
+"""
+import numpy as np
+import pandas as pd
+from jinja2 import Template
+
+
+SUMMARY_TEMPLATE = Template(
+    '<p><h3>Holdings Summary</h3></p>'
+    '<table border="1" class="dataframe"><thead><tr style="text-align: right;">'
+    '{% for column in holdings_columns %}<th>{{ column }}</th>{% endfor %}'
+    '</tr></thead><tbody>'
+    '{% for row in holdings_rows %}<tr>{% for value in row %}<td>{{ value }}</td>{% endfor %}</tr>{% endfor %}'
+    '</tbody></table>'
+    '<p><h3>Portfolio Summary</h3></p>'
+    '<table border="1" class="dataframe"><thead><tr style="text-align: right;">'
+    '{% for column in portfolio_columns %}<th>{{ column }}</th>{% endfor %}'
+    '</tr></thead><tbody><tr>'
+    '{% for value in portfolio_row %}<td>{{ value }}</td>{% endfor %}'
+    '</tr></tbody></table>'
+)
+
+EMAIL_COLUMNS = ['Holding', 'Shares', 'Buy Price', 'Yest Price', 'Current Price', 'Dollar Gain Today',
+                 'Pct Gain Today', 'Dollar Gain Net', 'Pct Gain Net', 'Market Value']
+
+PORTFOLIO_COLUMNS = ['Portfolio Value', 'Net Gain', 'Percent Net Gain', 'Cash Value', 'Position Value']
+
+
+def build_holdings_summary(positions, prev_last_prices, net):
+    """Compute the end of day metrics of every position in one pass.
+
+    Parameters
+    ----------
+    positions : iterable of zipline Position
+        Current positions, e.g. ``context.portfolio.positions.values()``.
+    prev_last_prices : pd.Series
+        Last price of the previous snapshot indexed by symbol.
+    net : float
+        Portfolio value used for the position weights.
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        One row per position indexed by symbol. Daily changes are NaN for positions
+        that are not in the previous snapshot, ``in_prev`` flags the others.
+    """
+    positions = list(positions)
+    symbols = np.array([position.asset.symbol for position in positions], dtype=object)
+    summary = pd.DataFrame({
+        'asset': np.array([position.asset for position in positions], dtype=object),
+        'name': np.array([position.asset.asset_name for position in positions], dtype=object),
+        'sid': np.array([position.asset.sid for position in positions], dtype=np.int64),
+        'quantity': np.array([position.amount for position in positions], dtype=np.float64),
+        'avg_price': np.array([position.cost_basis for position in positions], dtype=np.float64),
+        'last_price': np.array([position.last_sale_price for position in positions], dtype=np.float64),
+    }, index=pd.Index(symbols, name='symbol'))
+
+    # a rerun on the same day leaves the symbol twice in the snapshot, the latest row wins
+    prev_last_prices = prev_last_prices[~prev_last_prices.index.duplicated(keep='last')]
+    prev_price = prev_last_prices.reindex(summary.index).values.astype(np.float64)
+    last_price = summary['last_price'].values
+    avg_price = summary['avg_price'].values
+    quantity = summary['quantity'].values
+
+    summary['in_prev'] = ~np.isnan(prev_price)
+    summary['prev_price'] = prev_price
+    summary['daily_change'] = last_price - prev_price
+    summary['pct_daily_change'] = last_price / prev_price - 1
+    summary['total_change'] = last_price - avg_price
+    summary['pct_total_change'] = last_price / avg_price - 1
+    summary['book_value'] = quantity * avg_price
+    summary['mkt_value'] = quantity * last_price
+    summary['pct_port'] = summary['mkt_value'].values / net
+    return summary
+
+
+def _format_pct(changes, bases):
+    # as the email always showed them: the change over its base, rounded per value
+    return [str(round(float(change) / base * 100, 4)) + ' %' for change, base in zip(changes, bases)]
+
+
+def render_summary_html(summary, portfolio):
+    """Render the daily summary email body for the held positions of ``summary``."""
+    in_prev = summary['in_prev'].values
+    dash = np.full(summary.shape[0], '-', dtype=object)
+
+    columns = [
+        summary.index.values,
+        summary['quantity'].values.astype(np.int64),
+        np.round(summary['avg_price'].values, 4),
+        np.where(in_prev, summary['prev_price'].values, dash),
+        summary['last_price'].values,
+        np.where(in_prev, summary['daily_change'].values, dash),
+        np.where(in_prev, _format_pct(summary['daily_change'].values, summary['prev_price'].values), dash),
+        np.where(in_prev, summary['total_change'].values, dash),
+        np.where(in_prev, _format_pct(summary['total_change'].values, summary['avg_price'].values), dash),
+        summary['mkt_value'].values,
+    ]
+
+    portfolio_row = [round(portfolio.portfolio_value, 4),
+                     round(portfolio.pnl, 4),
+                     str(round(portfolio.pnl / (portfolio.portfolio_value - portfolio.pnl), 4)) + ' %',
+                     round(portfolio.cash, 4),
+                     round(portfolio.positions_value, 4)]
+
+    return SUMMARY_TEMPLATE.render(holdings_columns=EMAIL_COLUMNS,
+                                   holdings_rows=zip(*columns),
+                                   portfolio_columns=PORTFOLIO_COLUMNS,
+                                   portfolio_row=portfolio_row)
+
+
+def holdings_snapshot(summary, run_date, algo_id):
+    """Rows for the daily_holdings table."""
+    return pd.DataFrame({'date': run_date,
+                         'algo_id': algo_id,
+                         'holding_name': summary.index.values,
+                         'quantity': summary['quantity'].values.astype(np.int64),
+                         'buy_price': np.round(summary['avg_price'].values, 4),
+                         'last_price': summary['last_price'].values},
+                        columns=['date', 'algo_id', 'holding_name', 'quantity', 'buy_price', 'last_price'])
@@ -0,0 +1,222 @@
+"""
+Columnar archive for the live trading history tables.
+
+``daily_holdings`` and ``daily_portfolio`` in algodb.db grow by one row per
+position (or per algo) per day. Closed days are periodically moved out of
+SQLite into Arrow IPC files partitioned by table, algo and year::
+
+    <archive_root>/<table>/algo_id=<id>/year=<yyyy>.arrow
+
+Arrow IPC files are uncompressed and are read back through a memory map, so
+loading years of history is a zero-copy read instead of a row by row
+``pd.read_sql``.
+"""
+import argparse
+import os
+from pathlib import Path
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+ARCHIVE_ROOT = os.path.join(str(Path.home()), 'algo_archive')
+DB_PATH = os.path.join(str(Path.home()), 'algodb.db')
+
+# archived tables and their columns, 'date' and 'algo_id' are used for partitioning
+ARCHIVE_TABLES = {
+    'daily_holdings': ['date', 'algo_id', 'holding_name', 'quantity', 'buy_price', 'last_price'],
+    'daily_portfolio': ['date', 'algo_id', 'portfolio_net'],
+}
+
+# formats of the date column, older rows were written as 'DD-MM-YYYY'
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']
+
+# columns identifying a row, used to drop rows archived twice by an interrupted compaction
+ARCHIVE_KEYS = {
+    'daily_holdings': ['date', 'algo_id', 'holding_name'],
+    'daily_portfolio': ['date', 'algo_id'],
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the history archive, install it with 'pip install pyarrow'")
+
+
+def parse_dates(values):
+    """Parse the dates of the history tables whatever format of DATE_FORMATS they were stored in, NaT if none."""
+    values = pd.Series(values).astype(str)
+    dates = pd.to_datetime(values, format=DATE_FORMATS[0], errors='coerce')
+    for date_format in DATE_FORMATS[1:]:
+        missing = dates.isnull()
+        if missing.any():
+            dates[missing] = pd.to_datetime(values[missing], format=date_format, errors='coerce')
+    return dates
+
+
+class HistoryArchive:
+    def __init__(self, db_path=DB_PATH, archive_root=ARCHIVE_ROOT):
+        self.db_engine = create_engine('sqlite:///{}'.format(db_path))
+        self.archive_root = archive_root
+
+    def partition_path(self, table, algo_id, year):
+        return os.path.join(self.archive_root, table, 'algo_id={}'.format(algo_id), 'year={}'.format(year) + '.arrow')
+
+    def archived_years(self, table, algo_id):
+        algo_path = os.path.join(self.archive_root, table, 'algo_id={}'.format(algo_id))
+        if not os.path.isdir(algo_path):
+            return []
+        return sorted(int(name[len('year='):-len('.arrow')]) for name in os.listdir(algo_path)
+                      if name.startswith('year=') and name.endswith('.arrow'))
+
+    def compact(self, algo_id=None):
+        """Move closed days of every archived table from SQLite into the archive.
+
+        A day is closed once it is older than the algo's ``prev_run_date``. The newest
+        day of every table is kept in SQLite whatever its date, the next live run reads
+        it back (see VirtualBroker.get_latest_portfolio_info). Dates are compared parsed,
+        rows with a date that can not be parsed are left in SQLite.
+
+        Returns the number of rows moved per table.
+        """
+        _require_pyarrow()
+        prev_run_dates = pd.read_sql("select algo_id, date from prev_run_date", self.db_engine)
+        if algo_id is not None:
+            prev_run_dates = prev_run_dates[prev_run_dates['algo_id'] == algo_id]
+
+        moved = dict((table, 0) for table in ARCHIVE_TABLES)
+        for row in prev_run_dates.itertuples(index=False):
+            for table, columns in ARCHIVE_TABLES.items():
+                moved[table] += self._compact_table(table, columns, row.algo_id, row.date)
+        return moved
+
+    def _compact_table(self, table, columns, algo_id, cutoff_date):
+        cutoff = parse_dates([cutoff_date])[0]
+        if pd.isnull(cutoff):
+            return 0
+        rows_sql = "select rowid as row_id, {} from {} where algo_id={}".format(', '.join(columns), table, algo_id)
+        rows = pd.read_sql(rows_sql, self.db_engine)
+        if rows.empty:
+            return 0
+        rows['date'] = parse_dates(rows['date'])
+        closed = rows[(rows['date'] < cutoff) & (rows['date'] < rows['date'].max())]
+        if closed.empty:
+            return 0
+        row_ids = closed['row_id'].tolist()
+        closed = closed.drop(columns='row_id')
+
+        for year, year_rows in closed.groupby(closed['date'].dt.year):
+            path = self.partition_path(table, algo_id, year)
+            if os.path.exists(path):
+                archived = self._read_partition(path).to_pandas()
+                archived['date'] = pd.to_datetime(archived['date'])
+                year_rows = pd.concat([archived, year_rows], ignore_index=True)
+                year_rows = year_rows.drop_duplicates(subset=ARCHIVE_KEYS[table])
+            self._write_partition(path, year_rows.sort_values('date'))
+
+        # rows are deleted by rowid, in batches below SQLite's limit of bound variables
+        with self.db_engine.begin() as connection:
+            for start in range(0, len(row_ids), 500):
+                delete_sql = "delete from {} where rowid in ({})".format(
+                    table, ', '.join(str(row_id) for row_id in row_ids[start:start + 500]))
+                connection.execute(text(delete_sql))
+        return closed.shape[0]
+
+    def _write_partition(self, path, df):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = df.copy()
+        df['date'] = df['date'].dt.date
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        # write next to the partition and swap it in so readers never see a half written file
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(tmp_path, path)
+
+    def _read_partition(self, path, columns=None):
+        source = pa.memory_map(path, 'r')
+        arrow_table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            arrow_table = arrow_table.select(columns)
+        return arrow_table
+
+    def load_arrays(self, table, algo_id, start=None, end=None, columns=None):
+        """Load archived rows as a dict of NumPy arrays, one per column.
+
+        Numeric columns are views on the memory mapped partitions whenever a single
+        partition covers the request.
+        """
+        _require_pyarrow()
+        start = pd.Timestamp(start).date() if start is not None else None
+        end = pd.Timestamp(end).date() if end is not None else None
+        if columns is not None and 'date' not in columns:
+            columns = ['date'] + list(columns)
+
+        tables = []
+        for year in self.archived_years(table, algo_id):
+            if (start is not None and year < start.year) or (end is not None and year > end.year):
+                continue
+            tables.append(self._read_partition(self.partition_path(table, algo_id, year), columns))
+
+        if len(tables) == 0:
+            names = columns if columns is not None else ARCHIVE_TABLES[table]
+            return dict((name, pd.Series([]).values) for name in names)
+
+        arrow_table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+        dates = arrow_table.column('date').to_numpy()
+        mask = None
+        if start is not None:
+            mask = dates >= start
+        if end is not None:
+            mask = (dates <= end) if mask is None else mask & (dates <= end)
+        if mask is not None:
+            arrow_table = arrow_table.filter(pa.array(mask))
+
+        return dict((name, arrow_table.column(name).to_numpy(zero_copy_only=False))
+                    for name in arrow_table.column_names)
+
+    def load(self, table, algo_id, start=None, end=None, columns=None, include_live=True):
+        """Load the history of ``table`` for an algo as a DataFrame.
+
+        With ``include_live`` the days that are still in SQLite are appended, so the
+        result covers the full history since inception.
+        """
+        df = pd.DataFrame(self.load_arrays(table, algo_id, start, end, columns))
+        if not df.empty:
+            df['date'] = pd.to_datetime(df['date'])
+
+        if include_live:
+            live_columns = columns if columns is not None else ARCHIVE_TABLES[table]
+            if 'date' not in live_columns:
+                live_columns = ['date'] + list(live_columns)
+            live_sql = "select {} from {} where algo_id={}".format(', '.join(live_columns), table, algo_id)
+            live = pd.read_sql(live_sql, self.db_engine)
+            live['date'] = parse_dates(live['date'])
+            if start is not None:
+                live = live[live['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                live = live[live['date'] <= pd.Timestamp(end)]
+            df = live if df.empty else pd.concat([df, live], ignore_index=True)
+
+        return df.sort_values('date').reset_index(drop=True)
+
+    def load_holdings(self, algo_id, start=None, end=None):
+        return self.load('daily_holdings', algo_id, start, end)
+
+    def load_portfolio(self, algo_id, start=None, end=None):
+        return self.load('daily_portfolio', algo_id, start, end)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move closed days of the live history tables into the archive.')
+    parser.add_argument('--algo_id', type=int, help='compact only this algo, default is all algos')
+    args = parser.parse_args()
+
+    archive = HistoryArchive()
+    for table, count in archive.compact(args.algo_id).items():
+        print("Archived {} rows of {}".format(count, table))
@@ -0,0 +1,76 @@
+"""
+Cold start benchmark for strategies.
+
+Every sample runs in a fresh interpreter, which imports the strategy module, builds a
+Strategy for the mode and imports what run_algorithm needs, i.e. everything that happens
+before the first simulated bar. Results are appended to a csv so startup time can be
+tracked over time, per mode.
+
+    python utils/startup_benchmark.py --modes live backtest --repeat 5
+"""
+import argparse
+import csv
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = """
+import datetime
+import sys
+sys.path.insert(0, {root!r})
+from notification_queue import FileTransport
+from strategy import Strategy
+
+strategy_data = {{'algo_name': 'startup_benchmark', 'benchmark_symbol': 'SPY', 'capital_base': 100000,
+                 'start': datetime.datetime(2010, 1, 4), 'end': datetime.datetime(2019, 12, 31),
+                 'live_trading': {live}, 'headless': {headless},
+                 'notification_transport': FileTransport(__import__('os').devnull)}}
+Strategy(strategy_data)
+import zipline.utils.run_algo
+"""
+
+# mode: (live_trading, headless)
+MODES = {'live': (True, False), 'backtest': (False, False), 'headless': (False, True)}
+
+
+def measure(mode):
+    live, headless = MODES[mode]
+    script = STARTUP_SCRIPT.format(root=ROOT_DIR, live=live, headless=headless)
+    env = dict(os.environ)
+    # backtests build the analyzer window, no display is needed to measure it
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', script], env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL)
+    return time.time() - start
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR).decode().strip()
+    except Exception:
+        return ''
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure strategy cold start wall time per mode.')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--repeat', type=int, default=5, help='samples per mode, the median is reported')
+    parser.add_argument('--output', default=os.path.join(ROOT_DIR, 'startup_times.csv'))
+    args = parser.parse_args()
+
+    write_header = not os.path.exists(args.output)
+    with open(args.output, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(['timestamp', 'revision', 'mode', 'median_seconds', 'min_seconds', 'max_seconds'])
+        for mode in args.modes:
+            samples = [measure(mode) for _ in range(args.repeat)]
+            print('{}: median {:.2f}s (min {:.2f}s, max {:.2f}s)'.format(
+                mode, statistics.median(samples), min(samples), max(samples)))
+            writer.writerow([datetime.datetime.now().isoformat(), git_revision(), mode,
+                             round(statistics.median(samples), 3), round(min(samples), 3), round(max(samples), 3)])
@@ -141,52 +141,14 @@ def _run(handle_data,
         )
 
     if bundle is not None:
-        bundle_data = bundles.load(
+        env, data, choose_loader = _load_bundle(
             bundle,
             environ,
             bundle_timestamp,
+            trading_calendar,
+            start,
+            end,
         )
-
-        prefix, connstr = re.split(
-            r'sqlite:///',
-            str(bundle_data.asset_finder.engine.url),
-            maxsplit=1,
-        )
-        if prefix:
-            raise ValueError(
-                "invalid url %r, must begin with 'sqlite:///'" %
-                str(bundle_data.asset_finder.engine.url),
-            )
-        env = TradingEnvironment(
-            asset_db_path=connstr,
-            environ=environ,
-            trading_calendar=trading_calendar,
-            trading_day=trading_calendar.day,
-            trading_days=trading_calendar.schedule[start:end].index,
-        )
-
-        first_trading_day =\
-            bundle_data.equity_minute_bar_reader.first_trading_day
-        data = DataPortal(
-            env.asset_finder,
-            trading_calendar=trading_calendar,
-            first_trading_day=first_trading_day,
-            equity_minute_reader=bundle_data.equity_minute_bar_reader,
-            equity_daily_reader=bundle_data.equity_daily_bar_reader,
-            adjustment_reader=bundle_data.adjustment_reader,
-        )
-
-        pipeline_loader = USEquityPricingLoader(
-            bundle_data.equity_daily_bar_reader,
-            bundle_data.adjustment_reader,
-        )
-
-        def choose_loader(column):
-            if column in USEquityPricing.columns:
-                return pipeline_loader
-            raise ValueError(
-                "No PipelineLoader registered for column %s." % column
-            )
     else:
         env = TradingEnvironment(
             environ=environ,
@@ -244,6 +206,136 @@ def _run(handle_data,
     return perf
 
 
+# Bundle readers, trading environments and data portals kept resident between
+# runs. This is None unless ``enable_resident_cache`` was called, e.g. by the
+# warm backtest server, so one-off runs never hold on to the data.
+_resident_cache = None
+
+
+def enable_resident_cache():
+    """Keep loaded bundles in memory so later runs in this process (or in
+    processes forked from it) skip loading them again.
+    """
+    global _resident_cache
+    if _resident_cache is None:
+        _resident_cache = {'bundles': {}, 'environments': {}}
+
+
+def _load_bundle_data(bundle, environ, bundle_timestamp):
+    key = (bundle, bundle_timestamp)
+    if _resident_cache is not None and key in _resident_cache['bundles']:
+        return _resident_cache['bundles'][key]
+
+    bundle_data = bundles.load(
+        bundle,
+        environ,
+        bundle_timestamp,
+    )
+
+    prefix, connstr = re.split(
+        r'sqlite:///',
+        str(bundle_data.asset_finder.engine.url),
+        maxsplit=1,
+    )
+    if prefix:
+        raise ValueError(
+            "invalid url %r, must begin with 'sqlite:///'" %
+            str(bundle_data.asset_finder.engine.url),
+        )
+
+    pipeline_loader = USEquityPricingLoader(
+        bundle_data.equity_daily_bar_reader,
+        bundle_data.adjustment_reader,
+    )
+
+    loaded = bundle_data, connstr, pipeline_loader
+    if _resident_cache is not None:
+        _resident_cache['bundles'][key] = loaded
+    return loaded
+
+
+def _load_bundle(bundle,
+                 environ,
+                 bundle_timestamp,
+                 trading_calendar,
+                 start,
+                 end):
+    """Build the trading environment, data portal and pipeline loader choice
+    for a bundle, reusing resident ones when the cache is enabled.
+    """
+    bundle_data, connstr, pipeline_loader = _load_bundle_data(
+        bundle,
+        environ,
+        bundle_timestamp,
+    )
+
+    key = (bundle, bundle_timestamp, trading_calendar.name, start, end)
+    if _resident_cache is not None and key in _resident_cache['environments']:
+        env, data = _resident_cache['environments'][key]
+    else:
+        env = TradingEnvironment(
+            asset_db_path=connstr,
+            environ=environ,
+            trading_calendar=trading_calendar,
+            trading_day=trading_calendar.day,
+            trading_days=trading_calendar.schedule[start:end].index,
+        )
+
+        first_trading_day =\
+            bundle_data.equity_minute_bar_reader.first_trading_day
+        data = DataPortal(
+            env.asset_finder,
+            trading_calendar=trading_calendar,
+            first_trading_day=first_trading_day,
+            equity_minute_reader=bundle_data.equity_minute_bar_reader,
+            equity_daily_reader=bundle_data.equity_daily_bar_reader,
+            adjustment_reader=bundle_data.adjustment_reader,
+        )
+        if _resident_cache is not None:
+            _resident_cache['environments'][key] = env, data
+
+    def choose_loader(column):
+        if column in USEquityPricing.columns:
+            return pipeline_loader
+        raise ValueError(
+            "No PipelineLoader registered for column %s." % column
+        )
+
+    return env, data, choose_loader
+
+
+def preload(bundle, start, end, environ=os.environ, bundle_timestamp=None,
+            trading_calendar=None):
+    """Load a bundle and the environment for a date range into the resident
+    cache ahead of the first run.
+    """
+    enable_resident_cache()
+    if trading_calendar is None:
+        trading_calendar = get_calendar('NYSE')
+    return _load_bundle(
+        bundle,
+        environ,
+        bundle_timestamp,
+        trading_calendar,
+        start,
+        end,
+    )
+
+
+def dispose_resident_engines():
+    """Drop the database connections of the resident asset finders, e.g. in a
+    process forked from the one that opened them, the pools are not fork safe.
+    """
+    if _resident_cache is None:
+        return
+    finders = [bundle_data.asset_finder
+               for bundle_data, _, _ in _resident_cache['bundles'].values()]
+    finders += [env.asset_finder
+                for env, _ in _resident_cache['environments'].values()]
+    for finder in finders:
+        finder.engine.dispose()
+
+
 # All of the loaded extensions. We don't want to load an extension twice.
 _loaded_extensions = set()
 